@@ -0,0 +1,340 @@
+import logging
+from datetime import date as date_type, datetime
+from sqlalchemy import func, insert, update
+from database import Transaction, UserBalance, MonthlyRollup, DailyPrefixSum, ArchivedDailyTotal, month_key
+
+logger = logging.getLogger(__name__)
+
+# Тип транзакції -> колонка в user_balances
+LEDGER_COLUMNS = {
+    'income': 'income_total',
+    'expense': 'expense_total',
+    'goal_deposit': 'goal_deposit_total',
+}
+
+# Допустима похибка при порівнянні сум з плаваючою комою
+DRIFT_TOLERANCE = 1e-6
+
+def apply_to_ledger(session, user_id: int, transaction_type: str, amount: float):
+    """Додає суму транзакції до журналу балансів у поточній сесії (без коміту)."""
+    column_name = LEDGER_COLUMNS.get(transaction_type)
+    if column_name is None:
+        return
+    column = getattr(UserBalance, column_name)
+    updated = session.query(UserBalance).filter(UserBalance.user_id == user_id).update(
+        {column: column + amount, UserBalance.updated_at: datetime.now()},
+        synchronize_session=False
+    )
+    if not updated:
+        balance = UserBalance(
+            user_id=user_id,
+            income_total=0.0,
+            expense_total=0.0,
+            goal_deposit_total=0.0,
+            updated_at=datetime.now()
+        )
+        setattr(balance, column_name, amount)
+        session.add(balance)
+
+def apply_to_rollup(session, user_id: int, month: str, transaction_type: str, category: str, amount: float, count: int = 1):
+    """Додає транзакції до місячного зведення у поточній сесії (без коміту)."""
+    updated = session.query(MonthlyRollup).filter(
+        MonthlyRollup.user_id == user_id,
+        MonthlyRollup.month == month,
+        MonthlyRollup.type == transaction_type,
+        MonthlyRollup.category == category
+    ).update(
+        {MonthlyRollup.total: MonthlyRollup.total + amount, MonthlyRollup.count: MonthlyRollup.count + count},
+        synchronize_session=False
+    )
+    if not updated:
+        session.add(MonthlyRollup(
+            user_id=user_id,
+            month=month,
+            type=transaction_type,
+            category=category,
+            total=amount,
+            count=count
+        ))
+
+def _day(value):
+    return value.date() if isinstance(value, datetime) else value
+
+def apply_to_prefix_sums(session, user_id: int, transaction_type: str, category: str, day: date_type, amount: float, count: int = 1):
+    """Додає транзакції дня до накопичених сум у поточній сесії (без коміту).
+
+    Нові транзакції датуються сьогоднішнім днем, тож зазвичай оновлюється
+    лише останній рядок; транзакції заднім числом зсувають і всі пізніші дні.
+    """
+    key = (DailyPrefixSum.user_id == user_id, DailyPrefixSum.type == transaction_type,
+           DailyPrefixSum.category == category)
+    previous = session.query(DailyPrefixSum.day, DailyPrefixSum.total, DailyPrefixSum.count)\
+                      .filter(*key, DailyPrefixSum.day <= day)\
+                      .order_by(DailyPrefixSum.day.desc())\
+                      .first()
+    if previous is None or previous.day != day:
+        session.add(DailyPrefixSum(
+            user_id=user_id,
+            type=transaction_type,
+            category=category,
+            day=day,
+            total=(previous.total if previous else 0.0) + amount,
+            count=(previous.count if previous else 0) + count
+        ))
+        later = DailyPrefixSum.day > day
+    else:
+        later = DailyPrefixSum.day >= day
+    session.query(DailyPrefixSum).filter(*key, later).update(
+        {DailyPrefixSum.total: DailyPrefixSum.total + amount, DailyPrefixSum.count: DailyPrefixSum.count + count},
+        synchronize_session=False
+    )
+
+def apply_series_to_prefix_sums(session, user_id: int, transaction_type: str, category: str, daily: dict):
+    """Додає до накопичених сум одного ряду (користувач, тип, категорія) зміни
+    кількох днів {день: (сума, кількість)} у поточній сесії (без коміту).
+
+    Зачеплені рядки читаються одним запитом і записуються пакетно, тож
+    вартість не залежить від кількості днів у daily.
+    """
+    days = sorted(daily)
+    key = (DailyPrefixSum.user_id == user_id, DailyPrefixSum.type == transaction_type,
+           DailyPrefixSum.category == category)
+    previous = session.query(DailyPrefixSum.total, DailyPrefixSum.count)\
+                      .filter(*key, DailyPrefixSum.day < days[0])\
+                      .order_by(DailyPrefixSum.day.desc())\
+                      .first()
+    stored = {
+        row.day: (row.total, row.count)
+        for row in session.query(DailyPrefixSum.day, DailyPrefixSum.total, DailyPrefixSum.count)
+                          .filter(*key, DailyPrefixSum.day >= days[0])
+    }
+    stored_total, stored_count = previous if previous is not None else (0.0, 0)
+    added_total, added_count = 0.0, 0
+    inserts, updates = [], []
+    for day in sorted(set(stored) | set(days)):
+        if day in stored:
+            stored_total, stored_count = stored[day]
+        if day in daily:
+            added_total += daily[day][0]
+            added_count += daily[day][1]
+        row = {"user_id": user_id, "type": transaction_type, "category": category, "day": day,
+               "total": stored_total + added_total, "count": stored_count + added_count}
+        (updates if day in stored else inserts).append(row)
+    if inserts:
+        session.execute(insert(DailyPrefixSum), inserts)
+    if updates:
+        session.execute(update(DailyPrefixSum), updates)
+
+def apply_transaction(session, user_id: int, transaction_type: str, category: str, amount: float, date):
+    """Оновлює всі агрегати для нової транзакції в тій самій сесії."""
+    apply_to_ledger(session, user_id, transaction_type, amount)
+    apply_to_rollup(session, user_id, month_key(date), transaction_type, category, amount)
+    apply_to_prefix_sums(session, user_id, transaction_type, category, _day(date), amount)
+
+def revert_transaction(session, user_id: int, transaction_type: str, category: str, amount: float, date):
+    """Віднімає транзакцію з усіх агрегатів у тій самій сесії (перед видаленням чи зміною).
+
+    Рядки зведень, у яких не лишилося транзакцій, видаляються, щоб агрегати
+    збігалися з повним перерахунком.
+    """
+    day = _day(date)
+    apply_to_ledger(session, user_id, transaction_type, -amount)
+    apply_to_rollup(session, user_id, month_key(date), transaction_type, category, -amount, -1)
+    session.query(MonthlyRollup).filter(
+        MonthlyRollup.user_id == user_id,
+        MonthlyRollup.month == month_key(date),
+        MonthlyRollup.type == transaction_type,
+        MonthlyRollup.category == category,
+        MonthlyRollup.count <= 0
+    ).delete(synchronize_session=False)
+    apply_to_prefix_sums(session, user_id, transaction_type, category, day, -amount, -1)
+    key = (DailyPrefixSum.user_id == user_id, DailyPrefixSum.type == transaction_type,
+           DailyPrefixSum.category == category)
+    rows = session.query(DailyPrefixSum.day, DailyPrefixSum.count)\
+                  .filter(*key, DailyPrefixSum.day <= day)\
+                  .order_by(DailyPrefixSum.day.desc())\
+                  .limit(2).all()
+    if rows and rows[0].day == day and rows[0].count == (rows[1].count if len(rows) > 1 else 0):
+        session.query(DailyPrefixSum).filter(*key, DailyPrefixSum.day == day).delete(synchronize_session=False)
+
+class AggregateDeltas:
+    """Накопичує зміни агрегатів від багатьох транзакцій, щоб застосувати їх разом.
+
+    Пам'ять залежить від кількості різних (користувач, тип, категорія, день),
+    а не від кількості транзакцій.
+    """
+
+    def __init__(self):
+        self.ledger = {}
+        self.rollups = {}
+        self.prefix_sums = {}
+
+    def add(self, user_id: int, transaction_type: str, category: str, amount: float, date):
+        self.ledger[(user_id, transaction_type)] = self.ledger.get((user_id, transaction_type), 0.0) + amount
+        key = (user_id, month_key(date), transaction_type, category)
+        total, count = self.rollups.get(key, (0.0, 0))
+        self.rollups[key] = (total + amount, count + 1)
+        key = (user_id, transaction_type, category, _day(date))
+        total, count = self.prefix_sums.get(key, (0.0, 0))
+        self.prefix_sums[key] = (total + amount, count + 1)
+
+    def apply(self, session):
+        """Оновлює кожен рядок агрегатів один раз у поточній сесії (без коміту)."""
+        for (user_id, transaction_type), amount in self.ledger.items():
+            apply_to_ledger(session, user_id, transaction_type, amount)
+        for (user_id, month, transaction_type, category), (total, count) in self.rollups.items():
+            apply_to_rollup(session, user_id, month, transaction_type, category, total, count)
+        series = {}
+        for (user_id, transaction_type, category, day), sums in self.prefix_sums.items():
+            series.setdefault((user_id, transaction_type, category), {})[day] = sums
+        for (user_id, transaction_type, category), daily in series.items():
+            if len(daily) == 1:
+                (day, (total, count)), = daily.items()
+                apply_to_prefix_sums(session, user_id, transaction_type, category, day, total, count)
+            else:
+                apply_series_to_prefix_sums(session, user_id, transaction_type, category, daily)
+
+def apply_transactions(session, rows):
+    """Як apply_transaction для пакета рядків (user_id, type, category, amount, date):
+    зміни спершу підсумовуються, тож кожен рядок агрегату оновлюється один раз."""
+    deltas = AggregateDeltas()
+    for user_id, transaction_type, category, amount, date in rows:
+        deltas.add(user_id, transaction_type, category, amount, date)
+    deltas.apply(session)
+
+def compute_ledger(session):
+    """Перераховує підсумки з transactions і архівних денних сум: {user_id: {колонка: сума}}."""
+    totals = {}
+    rows = session.query(Transaction.user_id, Transaction.type, func.sum(Transaction.amount))\
+                  .group_by(Transaction.user_id, Transaction.type).all()
+    rows += session.query(ArchivedDailyTotal.user_id, ArchivedDailyTotal.type, func.sum(ArchivedDailyTotal.total))\
+                   .group_by(ArchivedDailyTotal.user_id, ArchivedDailyTotal.type).all()
+    for user_id, transaction_type, total in rows:
+        column_name = LEDGER_COLUMNS.get(transaction_type)
+        if column_name is None:
+            continue
+        user_totals = totals.setdefault(user_id, dict.fromkeys(LEDGER_COLUMNS.values(), 0.0))
+        user_totals[column_name] += total or 0.0
+    return totals
+
+def verify_ledger(session):
+    """Повертає список розбіжностей (user_id, колонка, у журналі, фактично)."""
+    actual = compute_ledger(session)
+    stored = {row.user_id: row for row in session.query(UserBalance).all()}
+    drift = []
+    for user_id in sorted(set(actual) | set(stored)):
+        expected = actual.get(user_id, dict.fromkeys(LEDGER_COLUMNS.values(), 0.0))
+        row = stored.get(user_id)
+        for column_name, value in expected.items():
+            ledger_value = getattr(row, column_name) if row is not None else 0.0
+            if abs((ledger_value or 0.0) - value) > DRIFT_TOLERANCE:
+                drift.append((user_id, column_name, ledger_value, value))
+    return drift
+
+def rebuild_ledger(session):
+    """Повністю перебудовує журнал балансів з таблиці transactions (без коміту)."""
+    totals = compute_ledger(session)
+    session.query(UserBalance).delete(synchronize_session=False)
+    now = datetime.now()
+    session.add_all(
+        UserBalance(user_id=user_id, updated_at=now, **user_totals)
+        for user_id, user_totals in totals.items()
+    )
+    logger.info(f"Ledger rebuilt for {len(totals)} users")
+    return len(totals)
+
+def _merge_sums(rows):
+    """{ключ: (сума, кількість)} з рядків (*ключ, сума, кількість), де ключі можуть повторюватися."""
+    merged = {}
+    for *key, total, count in rows:
+        key = tuple(key)
+        stored_total, stored_count = merged.get(key, (0.0, 0))
+        merged[key] = (stored_total + (total or 0.0), stored_count + count)
+    return merged
+
+def compute_rollups(session):
+    """Перераховує місячні зведення з transactions і архівних денних сум."""
+    month = Transaction.month
+    rows = session.query(Transaction.user_id, month, Transaction.type, Transaction.category,
+                         func.sum(Transaction.amount), func.count(Transaction.id))\
+                  .filter(month.isnot(None))\
+                  .group_by(Transaction.user_id, month, Transaction.type, Transaction.category).all()
+    archived = ArchivedDailyTotal
+    rows += session.query(archived.user_id, archived.month, archived.type, archived.category,
+                          func.sum(archived.total), func.sum(archived.count))\
+                   .group_by(archived.user_id, archived.month, archived.type, archived.category).all()
+    return _merge_sums(rows)
+
+def verify_rollups(session):
+    """Повертає список розбіжностей (ключ, у зведенні, фактично) як пари (сума, кількість)."""
+    actual = compute_rollups(session)
+    stored = {
+        (row.user_id, row.month, row.type, row.category): (row.total, row.count)
+        for row in session.query(MonthlyRollup).all()
+    }
+    drift = []
+    for key in sorted(set(actual) | set(stored)):
+        expected_total, expected_count = actual.get(key, (0.0, 0))
+        stored_total, stored_count = stored.get(key, (0.0, 0))
+        if stored_count != expected_count or abs(stored_total - expected_total) > DRIFT_TOLERANCE:
+            drift.append((key, (stored_total, stored_count), (expected_total, expected_count)))
+    return drift
+
+def rebuild_rollups(session):
+    """Повністю перебудовує місячні зведення з таблиці transactions (без коміту)."""
+    rollups = compute_rollups(session)
+    session.query(MonthlyRollup).delete(synchronize_session=False)
+    session.add_all(
+        MonthlyRollup(user_id=user_id, month=month, type=transaction_type, category=category, total=total, count=count)
+        for (user_id, month, transaction_type, category), (total, count) in rollups.items()
+    )
+    logger.info(f"Monthly rollups rebuilt: {len(rollups)} rows")
+    return len(rollups)
+
+def compute_prefix_sums(session):
+    """Перераховує накопичені денні суми з transactions і архівних денних сум."""
+    rows = session.query(Transaction.user_id, Transaction.type, Transaction.category, Transaction.date,
+                         func.sum(Transaction.amount), func.count(Transaction.id))\
+                  .filter(Transaction.date.isnot(None))\
+                  .group_by(Transaction.user_id, Transaction.type, Transaction.category, Transaction.date).all()
+    archived = ArchivedDailyTotal
+    rows += session.query(archived.user_id, archived.type, archived.category, archived.day,
+                          archived.total, archived.count).all()
+    daily = _merge_sums(rows)
+    prefix_sums = {}
+    running_key = None
+    running_total, running_count = 0.0, 0
+    for (user_id, transaction_type, category, day), (total, count) in sorted(daily.items()):
+        if (user_id, transaction_type, category) != running_key:
+            running_key = (user_id, transaction_type, category)
+            running_total, running_count = 0.0, 0
+        running_total += total
+        running_count += count
+        prefix_sums[(user_id, transaction_type, category, day)] = (running_total, running_count)
+    return prefix_sums
+
+def verify_prefix_sums(session):
+    """Повертає список розбіжностей (ключ, збережено, фактично) як пари (сума, кількість)."""
+    actual = compute_prefix_sums(session)
+    stored = {
+        (row.user_id, row.type, row.category, row.day): (row.total, row.count)
+        for row in session.query(DailyPrefixSum).all()
+    }
+    drift = []
+    for key in sorted(set(actual) | set(stored)):
+        expected_total, expected_count = actual.get(key, (0.0, 0))
+        stored_total, stored_count = stored.get(key, (0.0, 0))
+        if stored_count != expected_count or abs(stored_total - expected_total) > DRIFT_TOLERANCE:
+            drift.append((key, (stored_total, stored_count), (expected_total, expected_count)))
+    return drift
+
+def rebuild_prefix_sums(session):
+    """Повністю перебудовує накопичені денні суми з таблиці transactions (без коміту)."""
+    prefix_sums = compute_prefix_sums(session)
+    session.query(DailyPrefixSum).delete(synchronize_session=False)
+    session.add_all(
+        DailyPrefixSum(user_id=user_id, type=transaction_type, category=category, day=day, total=total, count=count)
+        for (user_id, transaction_type, category, day), (total, count) in prefix_sums.items()
+    )
+    logger.info(f"Daily prefix sums rebuilt: {len(prefix_sums)} rows")
+    return len(prefix_sums)
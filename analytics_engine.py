@@ -0,0 +1,181 @@
+"""Векторизована аналітика по історії транзакцій користувача.
+
+Історія зберігається колонками NumPy (сума, дата, коди типу й категорії),
+а звіти рахуються групуванням через bincount/unique замість циклів по рядках.
+"""
+from datetime import date
+import numpy as np
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_NAT = np.iinfo(np.int64).min  # NaT у представленні datetime64
+
+# Найменша місткість буферів, що виділяються під дописування рядків
+_MIN_CAPACITY = 64
+
+def _day_number(value):
+    return value.toordinal() - _EPOCH_ORDINAL if value is not None else _NAT
+
+class _ColumnBuffers:
+    """Масиви з запасом місткості, спільні для послідовних знімків одного користувача.
+
+    Кожен знімок бачить лише свій префікс [:length], тож дописування в запас
+    після length не змінює вже виданих знімків.
+    """
+
+    __slots__ = ("amount", "date", "type_code", "category_code", "length")
+
+    def __init__(self, capacity: int):
+        self.amount = np.empty(capacity, dtype=np.float64)
+        self.date = np.empty(capacity, dtype="datetime64[D]")
+        self.type_code = np.empty(capacity, dtype=np.int32)
+        self.category_code = np.empty(capacity, dtype=np.int32)
+        self.length = 0
+
+    @property
+    def capacity(self):
+        return len(self.amount)
+
+    @property
+    def nbytes(self):
+        return self.amount.nbytes + self.date.nbytes + self.type_code.nbytes + self.category_code.nbytes
+
+class TransactionColumns:
+    """Колонкове представлення історії одного користувача."""
+
+    __slots__ = ("amount", "date", "type_code", "category_code", "types", "categories", "_buffers")
+
+    def __init__(self, amount, date, type_code, category_code, types, categories, buffers=None):
+        self.amount = amount  # float64
+        self.date = date  # datetime64[D]
+        self.type_code = type_code  # int32, індекс у types
+        self.category_code = category_code  # int32, індекс у categories
+        self.types = types
+        self.categories = categories
+        self._buffers = buffers  # _ColumnBuffers, префіксом яких є масиви, або None
+
+    def __len__(self):
+        return len(self.amount)
+
+    @classmethod
+    def from_pages(cls, pages):
+        """Будує колонки зі сторінок рядків (id, date, type, category, amount, ...)."""
+        type_codes = {}
+        category_codes = {}
+        amounts, dates, types, categories = [], [], [], []
+        for page in pages:
+            amounts.append(np.fromiter((row[4] for row in page), dtype=np.float64, count=len(page)))
+            dates.append(np.fromiter((_day_number(row[1]) for row in page), dtype=np.int64, count=len(page)))
+            types.append(np.fromiter(
+                (type_codes.setdefault(row[2], len(type_codes)) for row in page), dtype=np.int32, count=len(page)
+            ))
+            categories.append(np.fromiter(
+                (category_codes.setdefault(row[3], len(category_codes)) for row in page), dtype=np.int32, count=len(page)
+            ))
+        if not amounts:
+            return cls.empty()
+        return cls(
+            np.concatenate(amounts),
+            np.concatenate(dates).view("datetime64[D]"),
+            np.concatenate(types),
+            np.concatenate(categories),
+            list(type_codes),
+            list(category_codes),
+        )
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            np.empty(0, dtype=np.float64),
+            np.empty(0, dtype="datetime64[D]"),
+            np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.int32),
+            [],
+            [],
+        )
+
+    @property
+    def nbytes(self):
+        """Розмір масивів у пам'яті разом із запасом (без словників типів і категорій)."""
+        if self._buffers is not None:
+            return self._buffers.nbytes
+        return self.amount.nbytes + self.date.nbytes + self.type_code.nbytes + self.category_code.nbytes
+
+    def appended(self, rows):
+        """Новий знімок з доданими в кінець рядками (id, date, type, category, amount, ...).
+
+        Рядки дописуються в запас буферів, тож вартість не залежить від довжини
+        історії; коли запас вичерпано, буфери виділяються вдвічі більшими.
+        Поточний об'єкт не змінюється, тому його можна й далі читати з інших
+        потоків. Дописувати слід лише до останнього знімка (SnapshotCache
+        робить це під своїм блокуванням): старіший знімок копіюється.
+        """
+        length = len(self.amount)
+        end = length + len(rows)
+        buffers = self._buffers
+        if buffers is None or buffers.length != length or end > buffers.capacity:
+            buffers = _ColumnBuffers(max(2 * end, _MIN_CAPACITY))
+            buffers.amount[:length] = self.amount
+            buffers.date[:length] = self.date
+            buffers.type_code[:length] = self.type_code
+            buffers.category_code[:length] = self.category_code
+        types = list(self.types)
+        categories = list(self.categories)
+        type_codes = {name: code for code, name in enumerate(types)}
+        category_codes = {name: code for code, name in enumerate(categories)}
+        buffers.amount[length:end] = [row[4] for row in rows]
+        buffers.date[length:end] = np.array([_day_number(row[1]) for row in rows], dtype=np.int64).view("datetime64[D]")
+        buffers.type_code[length:end] = [type_codes.setdefault(row[2], len(type_codes)) for row in rows]
+        buffers.category_code[length:end] = [category_codes.setdefault(row[3], len(category_codes)) for row in rows]
+        buffers.length = end
+        return TransactionColumns(
+            buffers.amount[:end],
+            buffers.date[:end],
+            buffers.type_code[:end],
+            buffers.category_code[:end],
+            list(type_codes),
+            list(category_codes),
+            buffers,
+        )
+
+    def mask(self, transaction_type: str):
+        if transaction_type not in self.types:
+            return np.zeros(len(self.amount), dtype=bool)
+        return self.type_code == self.types.index(transaction_type)
+
+def total(columns: TransactionColumns, transaction_type: str) -> float:
+    return float(columns.amount[columns.mask(transaction_type)].sum())
+
+def category_totals(columns: TransactionColumns, transaction_type: str):
+    """[(категорія, сума)] за спаданням суми."""
+    mask = columns.mask(transaction_type)
+    sums = np.bincount(columns.category_code[mask], weights=columns.amount[mask], minlength=len(columns.categories))
+    order = np.argsort(-sums, kind="stable")
+    return [(columns.categories[i], float(sums[i])) for i in order if sums[i] > 0]
+
+def monthly_series(columns: TransactionColumns, transaction_type: str):
+    """(місяці як datetime64[M], суми за місяць) у хронологічному порядку."""
+    mask = columns.mask(transaction_type)
+    months = columns.date[mask].astype("datetime64[M]")
+    unique_months, inverse = np.unique(months, return_inverse=True)
+    return unique_months, np.bincount(inverse, weights=columns.amount[mask], minlength=len(unique_months))
+
+def average_monthly(columns: TransactionColumns, transaction_type: str) -> float:
+    _, sums = monthly_series(columns, transaction_type)
+    return float(sums.mean()) if len(sums) else 0.0
+
+def percentiles(columns: TransactionColumns, transaction_type: str, q=(50, 90)):
+    """Перцентилі окремих сум транзакцій; None, якщо транзакцій немає."""
+    amounts = columns.amount[columns.mask(transaction_type)]
+    if not len(amounts):
+        return None
+    return [float(value) for value in np.percentile(amounts, q)]
+
+def monthly_trend(columns: TransactionColumns, transaction_type: str):
+    """Нахил лінійного тренду місячних сум (грн/міс); None, якщо місяців менше двох."""
+    months, sums = monthly_series(columns, transaction_type)
+    if len(months) < 2:
+        return None
+    # Місяці без транзакцій враховуються як відстань по осі x
+    x = (months - months[0]).astype(np.int64)
+    slope, _ = np.polyfit(x, sums, 1)
+    return float(slope)
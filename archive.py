@@ -0,0 +1,253 @@
+"""Холодний архів старих транзакцій.
+
+Транзакції, старші за горизонт ARCHIVE_HORIZON_DAYS, переносяться з гарячої
+таблиці transactions в окремий файл SQLite (DB_ARCHIVE_URL, по одному на шард)
+стиснутими пакетами по користувачу: колонки пакета серіалізуються в JSON
+і стискаються zlib. Агрегати (журнал балансів, місячні зведення, накопичені
+денні суми) не змінюються, а внесок перенесених рядків зберігається в
+archived_daily_totals гарячої БД, тож перевірка й перебудова агрегатів
+бачать усю історію.
+
+Перенесення пакета: запис у архів (confirmed=False) -> видалення з transactions
+разом з оновленням archived_daily_totals -> confirmed=True. Якщо процес упав
+посередині, наступний запуск завершує непідтверджені пакети; читачі історії
+тим часом відкидають рядки, що є в обох шарах.
+"""
+import heapq
+import json
+import logging
+import os
+import zlib
+from datetime import date, datetime, timedelta
+from sqlalchemy import Boolean, BigInteger, Column, Date, Index, Integer, LargeBinary, delete, select
+from sqlalchemy.orm import declarative_base, sessionmaker
+from database import ArchivedDailyTotal, DB_READ_POOL, DB_SHARDS, Transaction, create_db_engine, month_key, shard_for
+from read_models import TRANSACTION_COLUMNS, TransactionRecord
+
+logger = logging.getLogger(__name__)
+
+ArchiveBase = declarative_base()
+
+class ArchivedChunk(ArchiveBase):
+    """Пакет архівних транзакцій одного користувача, впорядкований за (date, id)."""
+    __tablename__ = "archived_chunks"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, nullable=False)
+    first_date = Column(Date, nullable=False)
+    last_date = Column(Date, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+    confirmed = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        Index('ix_archived_chunks_user_first_date', 'user_id', 'first_date'),
+    )
+
+ARCHIVE_HORIZON_DAYS = int(os.getenv("ARCHIVE_HORIZON_DAYS", "365"))
+ARCHIVE_CHUNK_ROWS = int(os.getenv("ARCHIVE_CHUNK_ROWS", "5000"))
+# Файл архіву користувача визначає shard_for, як і його гарячий шард, тому при зміні
+# DB_SHARDS архіви переносить manage.py shards reshard --archive-url-template
+DB_ARCHIVE_URL = os.getenv(
+    "DB_ARCHIVE_URL",
+    "sqlite:///finance_bot_archive.db" if DB_SHARDS == 1 else "sqlite:///finance_bot_archive_{shard}.db"
+)
+
+archive_engines = [
+    create_db_engine(DB_ARCHIVE_URL.format(shard=shard), pool_size=DB_READ_POOL)
+    for shard in range(DB_SHARDS)
+]
+archive_sessions = [sessionmaker(bind=archive_engine, expire_on_commit=False) for archive_engine in archive_engines]
+
+def init_archive():
+    for archive_engine in archive_engines:
+        ArchiveBase.metadata.create_all(archive_engine)
+
+def archive_session(user_id: int):
+    return archive_sessions[shard_for(user_id)]()
+
+def encode_rows(rows) -> bytes:
+    """Стискає рядки (id, date, type, category, amount, description) у колонковий JSON."""
+    columns = {
+        "id": [row[0] for row in rows],
+        "date": [row[1].toordinal() for row in rows],
+        "type": [row[2] for row in rows],
+        "category": [row[3] for row in rows],
+        "amount": [row[4] for row in rows],
+        "description": [row[5] for row in rows],
+    }
+    return zlib.compress(json.dumps(columns, ensure_ascii=False, separators=(",", ":")).encode(), 6)
+
+def decode_rows(payload: bytes):
+    columns = json.loads(zlib.decompress(payload))
+    return [
+        TransactionRecord(row_id, date.fromordinal(day), transaction_type, category, amount, description)
+        for row_id, day, transaction_type, category, amount, description in zip(
+            columns["id"], columns["date"], columns["type"], columns["category"],
+            columns["amount"], columns["description"]
+        )
+    ]
+
+def _row_key(row):
+    return (row.date, row.id)
+
+def has_archive(user_id: int) -> bool:
+    session = archive_session(user_id)
+    try:
+        return session.execute(
+            select(ArchivedChunk.id).where(ArchivedChunk.user_id == user_id).limit(1)
+        ).first() is not None
+    finally:
+        session.close()
+
+def iter_archived_rows(user_id: int):
+    """Архівні транзакції користувача за (date, id).
+
+    Пакети розпаковуються лише тоді, коли злиття доходить до їхньої першої
+    дати, тому в пам'яті зазвичай один пакет.
+    """
+    session = archive_session(user_id)
+    try:
+        chunks = session.execute(
+            select(ArchivedChunk.id, ArchivedChunk.first_date)
+            .where(ArchivedChunk.user_id == user_id)
+            .order_by(ArchivedChunk.first_date, ArchivedChunk.id)
+        ).all()
+    finally:
+        session.close()
+
+    def load(chunk_id):
+        session = archive_session(user_id)
+        try:
+            return decode_rows(session.get(ArchivedChunk, chunk_id).payload)
+        finally:
+            session.close()
+
+    heap = []
+    next_chunk = 0
+    while heap or next_chunk < len(chunks):
+        while next_chunk < len(chunks) and (not heap or chunks[next_chunk].first_date <= heap[0][0][0]):
+            rows = iter(load(chunks[next_chunk].id))
+            first = next(rows, None)
+            if first is not None:
+                heapq.heappush(heap, (_row_key(first), next_chunk, first, rows))
+            next_chunk += 1
+        _, index, row, rows = heapq.heappop(heap)
+        yield row
+        following = next(rows, None)
+        if following is not None:
+            heapq.heappush(heap, (_row_key(following), index, following, rows))
+
+def merge_with_hot(archived_rows, hot_rows):
+    """Зливає архівні й гарячі рядки за (date, id), пропускаючи рядки, що є в обох шарах."""
+    last_key = None
+    for row in heapq.merge(archived_rows, hot_rows, key=_row_key):
+        key = _row_key(row)
+        if key != last_key:
+            yield row
+        last_key = key
+
+def _apply_archived_totals(hot, user_id: int, rows):
+    """Додає внесок рядків до archived_daily_totals у поточній сесії (без коміту)."""
+    daily = {}
+    for row in rows:
+        key = (row.type, row.category, row.date)
+        total, count = daily.get(key, (0.0, 0))
+        daily[key] = (total + row.amount, count + 1)
+    for (transaction_type, category, day), (total, count) in daily.items():
+        stored = hot.get(ArchivedDailyTotal, (user_id, transaction_type, category, day))
+        if stored is None:
+            hot.add(ArchivedDailyTotal(
+                user_id=user_id, type=transaction_type, category=category, day=day,
+                month=month_key(day), total=total, count=count
+            ))
+        else:
+            stored.total += total
+            stored.count += count
+
+def _move_out_of_hot(hot_factory, user_id: int, rows):
+    """Видаляє з transactions ті з rows, що там ще є, і враховує їх в archived_daily_totals."""
+    hot = hot_factory()
+    try:
+        ids = [row.id for row in rows]
+        present = set(hot.execute(
+            select(Transaction.id).where(Transaction.user_id == user_id, Transaction.id.in_(ids))
+        ).scalars())
+        moved = [row for row in rows if row.id in present]
+        if moved:
+            hot.execute(delete(Transaction).where(Transaction.id.in_([row.id for row in moved])))
+            _apply_archived_totals(hot, user_id, moved)
+        hot.commit()
+        return len(moved)
+    except Exception:
+        hot.rollback()
+        raise
+    finally:
+        hot.close()
+
+def _confirm(archive, chunk_id: int):
+    archive.get(ArchivedChunk, chunk_id).confirmed = True
+    archive.commit()
+
+def archive_user(hot_factory, user_id: int, cutoff: date):
+    """Переносить транзакції користувача з датою до cutoff в архів. Повертає кількість рядків."""
+    archive = archive_session(user_id)
+    moved = 0
+    try:
+        # Завершуємо пакети, перенесення яких перервалося
+        for chunk in archive.query(ArchivedChunk).filter_by(user_id=user_id, confirmed=False).all():
+            moved += _move_out_of_hot(hot_factory, user_id, decode_rows(chunk.payload))
+            _confirm(archive, chunk.id)
+
+        while True:
+            hot = hot_factory()
+            try:
+                rows = [
+                    TransactionRecord._make(row)
+                    for row in hot.execute(
+                        select(*TRANSACTION_COLUMNS)
+                        .where(Transaction.user_id == user_id, Transaction.date < cutoff)
+                        .order_by(Transaction.date, Transaction.id)
+                        .limit(ARCHIVE_CHUNK_ROWS)
+                    )
+                ]
+            finally:
+                hot.close()
+            if not rows:
+                return moved
+
+            chunk = ArchivedChunk(
+                user_id=user_id,
+                first_date=rows[0].date,
+                last_date=rows[-1].date,
+                row_count=len(rows),
+                payload=encode_rows(rows),
+                confirmed=False
+            )
+            archive.add(chunk)
+            archive.commit()
+            moved += _move_out_of_hot(hot_factory, user_id, rows)
+            _confirm(archive, chunk.id)
+    except Exception:
+        archive.rollback()
+        raise
+    finally:
+        archive.close()
+
+def archive_shard(hot_factory, cutoff: date):
+    """Архівує всіх користувачів шарду, в яких є транзакції до cutoff: {user_id: рядків}."""
+    hot = hot_factory()
+    try:
+        user_ids = hot.execute(
+            select(Transaction.user_id).where(Transaction.date < cutoff).distinct()
+        ).scalars().all()
+    finally:
+        hot.close()
+    moved = {}
+    for user_id in user_ids:
+        moved[user_id] = archive_user(hot_factory, user_id, cutoff)
+        logger.info(f"Archived {moved[user_id]} transactions for user {user_id}")
+    return moved
+
+def default_cutoff() -> date:
+    return (datetime.now() - timedelta(days=ARCHIVE_HORIZON_DAYS)).date()
@@ -0,0 +1,92 @@
+"""Мікробенчмарк: цикли по рядках (як у старих звітах main.py) проти analytics_engine.
+
+Запуск: python benchmarks/bench_analytics_engine.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics_engine  # noqa: E402
+from analytics_engine import TransactionColumns  # noqa: E402
+
+CATEGORIES = ["їжа", "транспорт", "розваги", "житло", "здоров'я", "одяг", "зв'язок", "подарунки"]
+PAGE_SIZE = 1000
+
+def make_pages(rows: int):
+    """Рядки у форматі потокового читача: (id, date, type, category, amount, description)."""
+    rng = random.Random(42)
+    start = date(2015, 1, 1)
+    page = []
+    for i in range(rows):
+        page.append((
+            i,
+            start + timedelta(days=i * 3650 // rows),
+            "income" if rng.random() < 0.1 else "expense",
+            rng.choice(CATEGORIES),
+            round(rng.uniform(10, 2000), 2),
+            None,
+        ))
+        if len(page) == PAGE_SIZE:
+            yield page
+            page = []
+    if page:
+        yield page
+
+def loop_reports(rows):
+    """Поведінка старих звітів: накопичення у словниках по кожному рядку."""
+    by_category = {}
+    by_month = {}
+    expenses = []
+    for _, row_date, row_type, category, amount, _ in rows:
+        if row_type != "expense":
+            continue
+        by_category[category] = by_category.get(category, 0.0) + amount
+        month_key = row_date.strftime("%Y-%m")
+        by_month[month_key] = by_month.get(month_key, 0.0) + amount
+        expenses.append(amount)
+    top = sorted(by_category.items(), key=lambda item: item[1], reverse=True)
+    average = sum(by_month.values()) / len(by_month) if by_month else 0.0
+    expenses.sort()
+    median = expenses[len(expenses) // 2] if expenses else 0.0
+    p90 = expenses[int(len(expenses) * 0.9)] if expenses else 0.0
+    values = [by_month[key] for key in sorted(by_month)]
+    n = len(values)
+    mean_x = (n - 1) / 2
+    mean_y = sum(values) / n
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values)) / sum((x - mean_x) ** 2 for x in range(n))
+    return top, average, median, p90, slope
+
+def engine_reports(columns: TransactionColumns):
+    return (
+        analytics_engine.category_totals(columns, "expense"),
+        analytics_engine.average_monthly(columns, "expense"),
+        analytics_engine.percentiles(columns, "expense", (50, 90)),
+        analytics_engine.monthly_trend(columns, "expense"),
+    )
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'рядків':>10} {'цикли, мс':>12} {'завантаж., мс':>14} {'numpy, мс':>10} {'прискорення':>12}")
+    for size in args.sizes:
+        pages = list(make_pages(size))
+        rows = [row for page in pages for row in page]
+        _, loop_ms = _timed(loop_reports, rows)
+        columns, build_ms = _timed(TransactionColumns.from_pages, pages)
+        _, engine_ms = _timed(engine_reports, columns)
+        print(f"{size:>10} {loop_ms:>12.1f} {build_ms:>14.1f} {engine_ms:>10.1f} {loop_ms / engine_ms:>11.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Порівняння пропускної здатності конкурентних оновлень: синхронні запити
+у циклі подій (стара поведінка) проти пулу потоків database.run_db.
+
+Запуск: python benchmarks/bench_db_executor.py [--updates 2000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp(prefix="finwise_bench_")
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+
+import database  # noqa: E402
+import handlers.transactions as db_transactions  # noqa: E402
+
+# Імітація відправки відповіді в Telegram (мережевий I/O)
+REPLY_LATENCY = 0.005
+
+async def update_inline(user_id: int):
+    db_transactions._get_or_create_user(user_id, f"user{user_id}", "Bench")
+    await asyncio.sleep(REPLY_LATENCY)
+    db_transactions._add_transaction(user_id, 10.0, 'expense', 'їжа')
+    db_transactions._get_balance(user_id)
+    db_transactions._get_transactions(user_id, limit=50)
+    await asyncio.sleep(REPLY_LATENCY)
+
+async def update_executor(user_id: int):
+    await db_transactions.get_or_create_user(user_id, f"user{user_id}", "Bench")
+    await asyncio.sleep(REPLY_LATENCY)
+    await db_transactions.add_transaction(user_id, 10.0, 'expense', 'їжа')
+    await db_transactions.get_balance(user_id)
+    await db_transactions.get_transactions(user_id, limit=50)
+    await asyncio.sleep(REPLY_LATENCY)
+
+async def _heartbeat(lags: list, stop: asyncio.Event, interval: float = 0.001):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - start - interval)
+
+async def run(handler, updates: int, concurrency: int, users: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    lags = []
+    stop = asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(lags, stop))
+
+    async def one(i: int):
+        async with semaphore:
+            await handler(1000 + i % users)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(updates)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await heartbeat
+
+    lags.sort()
+    p99 = lags[int(len(lags) * 0.99)] if lags else 0.0
+    return updates / elapsed, p99 * 1000, (lags[-1] if lags else 0.0) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=200)
+    args = parser.parse_args()
+
+    database.init_db()
+    print(f"DB: {database.DB_URL}, DB_WORKERS={database.DB_WORKERS}")
+    print(f"{'режим':<10} {'оновл./с':>10} {'p99 lag, мс':>12} {'max lag, мс':>12}")
+    for name, handler in (("inline", update_inline), ("executor", update_executor)):
+        rate, p99, worst = asyncio.run(run(handler, args.updates, args.concurrency, args.users))
+        print(f"{name:<10} {rate:>10.1f} {p99:>12.2f} {worst:>12.2f}")
+
+if __name__ == "__main__":
+    main()
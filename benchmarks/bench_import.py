@@ -0,0 +1,76 @@
+"""Імпорт CSV-виписки: час і пікова пам'ять залежно від розміру файлу.
+
+Пікова пам'ять має лишатися майже сталою: файл читається потоково, а в
+пам'яті тримається лише пакет IMPORT_CHUNK_ROWS рядків і зміни агрегатів.
+
+Запуск: python benchmarks/bench_import.py [--sizes 10000 100000] [--layout generic|monobank]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp(prefix="finwise_import_")
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+
+import database  # noqa: E402
+import handlers.transactions as db_transactions  # noqa: E402
+
+CATEGORIES = ["їжа", "транспорт", "розваги", "житло", "здоров'я"]
+MONOBANK_HEADER = ('"Дата i час операції","Деталі операції",MCC,"Сума в валюті картки (UAH)",'
+                   '"Сума в валюті операції",Валюта,Курс,"Сума комісій (UAH)","Сума кешбеку (UAH)",'
+                   '"Залишок після операції"\n')
+
+def write_statement(path: str, rows: int, layout: str):
+    rng = random.Random(42)
+    start = datetime(2022, 1, 1)
+    with open(path, "w", encoding="utf-8") as statement:
+        if layout == "monobank":
+            statement.write(MONOBANK_HEADER)
+        else:
+            statement.write("date;amount;category;description\n")
+        for i in range(rows):
+            moment = start + timedelta(minutes=i * 5)
+            amount = rng.uniform(5, 2000) * (1 if rng.random() < 0.05 else -1)
+            if layout == "monobank":
+                statement.write(f'"{moment:%d.%m.%Y %H:%M:%S}","Покупка {i}",5411,{amount:.2f},{amount:.2f},UAH,—,0,0,0\n')
+            else:
+                statement.write(f"{moment:%Y-%m-%d};{amount:.2f};{rng.choice(CATEGORIES)};опис {i}\n")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10000, 100000])
+    parser.add_argument("--layout", choices=["generic", "monobank"], default="generic")
+    args = parser.parse_args()
+
+    database.init_db()
+    print(f"формат={args.layout}, пакет={db_transactions.IMPORT_CHUNK_ROWS}")
+    print(f"{'рядків':>8} {'файл, МБ':>9} {'час, с':>7} {'рядків/с':>9} {'пам., МБ':>9}")
+    for index, rows in enumerate(args.sizes):
+        path = os.path.join(_tmpdir, f"statement_{rows}.csv")
+        write_statement(path, rows, args.layout)
+        # Час і пам'ять міряються окремими імпортами: tracemalloc сповільнює виконання
+        time_user, memory_user = 1000 + 2 * index, 1001 + 2 * index
+        for user_id in (time_user, memory_user):
+            db_transactions._get_or_create_user(user_id, f"user{user_id}", "Bench")
+
+        started = time.perf_counter()
+        result = db_transactions._import_statement(time_user, path)
+        elapsed = time.perf_counter() - started
+
+        tracemalloc.start()
+        db_transactions._import_statement(memory_user, path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"{result.imported:>8} {size_mb:>9.1f} {elapsed:>7.2f} {result.imported / elapsed:>9.0f} {peak / 1024 / 1024:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Масова розсилка й інтерактивні відповіді одночасно: напряму проти SendScheduler.
+
+Локальна заміна Bot API (fake_bot_api.py) відповідає 429, як Telegram,
+коли бот надсилає понад --flood-rate повідомлень на секунду загалом або
+понад --chat-flood-rate на секунду в один чат. Бот розсилає --broadcast
+повідомлень різним чатам і водночас відповідає на --interactive запитів
+(--interactive-rate на секунду). Міряються відмови 429, невдалі
+надсилання, тривалість розсилки й затримка інтерактивних відповідей.
+
+Запуск: python benchmarks/bench_outbound.py [--broadcast 300] [--interactive 100]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telegram.error import RetryAfter  # noqa: E402
+from telegram.ext import ExtBot  # noqa: E402
+from fake_bot_api import FakeBotAPI  # noqa: E402
+import send_scheduler  # noqa: E402
+
+API_PORT = 8768
+
+async def _send(bot, chat_id: int, text: str, priority, failures: list):
+    started = time.perf_counter()
+    kwargs = {"rate_limit_args": priority} if priority is not None else {}
+    try:
+        await bot.send_message(chat_id, text, **kwargs)
+    except RetryAfter:
+        failures.append(chat_id)
+        return None
+    return (time.perf_counter() - started) * 1000
+
+async def _interactive(bot, count: int, rate: float, scheduled: bool, failures: list):
+    tasks = []
+    for i in range(count):
+        priority = send_scheduler.INTERACTIVE if scheduled else None
+        tasks.append(asyncio.create_task(_send(bot, 500 + i, f"reply {i}", priority, failures)))
+        await asyncio.sleep(1 / rate)
+    return await asyncio.gather(*tasks)
+
+async def run_mode(mode: str, args):
+    api = FakeBotAPI(port=API_PORT, flood_rate=args.flood_rate, chat_flood_rate=args.chat_flood_rate)
+    await api.start()
+    scheduled = mode == "scheduler"
+    rate_limiter = send_scheduler.SendScheduler() if scheduled else None
+    bot = ExtBot("1:bench", base_url=f"{api.base_url}/bot", rate_limiter=rate_limiter)
+    failures = []
+    try:
+        async with bot:
+            started = time.perf_counter()
+            bulk_priority = send_scheduler.BULK if scheduled else None
+            broadcast = asyncio.gather(*(
+                _send(bot, 10000 + i, f"daily report {i}", bulk_priority, failures)
+                for i in range(args.broadcast)
+            ))
+            interactive = await _interactive(bot, args.interactive, args.interactive_rate, scheduled, failures)
+            await broadcast
+            elapsed = time.perf_counter() - started
+    finally:
+        await api.stop()
+    latencies = sorted(latency for latency in interactive if latency is not None)
+    return len(api.sent), len(failures), api.rejected, elapsed, latencies
+
+def _percentile(values, percent: float):
+    return values[min(len(values) - 1, int(len(values) * percent / 100))] if values else float("nan")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--broadcast", type=int, default=300)
+    parser.add_argument("--interactive", type=int, default=100)
+    parser.add_argument("--interactive-rate", type=float, default=20, help="Інтерактивних відповідей за секунду")
+    parser.add_argument("--flood-rate", type=float, default=30, help="Ліміт Bot API, повідомлень за секунду")
+    parser.add_argument("--chat-flood-rate", type=float, default=4, help="Ліміт Bot API на чат за секунду")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    print(f"розсилка={args.broadcast}, інтерактивних={args.interactive} ({args.interactive_rate}/с), "
+          f"ліміт API={args.flood_rate}/с, на чат={args.chat_flood_rate}/с")
+    print(f"{'режим':<10} {'доставлено':>10} {'невдалих':>9} {'429':>6} {'час, с':>7} "
+          f"{'інтеракт. p50, мс':>18} {'p95, мс':>8}")
+    for mode in ("direct", "scheduler"):
+        sent, failed, rejected, elapsed, latencies = asyncio.run(run_mode(mode, args))
+        print(f"{mode:<10} {sent:>10} {failed:>9} {rejected:>6} {elapsed:>7.1f} "
+              f"{_percentile(latencies, 50):>18.1f} {_percentile(latencies, 95):>8.1f}")
+
+if __name__ == "__main__":
+    main()
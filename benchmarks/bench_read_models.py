@@ -0,0 +1,114 @@
+"""ORM-сутності проти read_models на великих вибірках: час і пікова пам'ять.
+
+Запуск: python benchmarks/bench_read_models.py [--sizes 1000 10000 100000] [--repeat 3]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from database import Base, Goal, Transaction, create_db_engine  # noqa: E402
+import read_models  # noqa: E402
+from read_models import GoalRecord, TransactionRecord  # noqa: E402
+
+USER_ID = 1000
+CATEGORIES = ["їжа", "транспорт", "розваги", "житло", "здоров'я"]
+
+def _seed(engine, rows: int):
+    Base.metadata.create_all(engine)
+    rng = random.Random(42)
+    start = date.today() - timedelta(days=365)
+    with engine.begin() as conn:
+        conn.execute(insert(Transaction), [
+            {
+                "user_id": USER_ID,
+                "amount": round(rng.uniform(10, 500), 2),
+                "type": "expense",
+                "category": rng.choice(CATEGORIES),
+                "description": f"опис {i}",
+                "date": start + timedelta(days=i % 365),
+            }
+            for i in range(rows)
+        ])
+        conn.execute(insert(Goal), [
+            {
+                "user_id": USER_ID,
+                "name": f"ціль {i}",
+                "target_amount": 10000.0,
+                "current_amount": rng.uniform(0, 10000),
+                "deposits": 0.0,
+                "months": 12,
+            }
+            for i in range(rows // 10)
+        ])
+
+def _orm_transactions(session, rows):
+    return session.query(Transaction).filter_by(user_id=USER_ID).order_by(Transaction.date.desc()).limit(rows).all()
+
+def _orm_goals(session, rows):
+    return session.query(Goal).filter_by(user_id=USER_ID).all()
+
+def _record_transactions(session, rows):
+    return read_models.fetch_all(session, read_models.transactions_select(USER_ID, rows), TransactionRecord)
+
+def _record_goals(session, rows):
+    return read_models.fetch_all(session, read_models.goals_select(USER_ID), GoalRecord)
+
+def _measure(Session, fetch, rows: int, repeat: int):
+    """(найкращий час у мс, пікова пам'ять у КБ) для одного запиту з форматуванням."""
+    best = None
+    for _ in range(repeat):
+        session = Session()
+        gc.collect()
+        started = time.perf_counter()
+        result = fetch(session, rows)
+        # Як у обробниках: кожен рядок перетворюється на текст
+        text = "".join(f"{item.id}:{item.amount if hasattr(item, 'amount') else item.name}\n" for item in result)
+        elapsed = (time.perf_counter() - started) * 1000
+        session.close()
+        best = elapsed if best is None else min(best, elapsed)
+    del result, text
+
+    session = Session()
+    gc.collect()
+    tracemalloc.start()
+    fetch(session, rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    session.close()
+    return best, peak / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cases = [
+        ("transactions", _orm_transactions, _record_transactions),
+        ("goals", _orm_goals, _record_goals),
+    ]
+    print(f"{'запит':<14} {'рядків':>8} {'ORM, мс':>9} {'записи, мс':>11} {'ORM, КБ':>10} {'записи, КБ':>11}")
+    for rows in args.sizes:
+        with tempfile.TemporaryDirectory(prefix="finwise_read_models_") as tmpdir:
+            engine = create_db_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+            _seed(engine, rows)
+            Session = sessionmaker(bind=engine, expire_on_commit=False)
+            for name, orm_fetch, record_fetch in cases:
+                count = rows if name == "transactions" else rows // 10
+                orm_ms, orm_kb = _measure(Session, orm_fetch, rows, args.repeat)
+                record_ms, record_kb = _measure(Session, record_fetch, rows, args.repeat)
+                print(f"{name:<14} {count:>8} {orm_ms:>9.1f} {record_ms:>11.1f} {orm_kb:>10.0f} {record_kb:>11.0f}")
+            engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Пропускна здатність запису залежно від кількості шардів SQLite.
+
+Кожна операція — як _add_transaction: вставка транзакції та оновлення агрегатів
+в одному коміті в шарді користувача.
+
+Потоки одного процесу впираються в GIL, тому за замовчуванням писачі — окремі
+процеси (як воркери бота), і видно саме конкуренцію за блокування запису SQLite.
+
+Запуск: python benchmarks/bench_sharding.py [--shards 1 2 4 8] [--workers 8] [--ops 4000] [--profile wal] [--threads]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from database import Base, STORAGE_PROFILES, Transaction, create_db_engine, shard_for  # noqa: E402
+import aggregates  # noqa: E402
+
+USERS = 1000
+CATEGORIES = ["їжа", "транспорт", "розваги", "житло", "здоров'я"]
+
+def _worker(session_factories, ops: int, errors: list):
+    rng = random.Random()
+    for _ in range(ops):
+        user_id = 1000 + rng.randrange(USERS)
+        amount = round(rng.uniform(10, 500), 2)
+        category = rng.choice(CATEGORIES)
+        now = datetime.now()
+        session = session_factories[shard_for(user_id, len(session_factories))]()
+        try:
+            session.add(Transaction(user_id=user_id, amount=amount, type="expense", category=category, date=now))
+            aggregates.apply_transaction(session, user_id, "expense", category, amount, now)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            errors.append(e)
+        finally:
+            session.close()
+
+def _open_shards(paths, profile: str, pool_size: int):
+    engines = [create_db_engine(f"sqlite:///{path}", profile=profile, pool_size=pool_size) for path in paths]
+    return engines, [sessionmaker(bind=shard_engine, expire_on_commit=False) for shard_engine in engines]
+
+def _process_worker(paths, profile: str, ops: int, start, results):
+    engines, session_factories = _open_shards(paths, profile, 1)
+    errors = []
+    start.wait()
+    _worker(session_factories, ops, errors)
+    for shard_engine in engines:
+        shard_engine.dispose()
+    results.put(len(errors))
+
+def run(shards: int, workers: int, ops: int, profile: str, use_threads: bool = False):
+    with tempfile.TemporaryDirectory(prefix="finwise_shards_") as tmpdir:
+        paths = [os.path.join(tmpdir, f"shard_{shard}.db") for shard in range(shards)]
+        engines, session_factories = _open_shards(paths, profile, workers)
+        for shard_engine in engines:
+            Base.metadata.create_all(shard_engine)
+
+        if use_threads:
+            errors = []
+            writers = [
+                threading.Thread(target=_worker, args=(session_factories, ops // workers, errors))
+                for _ in range(workers)
+            ]
+            started = time.perf_counter()
+            for writer in writers:
+                writer.start()
+            for writer in writers:
+                writer.join()
+            elapsed = time.perf_counter() - started
+            error_count = len(errors)
+        else:
+            start = multiprocessing.Event()
+            results = multiprocessing.Queue()
+            writers = [
+                multiprocessing.Process(target=_process_worker, args=(paths, profile, ops // workers, start, results))
+                for _ in range(workers)
+            ]
+            for writer in writers:
+                writer.start()
+            time.sleep(1)  # процеси імпортують модулі й відкривають з'єднання до старту відліку
+            started = time.perf_counter()
+            start.set()
+            error_count = sum(results.get() for _ in writers)
+            elapsed = time.perf_counter() - started
+            for writer in writers:
+                writer.join()
+
+        for shard_engine in engines:
+            shard_engine.dispose()
+        return (ops // workers) * workers / elapsed, error_count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, nargs="*", default=[1, 2, 4, 8])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--threads", action="store_true", help="Писачі — потоки одного процесу")
+    parser.add_argument("--ops", type=int, default=4000)
+    parser.add_argument("--profile", choices=list(STORAGE_PROFILES), default="wal")
+    args = parser.parse_args()
+
+    print(f"писачів={args.workers} ({'потоки' if args.threads else 'процеси'}), записів={args.ops}, профіль={args.profile}")
+    print(f"{'шардів':>7} {'записів/с':>11} {'помилок':>8}")
+    for shards in args.shards:
+        rate, errors = run(shards, args.workers, args.ops, args.profile, args.threads)
+        print(f"{shards:>7} {rate:>11.1f} {errors:>8}")
+
+if __name__ == "__main__":
+    main()
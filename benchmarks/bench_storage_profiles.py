@@ -0,0 +1,95 @@
+"""Змішане навантаження читання/запису для кожного профілю зберігання SQLite.
+
+Запуск: python benchmarks/bench_storage_profiles.py [--threads 8] [--ops 2000] [--write-ratio 0.2]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert, select  # noqa: E402
+from database import Base, STORAGE_PROFILES, Transaction, create_db_engine  # noqa: E402
+
+USERS = 200
+CATEGORIES = ["їжа", "транспорт", "розваги", "житло", "здоров'я"]
+
+def _seed(engine, rows: int):
+    Base.metadata.create_all(engine)
+    start = date.today() - timedelta(days=365)
+    with engine.begin() as conn:
+        conn.execute(insert(Transaction), [
+            {
+                "user_id": 1000 + i % USERS,
+                "amount": round(random.uniform(10, 500), 2),
+                "type": "expense",
+                "category": random.choice(CATEGORIES),
+                "date": start + timedelta(days=i % 365),
+            }
+            for i in range(rows)
+        ])
+
+def _worker(engine, ops: int, write_ratio: float, errors: list):
+    rng = random.Random()
+    for _ in range(ops):
+        user_id = 1000 + rng.randrange(USERS)
+        try:
+            if rng.random() < write_ratio:
+                with engine.begin() as conn:
+                    conn.execute(insert(Transaction).values(
+                        user_id=user_id,
+                        amount=rng.uniform(10, 500),
+                        type="expense",
+                        category=rng.choice(CATEGORIES),
+                        date=date.today()
+                    ))
+            else:
+                with engine.connect() as conn:
+                    conn.execute(
+                        select(Transaction.category, func.sum(Transaction.amount))
+                        .where(Transaction.user_id == user_id)
+                        .group_by(Transaction.category)
+                    ).all()
+        except Exception as e:
+            errors.append(e)
+
+def run_profile(profile: str, threads: int, ops: int, write_ratio: float, seed_rows: int):
+    with tempfile.TemporaryDirectory(prefix="finwise_profile_") as tmpdir:
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}", profile=profile, pool_size=threads)
+        _seed(engine, seed_rows)
+        errors = []
+        workers = [
+            threading.Thread(target=_worker, args=(engine, ops // threads, write_ratio, errors))
+            for _ in range(threads)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        engine.dispose()
+        return (ops // threads) * threads / elapsed, len(errors)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--seed-rows", type=int, default=20000)
+    parser.add_argument("--profiles", nargs="*", default=list(STORAGE_PROFILES))
+    args = parser.parse_args()
+
+    print(f"потоків={args.threads}, операцій={args.ops}, частка записів={args.write_ratio}")
+    print(f"{'профіль':<10} {'операцій/с':>12} {'помилок':>8}")
+    for profile in args.profiles:
+        rate, errors = run_profile(profile, args.threads, args.ops, args.write_ratio, args.seed_rows)
+        print(f"{profile:<10} {rate:>12.1f} {errors:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Послідовна обробка оновлень проти PerUserUpdateProcessor на змішаному навантаженні.
+
+Частина користувачів надсилає «повільні» запити (--slow-ms, як звернення до
+Ollama чи важкий звіт), решта — швидкі /ping. Міряється затримка відповіді
+на швидкі запити і перевіряється, що відповіді кожному користувачу прийшли
+в порядку надсилання.
+
+Запуск: python benchmarks/bench_update_processor.py [--updates 1000] [--slow-users 5] [--slow-ms 2000]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telegram.ext import Application, CommandHandler  # noqa: E402
+from fake_bot_api import FakeBotAPI, make_message_update  # noqa: E402
+from update_processor import PerUserUpdateProcessor  # noqa: E402
+
+API_PORT = 8767
+USERS = 100
+
+async def run_mode(mode: str, updates: int, slow_users: int, slow_ms: float, rate: float):
+    api = FakeBotAPI(port=API_PORT)
+    await api.start()
+    pushed, replies = {}, []
+    api.on_send = lambda method, params: replies.append((time.perf_counter(), int(params["chat_id"]), params["text"]))
+
+    async def ping(update, context):
+        await update.message.reply_text(context.args[0])
+
+    async def slow(update, context):
+        await asyncio.sleep(slow_ms / 1000)
+        await update.message.reply_text(context.args[0])
+
+    builder = Application.builder().token("1:bench").base_url(f"{api.base_url}/bot")
+    if mode == "per-user":
+        builder = builder.concurrent_updates(PerUserUpdateProcessor())
+    application = builder.build()
+    application.add_handler(CommandHandler("ping", ping))
+    application.add_handler(CommandHandler("slow", slow))
+
+    await application.initialize()
+    await application.updater.start_polling(poll_interval=0.0, timeout=10)
+    await application.start()
+    try:
+        for i in range(1, updates + 1):
+            user_id = 1000 + i % USERS
+            command = "slow" if user_id - 1000 < slow_users else "ping"
+            pushed[str(i)] = (time.perf_counter(), command)
+            await api.push_update(make_message_update(i, user_id, f"/{command} {i}"))
+            await asyncio.sleep(1 / rate)
+        deadline = time.perf_counter() + 600
+        while len(replies) < updates and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+    finally:
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+        await api.stop()
+
+    fast = sorted((at - pushed[text][0]) * 1000 for at, _, text in replies if pushed[text][1] == "ping")
+    last_seen = {}
+    out_of_order = 0
+    for _, user_id, text in replies:
+        if int(text) < last_seen.get(user_id, 0):
+            out_of_order += 1
+        last_seen[user_id] = int(text)
+    return fast, out_of_order, len(replies)
+
+def _percentile(values, percent: float):
+    return values[min(len(values) - 1, int(len(values) * percent / 100))] if values else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--slow-users", type=int, default=5)
+    parser.add_argument("--slow-ms", type=float, default=2000)
+    parser.add_argument("--rate", type=float, default=200, help="Оновлень за секунду")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    print(f"оновлень={args.updates}, повільних користувачів={args.slow_users}/{USERS}, "
+          f"повільний запит={args.slow_ms} мс, частота={args.rate}/с")
+    print(f"{'режим':<11} {'відповідей':>10} {'швидкі p50, мс':>15} {'p95, мс':>9} {'не по порядку':>14}")
+    for mode in ("sequential", "per-user"):
+        fast, out_of_order, count = asyncio.run(run_mode(mode, args.updates, args.slow_users, args.slow_ms, args.rate))
+        print(f"{mode:<11} {count:>10} {_percentile(fast, 50):>15.1f} {_percentile(fast, 95):>9.1f} {out_of_order:>14}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Long polling проти вебхука: затримка від надходження оновлення до відповіді й пропускна здатність.
+
+Бот (python-telegram-bot) працює з локальною заміною Bot API
+(fake_bot_api.py): /ping N відповідає N. Оновлення подаються з частотою
+--rate на секунду (0 — усі одразу); затримка — від появи оновлення в
+Bot API до отримання sendMessage. --latency-ms імітує затримку мережі до
+Telegram в один бік. Щоб порівнювався саме транспорт, а не черга обробки,
+бот обробляє до --concurrent-updates оновлень одночасно.
+
+Запуск: python benchmarks/bench_webhook.py [--updates 500] [--rate 100] [--handler-ms 0] [--latency-ms 0] [--concurrent-updates 64]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telegram.ext import Application, CommandHandler  # noqa: E402
+from fake_bot_api import FakeBotAPI, make_message_update  # noqa: E402
+import webhook  # noqa: E402
+
+API_PORT = 8765
+WEBHOOK_PORT = 8766
+SECRET = "bench-secret"
+USERS = 50
+
+def build_application(api: FakeBotAPI, handler_ms: float, concurrent_updates: int):
+    async def ping(update, context):
+        if handler_ms:
+            await asyncio.sleep(handler_ms / 1000)
+        await update.message.reply_text(context.args[0])
+
+    application = (
+        Application.builder()
+        .token("1:bench")
+        .base_url(f"{api.base_url}/bot")
+        .concurrent_updates(concurrent_updates if concurrent_updates > 1 else False)
+        .build()
+    )
+    application.add_handler(CommandHandler("ping", ping))
+    return application
+
+async def _feed(api: FakeBotAPI, updates: int, rate: float, pushed: dict):
+    tasks = []
+    for i in range(1, updates + 1):
+        pushed[str(i)] = time.perf_counter()
+        update = make_message_update(i, 1000 + i % USERS, f"/ping {i}")
+        tasks.append(asyncio.create_task(api.push_update(update)))
+        if rate:
+            await asyncio.sleep(1 / rate)
+    statuses = await asyncio.gather(*tasks)
+    rejected = sum(1 for status in statuses if status != 200)
+    if rejected:
+        print(f"  відхилено доставок: {rejected}")
+
+async def _wait_replies(replied: dict, updates: int, timeout: float = 120):
+    deadline = time.perf_counter() + timeout
+    while len(replied) < updates and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+
+async def run_mode(mode: str, updates: int, rate: float, handler_ms: float, latency_ms: float, concurrent_updates: int):
+    api = FakeBotAPI(port=API_PORT, latency=latency_ms / 1000)
+    await api.start()
+    pushed, replied = {}, {}
+    api.on_send = lambda method, params: replied.setdefault(str(params.get("text")), time.perf_counter())
+    application = build_application(api, handler_ms, concurrent_updates)
+    try:
+        if mode == "polling":
+            await application.initialize()
+            await application.updater.start_polling(poll_interval=0.0, timeout=10)
+            await application.start()
+            await _feed(api, updates, rate, pushed)
+            await _wait_replies(replied, updates)
+            await application.updater.stop()
+            await application.stop()
+            await application.shutdown()
+        else:
+            stop_event = asyncio.Event()
+            server = asyncio.create_task(webhook.serve_webhook(
+                application,
+                webhook_url=f"http://127.0.0.1:{WEBHOOK_PORT}/telegram",
+                secret_token=SECRET,
+                listen="127.0.0.1",
+                port=WEBHOOK_PORT,
+                path="/telegram",
+                stop_event=stop_event
+            ))
+            while api.webhook is None:
+                await asyncio.sleep(0.01)
+            await _feed(api, updates, rate, pushed)
+            await _wait_replies(replied, updates)
+            stop_event.set()
+            await server
+    finally:
+        await api.stop()
+
+    latencies = sorted((replied[key] - pushed[key]) * 1000 for key in replied if key in pushed)
+    elapsed = max(replied.values()) - min(pushed.values())
+    return len(latencies), latencies, elapsed
+
+def _percentile(values, percent: float):
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=100, help="Оновлень за секунду, 0 — усі одразу")
+    parser.add_argument("--handler-ms", type=float, default=0, help="Імітація роботи обробника")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Затримка мережі до Bot API в один бік")
+    parser.add_argument("--concurrent-updates", type=int, default=64, help="1 — послідовна обробка")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    print(f"оновлень={args.updates}, частота={args.rate or 'усі одразу'}/с, обробник={args.handler_ms} мс, "
+          f"мережа={args.latency_ms} мс, паралельно={args.concurrent_updates}")
+    print(f"{'режим':<8} {'відповідей':>10} {'p50, мс':>8} {'p95, мс':>8} {'max, мс':>8} {'оновл./с':>9}")
+    for mode in ("polling", "webhook"):
+        count, latencies, elapsed = asyncio.run(run_mode(
+            mode, args.updates, args.rate, args.handler_ms, args.latency_ms, args.concurrent_updates
+        ))
+        print(f"{mode:<8} {count:>10} {_percentile(latencies, 50):>8.1f} {_percentile(latencies, 95):>8.1f} "
+              f"{latencies[-1]:>8.1f} {count / elapsed:>9.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Пропускна здатність BOT_MODE=workers залежно від кількості процесів-обробників.
+
+Диспетчер і обробники з workers.py працюють з локальною заміною Bot API
+(fake_bot_api.py). Кожен обробник запускає обробники бота з
+main.setup_handlers і додатково /work — CPU-навантаження, схоже на
+підготовку аналітики: --work разів серіалізує й розбирає JSON зі
+звітом на рік транзакцій. Оновлення від --users користувачів подаються
+всі одразу; міряється час до останньої відповіді.
+
+Приріст видно лише на машині з кількома ядрами: на одному ядрі процеси
+ділять той самий процесорний час.
+
+Запуск: python benchmarks/bench_workers.py [--updates 2000] [--workers 1,2,4,8] [--work 20]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+API_PORT = 8769
+TOKEN = "1:bench"
+REPORT = {
+    "transactions": [
+        {"date": f"2024-{month:02d}-{day:02d}", "type": "expense", "category": f"cat{day % 7}",
+         "amount": day * 10.5, "description": "bench"}
+        for month in range(1, 13) for day in range(1, 29)
+    ]
+}
+
+async def work(update, context):
+    rounds = int(context.args[1])
+    for _ in range(rounds):
+        report = json.loads(json.dumps(REPORT))
+    total = sum(item["amount"] for item in report["transactions"]) if rounds else 0
+    await update.message.reply_text(f"{context.args[0]} {total:.0f}")
+
+def setup_handlers(application):
+    """Обробники бота плюс /work; виконується в кожному процесі-обробнику."""
+    from telegram.ext import CommandHandler
+    import main
+    logging.getLogger().setLevel(logging.WARNING)
+    main.setup_handlers(application)
+    application.add_handler(CommandHandler("work", work))
+
+async def run_mode(workers_count: int, updates: int, users: int, rounds: int):
+    from fake_bot_api import FakeBotAPI, make_message_update
+    import workers
+
+    api = FakeBotAPI(port=API_PORT)
+    await api.start()
+    replies = set()
+    api.on_send = lambda method, params: replies.add(str(params.get("text", "")).split()[0])
+    stop_event = asyncio.Event()
+    server = asyncio.create_task(workers.serve_workers(
+        TOKEN, count=workers_count, base_url=f"{api.base_url}/bot",
+        setup="bench_workers:setup_handlers", stop_event=stop_event
+    ))
+    try:
+        # Прогрів: кожен користувач по разу, щоб усі процеси запустилися й прочитали свій стан
+        for user in range(users):
+            await api.push_update(make_message_update(user + 1, 1000 + user, f"/work w{user} 0"))
+        await _wait(replies, users)
+        replies.clear()
+
+        started = time.perf_counter()
+        for i in range(updates):
+            update_id = users + i + 1
+            await api.push_update(make_message_update(update_id, 1000 + i % users, f"/work {i} {rounds}"))
+        await _wait(replies, updates)
+        elapsed = time.perf_counter() - started
+    finally:
+        stop_event.set()
+        await server
+        await api.stop()
+    return len(replies), elapsed
+
+async def _wait(replies: set, count: int, timeout: float = 600):
+    deadline = time.perf_counter() + timeout
+    while len(replies) < count and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--workers", default="1,2,4,8", help="Кількості процесів через кому")
+    parser.add_argument("--work", type=int, default=20, help="Повторів серіалізації звіту на оновлення")
+    args = parser.parse_args()
+
+    # БД, журнал і стан бота — у тимчасовому каталозі; обробники успадковують його
+    os.chdir(tempfile.mkdtemp(prefix="bench_workers_"))
+    # Міряється обробка, а не ліміти Telegram, які SendScheduler дотримується в кожному процесі
+    os.environ.setdefault("SEND_GLOBAL_RATE", "100000")
+    os.environ.setdefault("SEND_GLOBAL_BURST", "100000")
+    os.environ.setdefault("SEND_CHAT_RATE", "100000")
+    os.environ.setdefault("SEND_CHAT_BURST", "100000")
+    logging.basicConfig(level=logging.WARNING)
+
+    print(f"оновлень={args.updates}, користувачів={args.users}, навантаження={args.work}, ядер={os.cpu_count()}")
+    print(f"{'процесів':>8} {'відповідей':>10} {'час, с':>7} {'оновл./с':>9} {'прискорення':>12}")
+    baseline = None
+    for count in (int(value) for value in args.workers.split(",")):
+        replied, elapsed = asyncio.run(run_mode(count, args.updates, args.users, args.work))
+        rate = replied / elapsed
+        baseline = baseline or rate
+        print(f"{count:>8} {replied:>10} {elapsed:>7.1f} {rate:>9.0f} {rate / baseline:>11.2f}x")
+
+if __name__ == "__main__":
+    main()
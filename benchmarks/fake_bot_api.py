@@ -0,0 +1,168 @@
+"""Локальна заміна Telegram Bot API для бенчмарків без мережі й токена.
+
+Підтримує методи, потрібні боту на python-telegram-bot: getMe, getUpdates
+(long polling), setWebhook/deleteWebhook, sendMessage та інші send*
+(повертають повідомлення). Оновлення додаються через push_update:
+у режимі polling вони віддаються з getUpdates, у режимі вебхука —
+надсилаються POST-запитом на встановлену адресу з секретним заголовком.
+
+Затримка мережі до серверів Telegram імітується параметром latency
+(секунди в один бік): на неї відкладаються обробка кожного запиту до API,
+відповідь на нього і доставка вебхука.
+
+Ліміти Telegram імітуються параметрами flood_rate (повідомлень на секунду
+від бота загалом) і chat_flood_rate (на секунду в один чат): запит понад
+ліміт за останню секунду отримує 429 з retry_after. Такі відмови
+лічаться в rejected.
+
+Використання: base_url бота — f"{api.base_url}/bot".
+"""
+import asyncio
+import itertools
+import time
+from collections import deque
+from aiohttp import ClientSession, web
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "FinWise Owl", "username": "finwise_owl_bot"}
+
+def make_message_update(update_id: int, user_id: int, text: str):
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "User"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
+
+class FakeBotAPI:
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, latency: float = 0.0,
+                 flood_rate: float = None, chat_flood_rate: float = None, retry_after: int = 1):
+        self.host = host
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.chat_flood_rate = chat_flood_rate
+        self.retry_after = retry_after
+        self.rejected = 0
+        self._recent = deque()  # час прийнятих повідомлень за останню секунду
+        self._recent_by_chat = {}
+        self.port = port
+        self.base_url = f"http://{host}:{port}"
+        self.webhook = None  # (url, secret_token, max_connections)
+        self.sent = []  # (час отримання, метод, параметри)
+        self.on_send = None  # необов'язковий колбек(метод, параметри)
+        self._updates = []
+        self._new_update = asyncio.Condition()
+        self._message_ids = itertools.count(1)
+        self._runner = None
+        self._client = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        app.router.add_get("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self._client = ClientSession()
+
+    async def stop(self):
+        if self._client is not None:
+            await self._client.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def push_update(self, update: dict):
+        """Доставляє оновлення боту: через вебхук, якщо він встановлений, інакше в чергу getUpdates."""
+        if self.webhook is not None:
+            url, secret_token, _ = self.webhook
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            headers = {"X-Telegram-Bot-Api-Secret-Token": secret_token} if secret_token else {}
+            async with self._client.post(url, json=update, headers=headers) as response:
+                return response.status
+        async with self._new_update:
+            self._updates.append(update)
+            self._new_update.notify_all()
+        return 200
+
+    async def _params(self, request: web.Request):
+        params = dict(request.query)
+        if request.can_read_body:
+            if request.content_type == "application/json":
+                params.update(await request.json())
+            else:
+                params.update(await request.post())
+        return params
+
+    async def _handle(self, request: web.Request):
+        method = request.match_info["method"]
+        params = await self._params(request)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        handler = getattr(self, f"_api_{method}", None)
+        if handler is None and method.startswith("send"):
+            handler = self._api_sendMessage
+        if handler == self._api_sendMessage and self._flooded(params.get("chat_id")):
+            self.rejected += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after}
+            }, status=429)
+        result = await handler(method, params) if handler is not None else True
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.json_response({"ok": True, "result": result})
+
+    def _flooded(self, chat_id):
+        now = time.perf_counter()
+        chat = self._recent_by_chat.setdefault(str(chat_id), deque())
+        for window in (self._recent, chat):
+            while window and now - window[0] >= 1:
+                window.popleft()
+        if self.flood_rate and len(self._recent) >= self.flood_rate:
+            return True
+        if self.chat_flood_rate and len(chat) >= self.chat_flood_rate:
+            return True
+        self._recent.append(now)
+        chat.append(now)
+        return False
+
+    async def _api_getMe(self, method, params):
+        return BOT_USER
+
+    async def _api_setWebhook(self, method, params):
+        self.webhook = (params["url"], params.get("secret_token"), int(params.get("max_connections", 40)))
+        return True
+
+    async def _api_deleteWebhook(self, method, params):
+        self.webhook = None
+        return True
+
+    async def _api_getUpdates(self, method, params):
+        offset = int(params.get("offset", 0) or 0)
+        timeout = float(params.get("timeout", 0) or 0)
+        async with self._new_update:
+            self._updates = [update for update in self._updates if update["update_id"] >= offset]
+            if not self._updates and timeout:
+                try:
+                    await asyncio.wait_for(self._new_update.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            return list(self._updates[:int(params.get("limit", 100) or 100)])
+
+    async def _api_sendMessage(self, method, params):
+        self.sent.append((time.perf_counter(), method, params))
+        if self.on_send is not None:
+            self.on_send(method, params)
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+            "from": BOT_USER,
+            "text": str(params.get("text", "")),
+        }
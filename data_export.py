@@ -0,0 +1,75 @@
+"""Потоковий експорт даних користувача у CSV або JSONL, за бажанням стиснутий gzip.
+
+Дані надходять розділами (транзакції, бюджети, цілі) як генератори сторінок
+рядків і пишуться одразу у SpooledTemporaryFile: доки файл менший за
+EXPORT_SPOOL_MB, він у пам'яті, далі — на диску. Уся історія в пам'яті не
+тримається.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from collections import namedtuple
+from datetime import date
+
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_SPOOL_BYTES = int(os.getenv("EXPORT_SPOOL_MB", "8")) * 1024 * 1024
+
+# Розділ експорту: назва запису, назви полів і генератор сторінок рядків-кортежів
+ExportSection = namedtuple("ExportSection", "name fields pages")
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+def _write_csv(text, sections):
+    """Кожен розділ — рядок з назвою, заголовок і рядки; розділи відокремлені порожнім рядком."""
+    writer = csv.writer(text)
+    rows = 0
+    for index, section in enumerate(sections):
+        if index:
+            writer.writerow([])
+        writer.writerow([section.name])
+        writer.writerow(section.fields)
+        for page in section.pages:
+            writer.writerows(page)
+            rows += len(page)
+    return rows
+
+def _write_jsonl(text, sections):
+    """Один JSON-об'єкт на рядок з полем record, що вказує розділ."""
+    rows = 0
+    for section in sections:
+        for page in section.pages:
+            for row in page:
+                record = {"record": section.name}
+                record.update(zip(section.fields, map(_json_value, row)))
+                text.write(json.dumps(record, ensure_ascii=False))
+                text.write("\n")
+            rows += len(page)
+    return rows
+
+WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl}
+
+def export_to_spool(sections, export_format: str, compress: bool = False):
+    """Пише розділи у тимчасовий файл. Повертає (файл на початку, кількість рядків)."""
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES, prefix="finwise_export_")
+    try:
+        binary = gzip.GzipFile(fileobj=spool, mode="wb") if compress else spool
+        text = io.TextIOWrapper(binary, encoding="utf-8", newline="")
+        rows = WRITERS[export_format](text, sections)
+        text.flush()
+        text.detach()
+        if compress:
+            # Закриття GzipFile дописує кінець потоку, але не закриває spool
+            binary.close()
+        spool.seek(0)
+        return spool, rows
+    except Exception:
+        spool.close()
+        raise
+
+def export_filename(export_format: str, compress: bool, day: date = None) -> str:
+    day = day or date.today()
+    return f"finwise_{day.isoformat()}.{export_format}{'.gz' if compress else ''}"
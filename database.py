@@ -1,13 +1,34 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, ForeignKey, BigInteger
+from sqlalchemy import bindparam, create_engine, event, inspect, select, text, Column, Integer, String, Text, Float, Date, DateTime, ForeignKey, BigInteger, Index
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import asyncio
+import functools
 import os
 import logging
+import zlib
 
 logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
+def month_key(value) -> str:
+    """Ключ місяця 'YYYY-MM' для дати транзакції."""
+    return value.strftime("%Y-%m")
+
+def week_key(value) -> str:
+    """Ключ ISO-тижня 'YYYY-Www' (тиждень з понеділка) для дати транзакції."""
+    year, week, _ = value.isocalendar()
+    return f"{year}-W{week:02d}"
+
+def _period_default(key_func):
+    """Значення за замовчуванням, обчислене з колонки date того ж рядка."""
+    def default(context):
+        value = context.get_current_parameters().get("date")
+        return key_func(value) if value is not None else None
+    return default
+
 class User(Base):
     __tablename__ = 'users'
     
@@ -34,8 +55,21 @@ class Transaction(Base):
     category = Column(String(64), nullable=False)
     description = Column(String(256), nullable=True)
     date = Column(Date, default=datetime.now)
+    # Ключі періодів зберігаються при вставці, щоб звіти не обчислювали їх для кожного рядка
+    month = Column(String(7), default=_period_default(month_key))
+    week = Column(String(8), default=_period_default(week_key))
     
     user = relationship("User", back_populates="transactions")
+    
+    __table_args__ = (
+        # Історія користувача, відсортована за датою
+        Index('ix_transactions_user_date', 'user_id', 'date'),
+        # Покриваючий індекс для звітів за період: діапазон дат у межах (user_id, type)
+        Index('ix_transactions_user_type_date_category_amount', 'user_id', 'type', 'date', 'category', 'amount'),
+        # Покриваючі індекси для звітів за календарний місяць і тиждень
+        Index('ix_transactions_user_type_month_category_amount', 'user_id', 'type', 'month', 'category', 'amount'),
+        Index('ix_transactions_user_type_week_category_amount', 'user_id', 'type', 'week', 'category', 'amount'),
+    )
 
 class Budget(Base):
     __tablename__ = 'budgets'
@@ -65,13 +99,316 @@ class Goal(Base):
     
     user = relationship("User", back_populates="goals")
 
+class UserBalance(Base):
+    """Підсумки по користувачу, які add_transaction оновлює в тому ж коміті."""
+    __tablename__ = "user_balances"
+    
+    user_id = Column(BigInteger, ForeignKey('users.id'), primary_key=True)
+    income_total = Column(Float, nullable=False, default=0.0)
+    expense_total = Column(Float, nullable=False, default=0.0)
+    goal_deposit_total = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+class MonthlyRollup(Base):
+    """Суми та кількість транзакцій по (користувач, місяць, тип, категорія)."""
+    __tablename__ = "monthly_rollups"
+    
+    user_id = Column(BigInteger, ForeignKey('users.id'), primary_key=True)
+    month = Column(String(7), primary_key=True)  # 'YYYY-MM'
+    type = Column(String(16), primary_key=True)
+    category = Column(String(64), primary_key=True)
+    total = Column(Float, nullable=False, default=0.0)
+    count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        # Звіти за типом (усі витрати по місяцях/категоріях) без сканування інших типів
+        Index('ix_monthly_rollups_user_type_month', 'user_id', 'type', 'month', 'category', 'total'),
+    )
+
+class DailyPrefixSum(Base):
+    """Накопичені від початку історії сума й кількість по (користувач, тип, категорія) на кінець дня.
+
+    Рядок є лише для днів з транзакціями; сума за будь-який діапазон дат —
+    різниця двох рядків, знайдених пошуком по первинному ключу.
+    """
+    __tablename__ = "daily_prefix_sums"
+    
+    user_id = Column(BigInteger, ForeignKey('users.id'), primary_key=True)
+    type = Column(String(16), primary_key=True)
+    category = Column(String(64), primary_key=True)
+    day = Column(Date, primary_key=True)
+    total = Column(Float, nullable=False, default=0.0)
+    count = Column(Integer, nullable=False, default=0)
+
+class ArchivedDailyTotal(Base):
+    """Денні суми транзакцій, перенесених в архів (archive.py).
+
+    Оновлюється в тому ж коміті, що й видалення рядків з transactions, тому
+    перевірка й перебудова агрегатів враховують і архівну частину історії.
+    """
+    __tablename__ = "archived_daily_totals"
+    
+    user_id = Column(BigInteger, ForeignKey('users.id'), primary_key=True)
+    type = Column(String(16), primary_key=True)
+    category = Column(String(64), primary_key=True)
+    day = Column(Date, primary_key=True)
+    month = Column(String(7), nullable=False)
+    total = Column(Float, nullable=False, default=0.0)
+    count = Column(Integer, nullable=False, default=0)
+
+class UserState(Base):
+    """user_data користувача з python-telegram-bot (persistence.py), серіалізований у JSON."""
+    __tablename__ = "user_states"
+    
+    user_id = Column(BigInteger, primary_key=True)
+    data = Column(Text, nullable=False)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+class ConversationState(Base):
+    """Поточний стан ConversationHandler для ключа розмови; рядок видаляється, коли розмова завершується."""
+    __tablename__ = "conversation_states"
+    
+    name = Column(String(64), primary_key=True)
+    key = Column(String(64), primary_key=True)  # JSON-список, напр. "[chat_id, user_id]"
+    user_id = Column(BigInteger, nullable=False)
+    state = Column(String(64), nullable=False)  # JSON: номер або назва стану
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
 DB_URL = os.getenv("DB_URL", "sqlite:///finance_bot.db") 
-engine = create_engine(DB_URL)
-Session = sessionmaker(bind=engine)
+
+# Обмежений пул потоків для роботи з БД, щоб синхронні запити SQLAlchemy
+# не блокували цикл подій бота
+DB_WORKERS = int(os.getenv("DB_WORKERS", "4"))
+
+# Профілі зберігання SQLite: PRAGMA, які застосовуються до кожного нового з'єднання.
+# "legacy" залишає налаштування SQLite за замовчуванням (rollback journal, synchronous=FULL).
+STORAGE_PROFILES = {
+    "legacy": {},
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,  # ~64 МБ
+        "mmap_size": 268435456,  # 256 МБ
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -256000,
+        "mmap_size": 1073741824,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+DB_PROFILE = os.getenv("DB_PROFILE", "wal")
+
+def storage_pragmas(profile: str):
+    """PRAGMA профілю з урахуванням перевизначень через SQLITE_<PRAGMA> у змінних середовища."""
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{profile}', expected one of: {', '.join(STORAGE_PROFILES)}")
+    pragmas = dict(STORAGE_PROFILES[profile])
+    for name in ("journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout"):
+        override = os.getenv(f"SQLITE_{name.upper()}")
+        if override:
+            pragmas[name] = override
+    return pragmas
+
+def create_db_engine(url: str, profile: str = DB_PROFILE, pool_size: int = DB_WORKERS, read_only: bool = False):
+    """Створює engine з пулом, розрахованим на пул потоків БД, і профілем зберігання для SQLite.
+
+    read_only=True вмикає PRAGMA query_only для з'єднань SQLite; для інших СУБД
+    доступ лише на читання задається самим URL (репліка або роль без прав запису).
+    """
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_size=pool_size, max_overflow=pool_size, pool_pre_ping=True)
+
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        return create_engine(url)
+
+    pragmas = storage_pragmas(profile)
+    if read_only:
+        pragmas["query_only"] = "ON"
+    new_engine = create_engine(
+        url,
+        # Кожен потік виконавця отримує власне з'єднання з пулу
+        connect_args={"check_same_thread": False},
+        pool_size=pool_size,
+        max_overflow=pool_size,
+    )
+
+    @event.listens_for(new_engine, "connect")
+    def _apply_storage_profile(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    return new_engine
+
+# Шардування за користувачами (DB_SHARDS > 1): кожен користувач з усіма своїми даними
+# живе в одному з файлів DB_SHARD_URL.format(shard=i), і записи різних шардів
+# не чекають на спільне блокування SQLite. При DB_SHARDS=1 використовується DB_URL.
+DB_SHARDS = int(os.getenv("DB_SHARDS", "1"))
+DB_SHARD_URL = os.getenv("DB_SHARD_URL", "sqlite:///finance_bot_{shard}.db")
+
+def shard_urls(count: int = DB_SHARDS, template: str = DB_SHARD_URL):
+    if count == 1:
+        return [DB_URL]
+    return [template.format(shard=shard) for shard in range(count)]
+
+def shard_for(user_id: int, count: int = DB_SHARDS) -> int:
+    """Номер шарду користувача; crc32 однаковий у всіх процесах і між перезапусками."""
+    if count == 1:
+        return 0
+    return zlib.crc32(str(user_id).encode()) % count
+
+shard_engines = [create_db_engine(url) for url in shard_urls()]
+# expire_on_commit=False: об'єкти повертаються з потоків виконавця вже після закриття сесії
+shard_sessions = [sessionmaker(bind=shard_engine, expire_on_commit=False) for shard_engine in shard_engines]
+
+# Єдина БД або перший шард: для службових запитів, не прив'язаних до користувача
+engine = shard_engines[0]
+Session = shard_sessions[0]
+
+def user_session(user_id: int):
+    """Сесія шарду, у якому зберігаються дані користувача."""
+    return shard_sessions[shard_for(user_id)]()
+
+# Окремі engine для читання (звіти, статистика, списки): власний пул з'єднань
+# DB_READ_POOL і власний пул потоків, тож довгі аналітичні запити не займають
+# з'єднання й потоки, потрібні вставкам. DB_READ_URL — репліка для не-SQLite БД.
+DB_READ_POOL = int(os.getenv("DB_READ_POOL", str(DB_WORKERS)))
+DB_READ_URL = os.getenv("DB_READ_URL")
+
+def _read_engine(url: str, write_engine):
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        # БД у пам'яті існує лише в межах одного engine
+        return write_engine
+    return create_db_engine(url, pool_size=DB_READ_POOL, read_only=True)
+
+if DB_READ_URL and DB_SHARDS == 1:
+    shard_read_engines = [create_db_engine(DB_READ_URL, pool_size=DB_READ_POOL, read_only=True)]
+else:
+    shard_read_engines = [_read_engine(url, write_engine) for url, write_engine in zip(shard_urls(), shard_engines)]
+shard_read_sessions = [sessionmaker(bind=read_engine, expire_on_commit=False) for read_engine in shard_read_engines]
+ReadSession = shard_read_sessions[0]
+
+def read_session(user_id: int):
+    """Сесія лише для читання в шарді користувача."""
+    return shard_read_sessions[shard_for(user_id)]()
+
+_db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+_db_read_executor = ThreadPoolExecutor(max_workers=DB_READ_POOL, thread_name_prefix="db-read")
+
+async def run_db(func, *args, **kwargs):
+    """Виконує синхронну функцію роботи з БД у виділеному пулі потоків."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(func, *args, **kwargs))
+
+async def run_db_read(func, *args, **kwargs):
+    """Як run_db, але для функцій, що лише читають через read_session."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_read_executor, functools.partial(func, *args, **kwargs))
+
+def upgrade_schema(target_engine=None):
+    """Додає до наявних таблиць колонки та індекси моделей, яких ще немає в БД.
+
+    create_all створює лише відсутні таблиці, тому зміни схеми існуючих
+    таблиць застосовуються тут. Без target_engine оновлюються всі шарди.
+    """
+    if target_engine is None:
+        for shard_engine in shard_engines:
+            upgrade_schema(shard_engine)
+        return
+    inspector = inspect(target_engine)
+    with target_engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            added_columns = set()
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                ddl = str(CreateColumn(column).compile(dialect=target_engine.dialect))
+                if column.default is not None and column.default.is_scalar:
+                    ddl += f" DEFAULT {column.default.arg!r}"
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+                logger.info(f"Schema upgrade: added column {table.name}.{column.name}")
+                added_columns.add(column.name)
+            if table.name == Transaction.__tablename__ and added_columns & {"month", "week"}:
+                # Заповнюємо в тій самій транзакції, щоб не лишилося рядків без ключів
+                _backfill_period_keys(conn)
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+                    logger.info(f"Schema upgrade: created index {index.name}")
+
+def _backfill_period_keys(conn, batch_size: int = 5000):
+    """Заповнює month і week для наявних транзакцій пакетами по batch_size рядків."""
+    table = Transaction.__table__
+    update = table.update().where(table.c.id == bindparam("row_id"))\
+                           .values(month=bindparam("month_key"), week=bindparam("week_key"))
+    last_id = 0
+    filled = 0
+    while True:
+        rows = conn.execute(
+            select(table.c.id, table.c.date)
+            .where(table.c.id > last_id, table.c.date.isnot(None))
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        conn.execute(update, [
+            {"row_id": row_id, "month_key": month_key(value), "week_key": week_key(value)}
+            for row_id, value in rows
+        ])
+        filled += len(rows)
+        last_id = rows[-1].id
+    logger.info(f"Schema upgrade: period keys backfilled for {filled} transactions")
 
 def init_db():
     try:
-        Base.metadata.create_all(engine)
+        for shard_engine, shard_session in zip(shard_engines, shard_sessions):
+            _init_shard(shard_engine, shard_session)
+        import archive
+        archive.init_archive()
         logger.info("Database tables created successfully")
     except Exception as e:
-        logger.error(f"Error creating database tables: {e}", exc_info=True)
\ No newline at end of file
+        logger.error(f"Error creating database tables: {e}", exc_info=True)
+
+def _init_shard(shard_engine, shard_session):
+    inspector = inspect(shard_engine)
+    ledger_missing = not inspector.has_table(UserBalance.__tablename__)
+    rollups_missing = not inspector.has_table(MonthlyRollup.__tablename__)
+    prefix_sums_missing = not inspector.has_table(DailyPrefixSum.__tablename__)
+    Base.metadata.create_all(shard_engine)
+    upgrade_schema(shard_engine)
+    if ledger_missing or rollups_missing or prefix_sums_missing:
+        # Нові таблиці агрегатів заповнюємо з наявних транзакцій
+        import aggregates
+        session = shard_session()
+        try:
+            # Транзакції, які вже в архіві, враховуються через archived_daily_totals
+            if ledger_missing:
+                aggregates.rebuild_ledger(session)
+            if rollups_missing:
+                aggregates.rebuild_rollups(session)
+            if prefix_sums_missing:
+                aggregates.rebuild_prefix_sums(session)
+            session.commit()
+        finally:
+            session.close()
\ No newline at end of file
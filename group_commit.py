@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import time
+import metrics
+from database import run_db
+
+logger = logging.getLogger(__name__)
+
+class GroupCommitter:
+    """Збирає записи в пакети й фіксує кожен пакет однією транзакцією.
+
+    flush_func(items) виконується в пулі потоків БД і повертає список
+    результатів у тому ж порядку. submit() чекає на коміт свого пакета,
+    тому для обробника гарантії збереження ті самі, що й без пакетування.
+    """
+
+    def __init__(self, name: str, flush_func, max_rows: int = 100, max_delay: float = 0.01):
+        self.name = name
+        self.flush_func = flush_func
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self._pending = []
+        self._timer = None
+        self._inflight = set()
+        self._batch_size = metrics.histogram(f"{name}.batch_size")
+        self._flush_latency = metrics.histogram(f"{name}.flush_latency_ms")
+        self._wait_latency = metrics.histogram(f"{name}.wait_latency_ms")
+        metrics.gauge(f"{name}.queued", lambda: len(self._pending))
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.perf_counter()))
+        if len(self._pending) >= self.max_rows:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush_now)
+        return await future
+
+    def _flush_now(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._flush(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _flush(self, batch):
+        started = time.perf_counter()
+        try:
+            results = await run_db(self.flush_func, [item for item, _, _ in batch])
+        except Exception as e:
+            logger.error(f"Group commit '{self.name}' failed for {len(batch)} items: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finished = time.perf_counter()
+        self._batch_size.observe(len(batch))
+        self._flush_latency.observe((finished - started) * 1000)
+        for (_, future, queued_at), result in zip(batch, results):
+            self._wait_latency.observe((finished - queued_at) * 1000)
+            if not future.done():
+                future.set_result(result)
+
+    async def drain(self):
+        """Фіксує все, що стоїть у черзі, і чекає завершення пакетів у дорозі."""
+        self._flush_now()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
@@ -1,12 +1,19 @@
 from aiogram import Router, types
 from aiogram.filters import Command
-from ollama import Client
 import logging
 
 ai_router = Router()
 
-# Налаштовуємо клієнт для Ollama (ваш порт 9117)
-ollama_client = Client(host='http://localhost:9117')
+# Клієнт Ollama (ваш порт 9117) створюється при першому запиті: пакет ollama
+# імпортується довго, а бот без нього стартує й працює
+_ollama_client = None
+
+def get_ollama_client():
+    global _ollama_client
+    if _ollama_client is None:
+        from ollama import Client
+        _ollama_client = Client(host='http://localhost:9117')
+    return _ollama_client
 
 @ai_router.message(Command("ask"))
 async def handle_ask_command(message: types.Message):
@@ -22,7 +29,7 @@ async def handle_ask_command(message: types.Message):
         await message.bot.send_chat_action(message.chat.id, "typing")
         
         # Запит до Ollama з явним вказівником мови
-        response = ollama_client.chat(
+        response = get_ollama_client().chat(
             model='llama3:8b',
             messages=[
                 {
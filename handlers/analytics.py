@@ -2,8 +2,8 @@ from aiogram import Router, types
 from aiogram.filters import Command
 from sqlalchemy.sql import text as sql_text
 from datetime import datetime, timedelta
-from database import Session
-import matplotlib.pyplot as plt
+from database import read_session, run_db_read, week_key
+import handlers.transactions as db_transactions
 import io
 import os
 import logging
@@ -13,6 +13,79 @@ logger = logging.getLogger(__name__)
 
 analytics_router = Router()
 
+# SQL звітів. Календарні періоди фільтруються за збереженими ключами month/week, щоб запити
+# були діапазонами індексу без обчислень по рядках; python manage.py schema explain перевіряє план кожного з них.
+MONTH_CATEGORIES_SQL = """
+    SELECT category, SUM(total) as total
+    FROM monthly_rollups
+    WHERE user_id = :user_id AND month = :month AND type = 'expense'
+    GROUP BY category
+    ORDER BY total DESC
+"""
+
+MONTH_TOTAL_SQL = """
+    SELECT SUM(total) as total
+    FROM monthly_rollups
+    WHERE user_id = :user_id AND month = :month AND type = 'expense'
+"""
+
+WEEK_CATEGORIES_SQL = """
+    SELECT category, SUM(amount) as total
+    FROM transactions
+    WHERE user_id = :user_id AND type = 'expense' AND week = :week
+    GROUP BY category
+    ORDER BY total DESC
+"""
+
+TOP_CATEGORIES_SQL = """
+    SELECT category, SUM(total) as total
+    FROM monthly_rollups
+    WHERE user_id = :user_id AND type = 'expense'
+    GROUP BY category
+    ORDER BY total DESC
+    LIMIT 10
+"""
+
+MONTHLY_TOTALS_SQL = """
+    SELECT month, SUM(total) as total
+    FROM monthly_rollups
+    WHERE user_id = :user_id AND type = 'expense'
+    GROUP BY month
+    ORDER BY month DESC
+    LIMIT 6
+"""
+
+AVG_MONTHLY_SQL = """
+    SELECT AVG(month_total) FROM (
+        SELECT month, SUM(total) as month_total
+        FROM monthly_rollups
+        WHERE user_id = :user_id AND type = 'expense'
+        GROUP BY month
+    )
+"""
+
+TOP_CATEGORY_SQL = """
+    SELECT category, SUM(total) as total
+    FROM monthly_rollups
+    WHERE user_id = :user_id AND type = 'expense'
+    GROUP BY category
+    ORDER BY total DESC
+    LIMIT 1
+"""
+
+EXPENSE_TOTAL_SQL = "SELECT expense_total FROM user_balances WHERE user_id = :user_id"
+
+REPORT_QUERIES = {
+    "month_categories": MONTH_CATEGORIES_SQL,
+    "month_total": MONTH_TOTAL_SQL,
+    "week_categories": WEEK_CATEGORIES_SQL,
+    "top_categories": TOP_CATEGORIES_SQL,
+    "monthly_totals": MONTHLY_TOTALS_SQL,
+    "avg_monthly": AVG_MONTHLY_SQL,
+    "top_category": TOP_CATEGORY_SQL,
+    "expense_total": EXPENSE_TOTAL_SQL,
+}
+
 def build_analytics_keyboard():
     keyboard = [
         [types.KeyboardButton(text="📅 За місяць"), types.KeyboardButton(text="📆 За тиждень")],
@@ -34,19 +107,13 @@ async def analytics_menu(message: types.Message):
         logger.error(f"Error in analytics_menu: {e}")
         await message.answer("❌ Сталася помилка при відкритті аналітики")
 
-async def generate_monthly_report(user_id: int):
+def _build_monthly_report(user_id: int):
+    session = read_session(user_id)
     try:
-        session = Session()
         current_month = datetime.now().strftime("%Y-%m")
         
         transactions = session.execute(
-            sql_text("""
-                SELECT category, SUM(amount) as total 
-                FROM transactions 
-                WHERE user_id = :user_id AND strftime('%Y-%m', date) = :month 
-                GROUP BY category
-                ORDER BY total DESC
-            """),
+            sql_text(MONTH_CATEGORIES_SQL),
             {"user_id": user_id, "month": current_month}
         ).fetchall()
 
@@ -66,11 +133,7 @@ async def generate_monthly_report(user_id: int):
         prev_month = datetime.now().replace(day=1) - timedelta(days=1)
         prev_month_str = prev_month.strftime("%Y-%m")
         prev_total = session.execute(
-            sql_text("""
-                SELECT SUM(amount) as total 
-                FROM transactions 
-                WHERE user_id = :user_id AND strftime('%Y-%m', date) = :month
-            """),
+            sql_text(MONTH_TOTAL_SQL),
             {"user_id": user_id, "month": prev_month_str}
         ).fetchone().total or 0
 
@@ -90,22 +153,22 @@ async def generate_monthly_report(user_id: int):
     except Exception as e:
         logger.error(f"Error generating monthly report: {e}")
         return "❌ Помилка при формуванні звіту за місяць"
+    finally:
+        session.close()
 
-async def generate_weekly_report(user_id: int):
+async def generate_monthly_report(user_id: int):
+    return await run_db_read(_build_monthly_report, user_id)
+
+def _build_weekly_report(user_id: int):
+    session = read_session(user_id)
     try:
-        session = Session()
         today = datetime.now()
-        week_start = (today - timedelta(days=today.weekday())).strftime("%Y-%m-%d")
+        week_start_date = (today - timedelta(days=today.weekday())).date()
+        week_start = week_start_date.strftime("%Y-%m-%d")
         
         transactions = session.execute(
-            sql_text("""
-                SELECT category, SUM(amount) as total 
-                FROM transactions 
-                WHERE user_id = :user_id AND date >= :week_start 
-                GROUP BY category
-                ORDER BY total DESC
-            """),
-            {"user_id": user_id, "week_start": week_start}
+            sql_text(WEEK_CATEGORIES_SQL),
+            {"user_id": user_id, "week": week_key(today)}
         ).fetchall()
 
         if not transactions:
@@ -129,20 +192,17 @@ async def generate_weekly_report(user_id: int):
     except Exception as e:
         logger.error(f"Error generating weekly report: {e}")
         return "❌ Помилка при формуванні звіту за тиждень"
+    finally:
+        session.close()
 
-async def generate_category_report(user_id: int):
+async def generate_weekly_report(user_id: int):
+    return await run_db_read(_build_weekly_report, user_id)
+
+def _build_category_report(user_id: int):
+    session = read_session(user_id)
     try:
-        session = Session()
-        
         categories = session.execute(
-            sql_text("""
-                SELECT category, SUM(amount) as total 
-                FROM transactions 
-                WHERE user_id = :user_id 
-                GROUP BY category
-                ORDER BY total DESC
-                LIMIT 10
-            """),
+            sql_text(TOP_CATEGORIES_SQL),
             {"user_id": user_id}
         ).fetchall()
 
@@ -150,9 +210,9 @@ async def generate_category_report(user_id: int):
             return "📭 У вас ще немає витрат за жодною категорією."
 
         total_all = session.execute(
-            sql_text("SELECT SUM(amount) FROM transactions WHERE user_id = :user_id"),
+            sql_text(EXPENSE_TOTAL_SQL),
             {"user_id": user_id}
-        ).fetchone()[0] or 0
+        ).scalar() or 0
 
         report = "📊 <b>Топ-10 категорій за весь час:</b>\n\n"
         
@@ -166,22 +226,25 @@ async def generate_category_report(user_id: int):
     except Exception as e:
         logger.error(f"Error generating category report: {e}")
         return "❌ Помилка при формуванні звіту по категоріям"
+    finally:
+        session.close()
 
-async def generate_expenses_chart(user_id: int):
+async def generate_category_report(user_id: int):
+    return await run_db_read(_build_category_report, user_id)
+
+def _fetch_monthly_totals(user_id: int):
+    session = read_session(user_id)
     try:
-        session = Session()
-        
-        months_data = session.execute(
-            sql_text("""
-                SELECT strftime('%Y-%m', date) as month, SUM(amount) as total
-                FROM transactions
-                WHERE user_id = :user_id
-                GROUP BY month
-                ORDER BY month DESC
-                LIMIT 6
-            """),
+        return session.execute(
+            sql_text(MONTHLY_TOTALS_SQL),
             {"user_id": user_id}
         ).fetchall()
+    finally:
+        session.close()
+
+async def generate_expenses_chart(user_id: int):
+    try:
+        months_data = await run_db_read(_fetch_monthly_totals, user_id)
 
         if not months_data or len(months_data) < 2:
             return None
@@ -189,6 +252,9 @@ async def generate_expenses_chart(user_id: int):
         months = [m.month[-2:] + '/' + m.month[2:4] for m in reversed(months_data)]
         amounts = [m.total for m in reversed(months_data)]
 
+        # matplotlib імпортується лише для графіків: це найдовший імпорт у боті
+        import matplotlib.pyplot as plt
+
         plt.style.use('seaborn')
         fig, ax = plt.subplots(figsize=(10, 6))
         
@@ -219,39 +285,34 @@ async def generate_expenses_chart(user_id: int):
         logger.error(f"Error generating chart: {e}")
         return None
 
-async def generate_detailed_analysis(user_id: int):
+def _build_detailed_analysis(user_id: int):
+    session = read_session(user_id)
     try:
-        session = Session()
-        
         # Отримуємо дані для аналізу
         total_spent = session.execute(
-            sql_text("SELECT SUM(amount) FROM transactions WHERE user_id = :user_id"),
+            sql_text(EXPENSE_TOTAL_SQL),
             {"user_id": user_id}
-        ).fetchone()[0] or 0
+        ).scalar() or 0
 
         avg_monthly = session.execute(
-            sql_text("""
-                SELECT AVG(month_total) FROM (
-                    SELECT strftime('%Y-%m', date) as month, SUM(amount) as month_total
-                    FROM transactions
-                    WHERE user_id = :user_id
-                    GROUP BY month
-                )
-            """),
+            sql_text(AVG_MONTHLY_SQL),
             {"user_id": user_id}
         ).fetchone()[0] or 0
 
         most_expensive_category = session.execute(
-            sql_text("""
-                SELECT category, SUM(amount) as total
-                FROM transactions
-                WHERE user_id = :user_id
-                GROUP BY category
-                ORDER BY total DESC
-                LIMIT 1
-            """),
+            sql_text(TOP_CATEGORY_SQL),
             {"user_id": user_id}
         ).fetchone()
+    except Exception as e:
+        logger.error(f"Error generating detailed analysis: {e}")
+        return "❌ Помилка при формуванні детального аналізу"
+    finally:
+        session.close()
+
+    try:
+        # Розподіл окремих витрат і тренд потребують рядків історії, а не зведень;
+        # знімок читається вже після закриття сесії зведень
+        stats = db_transactions.expense_stats(user_id)
 
         analysis = "🔍 <b>Детальний фінансовий аналіз:</b>\n\n"
         analysis += f"💸 <b>Всього витрачено:</b> {total_spent:.2f} грн\n"
@@ -259,6 +320,12 @@ async def generate_detailed_analysis(user_id: int):
         
         if most_expensive_category:
             analysis += f"🏆 <b>Найвитратніша категорія:</b> {most_expensive_category[0].capitalize()} ({most_expensive_category[1]:.2f} грн)\n"
+
+        if stats is not None:
+            analysis += f"📏 <b>Типова витрата:</b> {stats.median:.2f} грн (90% витрат до {stats.p90:.2f} грн)\n"
+            if stats.trend is not None:
+                icon, direction = ("📈", "зростають") if stats.trend > 0 else ("📉", "знижуються")
+                analysis += f"{icon} <b>Тренд витрат:</b> {direction} на {abs(stats.trend):.2f} грн/міс\n"
         
         # Рекомендації на основі даних
         if avg_monthly > 15000:
@@ -274,6 +341,9 @@ async def generate_detailed_analysis(user_id: int):
         logger.error(f"Error generating detailed analysis: {e}")
         return "❌ Помилка при формуванні детального аналізу"
 
+async def generate_detailed_analysis(user_id: int):
+    return await run_db_read(_build_detailed_analysis, user_id)
+
 @analytics_router.message(lambda message: message.text == "📅 За місяць")
 async def monthly_report(message: types.Message):
     report = await generate_monthly_report(message.from_user.id)
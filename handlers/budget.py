@@ -9,7 +9,7 @@ from telegram.ext import (
 )
 from datetime import datetime
 import logging
-from database import Session, Transaction, Budget  # Припускаючи, що у вас є такі моделі
+import handlers.transactions as db_transactions
 
 logger = logging.getLogger(__name__)
 
@@ -60,15 +60,12 @@ async def add_expense(update: Update, context: CallbackContext) -> int:
         category = ' '.join(category_parts).lower()
 
         # Збереження витрати в базу даних
-        session = Session()
-        transaction = Transaction(
+        await db_transactions.add_transaction(
             user_id=update.effective_user.id,
             amount=amount,
-            category=category,
-            date=datetime.now()
+            transaction_type='expense',
+            category=category
         )
-        session.add(transaction)
-        session.commit()
         
         await update.message.reply_text(
             f"✅ Витрату {amount} грн на '{category}' додано!",
@@ -86,17 +83,17 @@ async def add_expense(update: Update, context: CallbackContext) -> int:
 async def show_statistics(update: Update, context: CallbackContext) -> int:
     """Показ статистики витрат"""
     try:
-        session = Session()
         user_id = update.effective_user.id
         
-        # Отримання транзакцій за поточний місяць
+        # Витрати за поточний місяць з місячних зведень
         current_month = datetime.now().strftime("%Y-%m")
-        transactions = session.query(Transaction).filter(
-            Transaction.user_id == user_id,
-            Transaction.date.like(f"{current_month}%")
-        ).all()
+        categories = {
+            category: amount
+            for transaction_type, category, amount in await db_transactions.get_category_totals(user_id, current_month)
+            if transaction_type == 'expense'
+        }
 
-        if not transactions:
+        if not categories:
             await update.message.reply_text(
                 "📭 У вас ще немає витрат за цей місяць.",
                 reply_markup=build_budget_keyboard()
@@ -104,10 +101,7 @@ async def show_statistics(update: Update, context: CallbackContext) -> int:
             return BUDGET_MENU
 
         # Розрахунок статистики
-        total = sum(t.amount for t in transactions)
-        categories = {}
-        for t in transactions:
-            categories[t.category] = categories.get(t.category, 0) + t.amount
+        total = sum(categories.values())
 
         # Формування повідомлення
         message = "📊 <b>Ваша статистика за місяць:</b>\n\n"
@@ -160,10 +154,7 @@ async def handle_budget_settings(update: Update, context: CallbackContext) -> in
             return BUDGET_MENU
             
         if text.lower() == '/list':
-            session = Session()
-            budgets = session.query(Budget).filter(
-                Budget.user_id == update.effective_user.id
-            ).all()
+            budgets = await db_transactions.get_budgets(update.effective_user.id)
             
             if not budgets:
                 await update.message.reply_text(
@@ -187,23 +178,7 @@ async def handle_budget_settings(update: Update, context: CallbackContext) -> in
         category, limit = text.split(maxsplit=1)
         limit = float(limit)
         
-        session = Session()
-        budget = session.query(Budget).filter(
-            Budget.user_id == update.effective_user.id,
-            Budget.category == category.lower()
-        ).first()
-        
-        if budget:
-            budget.limit = limit
-        else:
-            budget = Budget(
-                user_id=update.effective_user.id,
-                category=category.lower(),
-                limit=limit
-            )
-            session.add(budget)
-        
-        session.commit()
+        await db_transactions.set_budget_limit(update.effective_user.id, category.lower(), limit)
         
         await update.message.reply_text(
             f"✅ Ліміт для '{category}' встановлено на {limit} грн",
@@ -1,33 +1,50 @@
 from aiogram import Router, types
 from aiogram.filters import Command
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql import text as sql_text
-from datetime import datetime
-import os
-
-# Підключення до бази даних
-DB_URL = os.getenv("DB_URL", "sqlite:///finance_bot.db")
-engine = create_engine(DB_URL)
-Session = sessionmaker(bind=engine)
-
-# Створення таблиці цілей (якщо ще не існує)
-with engine.connect() as conn:
-    conn.execute(sql_text("""
-    CREATE TABLE IF NOT EXISTS goals (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        name TEXT NOT NULL,
-        target_amount REAL NOT NULL,
-        current_amount REAL DEFAULT 0,
-        months INTEGER NOT NULL,
-        created_at TEXT NOT NULL
-    )
-    """))
-    conn.commit()
+from database import Goal, run_db, user_session
+
+# Таблицю goals створює database.init_db разом з рештою схеми
 
 goals_router = Router()
 
+# Синхронні операції з БД, які виконуються у пулі потоків database.run_db
+
+def _insert_goal(user_id: int, name: str, target_amount: float, months: int):
+    session = user_session(user_id)
+    try:
+        session.add(Goal(user_id=user_id, name=name, target_amount=target_amount, months=months))
+        session.commit()
+    finally:
+        session.close()
+
+def _fetch_goals(user_id: int):
+    session = user_session(user_id)
+    try:
+        return session.execute(
+            sql_text("SELECT id, name, target_amount, current_amount, months FROM goals WHERE user_id = :user_id"),
+            {"user_id": user_id}
+        ).fetchall()
+    finally:
+        session.close()
+
+def _fetch_goal(goal_id: int, user_id: int, columns: str):
+    session = user_session(user_id)
+    try:
+        return session.execute(
+            sql_text(f"SELECT {columns} FROM goals WHERE id = :id AND user_id = :user_id"),
+            {"id": goal_id, "user_id": user_id}
+        ).fetchone()
+    finally:
+        session.close()
+
+def _execute_and_commit(user_id: int, statement: str, params: dict):
+    session = user_session(user_id)
+    try:
+        session.execute(sql_text(statement), params)
+        session.commit()
+    finally:
+        session.close()
+
 @goals_router.message(Command("goal"))
 async def goal_menu(message: types.Message):
     await message.answer(
@@ -50,21 +67,7 @@ async def goal_create(message: types.Message):
         target_amount = float(args[-2])
         months = int(args[-1])
 
-        session = Session()
-        session.execute(
-            sql_text("""
-                INSERT INTO goals (user_id, name, target_amount, months, created_at)
-                VALUES (:user_id, :name, :target_amount, :months, :created_at)
-            """),
-            {
-                "user_id": message.from_user.id,
-                "name": name,
-                "target_amount": target_amount,
-                "months": months,
-                "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-        )
-        session.commit()
+        await run_db(_insert_goal, message.from_user.id, name, target_amount, months)
 
         await message.answer(f"✅ Ціль '{name}' створена!\n"
                            f"💵 Сума: {target_amount} грн\n"
@@ -79,11 +82,7 @@ async def goal_create(message: types.Message):
 @goals_router.message(Command("goal_list"))
 async def goal_list(message: types.Message):
     try:
-        session = Session()
-        goals = session.execute(
-            sql_text("SELECT id, name, target_amount, current_amount, months FROM goals WHERE user_id = :user_id"),
-            {"user_id": message.from_user.id}
-        ).fetchall()
+        goals = await run_db(_fetch_goals, message.from_user.id)
 
         if not goals:
             await message.answer("📭 У вас ще немає цілей")
@@ -119,12 +118,8 @@ async def goal_add(message: types.Message):
         goal_id = int(args[0])
         amount = float(args[1])
 
-        session = Session()
         # Перевіряємо, чи існує ціль
-        goal = session.execute(
-            sql_text("SELECT id, target_amount, current_amount FROM goals WHERE id = :id AND user_id = :user_id"),
-            {"id": goal_id, "user_id": message.from_user.id}
-        ).fetchone()
+        goal = await run_db(_fetch_goal, goal_id, message.from_user.id, "id, target_amount, current_amount")
 
         if not goal:
             await message.answer("❌ Ціль не знайдена")
@@ -135,11 +130,12 @@ async def goal_add(message: types.Message):
             await message.answer(f"⚠️ Сума перевищує цільову! Максимально можна додати {goal.target_amount - goal.current_amount} грн")
             return
 
-        session.execute(
-            sql_text("UPDATE goals SET current_amount = :amount WHERE id = :id"),
+        await run_db(
+            _execute_and_commit,
+            message.from_user.id,
+            "UPDATE goals SET current_amount = :amount WHERE id = :id",
             {"amount": new_amount, "id": goal_id}
         )
-        session.commit()
 
         remaining = goal.target_amount - new_amount
         await message.answer(f"✅ Додано {amount} грн до цілі!\n"
@@ -161,22 +157,14 @@ async def goal_delete(message: types.Message):
 
         goal_id = int(args[0])
 
-        session = Session()
         # Перевіряємо, чи існує ціль
-        goal = session.execute(
-            sql_text("SELECT name FROM goals WHERE id = :id AND user_id = :user_id"),
-            {"id": goal_id, "user_id": message.from_user.id}
-        ).fetchone()
+        goal = await run_db(_fetch_goal, goal_id, message.from_user.id, "name")
 
         if not goal:
             await message.answer("❌ Ціль не знайдена")
             return
 
-        session.execute(
-            sql_text("DELETE FROM goals WHERE id = :id"),
-            {"id": goal_id}
-        )
-        session.commit()
+        await run_db(_execute_and_commit, message.from_user.id, "DELETE FROM goals WHERE id = :id", {"id": goal_id})
 
         await message.answer(f"✅ Ціль '{goal.name}' видалена!")
 
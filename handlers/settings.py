@@ -1,6 +1,6 @@
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import CallbackContext, ConversationHandler
-from database import Session as DBSession, User
+import handlers.transactions as db_transactions
 import logging
 
 logger = logging.getLogger(__name__)
@@ -46,12 +46,8 @@ async def change_currency(update: Update, context: CallbackContext):
         return CHANGE_CURRENCY
     
     user_id = update.effective_user.id
-    session = DBSession()
     try:
-        user = session.query(User).filter_by(id=user_id).first()
-        if user:
-            user.currency = currency
-            session.commit()
+        if await db_transactions.set_currency(user_id, currency):
             await update.message.reply_text(
                 f"✅ Валюта змінена на {currency}",
                 reply_markup=build_settings_keyboard()
@@ -69,8 +65,6 @@ async def change_currency(update: Update, context: CallbackContext):
             reply_markup=build_settings_keyboard()
         )
         return SETTINGS_MENU
-    finally:
-        session.close()
 
 async def notification_settings(update: Update, context: CallbackContext):
     await update.message.reply_text(
@@ -84,18 +78,60 @@ async def notification_settings(update: Update, context: CallbackContext):
     )
     return NOTIFICATION_SETTINGS
 
+# Кнопка -> (формат, стиснення gzip)
+EXPORT_OPTIONS = {
+    "📝 CSV": ("csv", False),
+    "🧾 JSONL": ("jsonl", False),
+    "🗜 CSV.gz": ("csv", True),
+    "🗜 JSONL.gz": ("jsonl", True),
+}
+
+def build_export_keyboard():
+    keyboard = [
+        ["📝 CSV", "🧾 JSONL"],
+        ["🗜 CSV.gz", "🗜 JSONL.gz"],
+        ["🔙 На головну"]
+    ]
+    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+
 async def data_export(update: Update, context: CallbackContext):
     await update.message.reply_text(
         "📤 <b>Експорт даних</b>\n\n"
-        "Оберіть формат експорту:\n"
-        "📝 CSV\n"
-        "📊 Excel\n"
-        "📄 PDF",
+        "Оберіть формат експорту транзакцій, бюджетів і цілей:\n"
+        "📝 CSV — для Excel і Google Таблиць\n"
+        "🧾 JSONL — один запис на рядок\n"
+        "🗜 .gz — те саме, стиснуте gzip (для великої історії)",
         parse_mode="HTML",
-        reply_markup=build_settings_keyboard()
+        reply_markup=build_export_keyboard()
     )
     return DATA_EXPORT
 
+async def export_data(update: Update, context: CallbackContext):
+    option = EXPORT_OPTIONS.get(update.message.text)
+    if option is None:
+        await update.message.reply_text("❌ Оберіть формат кнопкою нижче", reply_markup=build_export_keyboard())
+        return DATA_EXPORT
+
+    user_id = update.effective_user.id
+    export_format, compress = option
+    await update.message.reply_text("⏳ Готую файл експорту...")
+    try:
+        result = await db_transactions.export_user_data(user_id, export_format, compress)
+        with result.file:
+            await update.message.reply_document(
+                document=result.file,
+                filename=result.filename,
+                caption=f"📤 Експортовано записів: {result.rows}",
+                reply_markup=build_settings_keyboard()
+            )
+    except Exception as e:
+        logger.error(f"Помилка при експорті даних: {e}")
+        await update.message.reply_text(
+            "❌ Сталася помилка при експорті даних",
+            reply_markup=build_settings_keyboard()
+        )
+    return SETTINGS_MENU
+
 async def cancel_settings(update: Update, context: CallbackContext):
     from main import build_main_keyboard
     await update.message.reply_text(
@@ -1,13 +1,40 @@
+import asyncio
 import logging
+import os
+import time
+from collections import namedtuple
 from datetime import datetime
-from database import Session, User, Transaction, Budget, Goal
+from database import User, Transaction, Budget, Goal, MonthlyRollup, run_db, run_db_read, user_session, read_session, shard_for, shard_sessions, month_key, week_key
+from aggregates import AggregateDeltas, apply_transaction, apply_transactions, revert_transaction
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import func
+from sqlalchemy import func, insert, select, text, tuple_
+from user_cache import UserCache
+from snapshot_cache import SnapshotCache
+from group_commit import GroupCommitter
+import read_models
+import archive
+import statement_import
+import data_export
+from read_models import TransactionRecord, BudgetRecord, GoalRecord, BalanceRecord
 
 logger = logging.getLogger(__name__)
 
-async def get_or_create_user(user_id: int, username: str, first_name: str, last_name: str = None, language_code: str = None):
-    session = Session()
+# Відомі користувачі: повторні натискання кнопок не ходять у БД,
+# а last_activity записується пакетно фоновою задачею
+user_cache = UserCache(
+    max_size=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "600"))
+)
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "5"))
+
+# Колонкові знімки історії для аналітики; нові транзакції дописуються в них одразу
+snapshot_cache = SnapshotCache(max_bytes=int(os.getenv("SNAPSHOT_CACHE_MB", "64")) * 1024 * 1024)
+
+# Синхронні функції нижче виконуються лише у пулі потоків БД (database.run_db),
+# обробники викликають асинхронні обгортки.
+
+def _get_or_create_user(user_id: int, username: str, first_name: str, last_name: str = None, language_code: str = None):
+    session = user_session(user_id)
     try:
         user = session.query(User).filter_by(id=user_id).first()
         if not user:
@@ -32,19 +59,43 @@ async def get_or_create_user(user_id: int, username: str, first_name: str, last_
     finally:
         session.close()
 
-async def add_transaction(user_id: int, amount: float, transaction_type: str, category: str, description: str = None):
-    session = Session()
+def _flush_last_activity(pending: dict):
+    """Записує накопичені last_activity одним UPDATE на кожну дату в кожному шарді."""
+    by_shard = {}
+    for user_id, seen_at in pending.items():
+        by_date = by_shard.setdefault(shard_for(user_id), {})
+        by_date.setdefault(seen_at.date(), []).append(user_id)
+    for shard, by_date in by_shard.items():
+        session = shard_sessions[shard]()
+        try:
+            for activity_date, user_ids in by_date.items():
+                session.query(User).filter(User.id.in_(user_ids)).update(
+                    {User.last_activity: activity_date},
+                    synchronize_session=False
+                )
+            session.commit()
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.error(f"Error flushing last_activity for {sum(map(len, by_date.values()))} users in shard {shard}: {e}")
+        finally:
+            session.close()
+
+def _add_transaction(user_id: int, amount: float, transaction_type: str, category: str, description: str = None):
+    session = user_session(user_id)
     try:
+        now = datetime.now()
         transaction = Transaction(
             user_id=user_id,
             amount=amount,
             type=transaction_type,
             category=category,
             description=description,
-            date=datetime.now()
+            date=now
         )
         session.add(transaction)
+        apply_transaction(session, user_id, transaction_type, category, amount, now)
         session.commit()
+        snapshot_cache.append(user_id, [(transaction.id, now, transaction_type, category, amount)])
         logger.info(f"Transaction added: {user_id}, {amount}, {category}")
         return True
     except SQLAlchemyError as e:
@@ -54,33 +105,637 @@ async def add_transaction(user_id: int, amount: float, transaction_type: str, ca
     finally:
         session.close()
 
-async def get_transactions(user_id: int, limit: int = 10):
-    session = Session()
+def _update_transaction(user_id: int, transaction_id: int, amount: float = None, category: str = None):
+    """Змінює суму та/або категорію транзакції. Повертає False, якщо її не знайдено."""
+    session = user_session(user_id)
+    try:
+        transaction = session.query(Transaction).filter_by(id=transaction_id, user_id=user_id).first()
+        if not transaction:
+            return False
+        revert_transaction(session, user_id, transaction.type, transaction.category, transaction.amount, transaction.date)
+        if amount is not None:
+            transaction.amount = amount
+        if category is not None:
+            transaction.category = category
+        apply_transaction(session, user_id, transaction.type, transaction.category, transaction.amount, transaction.date)
+        session.commit()
+        # Зміна посеред історії: знімок перечитується з БД при наступному зверненні
+        snapshot_cache.invalidate(user_id)
+        return True
+    except SQLAlchemyError:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def _delete_transaction(user_id: int, transaction_id: int):
+    """Видаляє транзакцію. Повертає False, якщо її не знайдено."""
+    session = user_session(user_id)
     try:
-        transactions = session.query(Transaction).filter_by(user_id=user_id)\
-                              .order_by(Transaction.date.desc())\
-                              .limit(limit).all()
-        return transactions
+        transaction = session.query(Transaction).filter_by(id=transaction_id, user_id=user_id).first()
+        if not transaction:
+            return False
+        revert_transaction(session, user_id, transaction.type, transaction.category, transaction.amount, transaction.date)
+        session.delete(transaction)
+        session.commit()
+        snapshot_cache.invalidate(user_id)
+        return True
+    except SQLAlchemyError:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+# Побудова запитів винесена окремо, щоб manage.py schema explain перевіряв їхні плани
+
+def _category_totals_query(session, user_id: int, month: str = None):
+    total = func.sum(MonthlyRollup.total)
+    query = session.query(MonthlyRollup.type, MonthlyRollup.category, total)\
+                   .filter(MonthlyRollup.user_id == user_id)
+    if month is not None:
+        query = query.filter(MonthlyRollup.month == month)
+    return query.group_by(MonthlyRollup.type, MonthlyRollup.category)\
+                .order_by(total.desc())
+
+def _monthly_totals_query(session, user_id: int, transaction_type: str):
+    return session.query(MonthlyRollup.month, func.sum(MonthlyRollup.total))\
+                  .filter(MonthlyRollup.user_id == user_id, MonthlyRollup.type == transaction_type)\
+                  .group_by(MonthlyRollup.month)\
+                  .order_by(MonthlyRollup.month)
+
+def _add_transactions_batch(rows: list):
+    """Додає пакет транзакцій одним комітом на кожен шард; результати в порядку rows."""
+    by_shard = {}
+    for index, row in enumerate(rows):
+        by_shard.setdefault(shard_for(row[0]), []).append(index)
+    results = [False] * len(rows)
+    for shard, indexes in by_shard.items():
+        shard_results = _add_shard_batch(shard_sessions[shard], [rows[index] for index in indexes])
+        for index, result in zip(indexes, shard_results):
+            results[index] = result
+    return results
+
+def _add_shard_batch(session_factory, rows: list):
+    """Пакет транзакцій одного шарду; при помилці повторює їх поодинці."""
+    session = session_factory()
+    try:
+        now = datetime.now()
+        transactions = [
+            Transaction(
+                user_id=user_id,
+                amount=amount,
+                type=transaction_type,
+                category=category,
+                description=description,
+                date=now
+            )
+            for user_id, amount, transaction_type, category, description in rows
+        ]
+        session.add_all(transactions)
+        apply_transactions(session, [
+            (user_id, transaction_type, category, amount, now)
+            for user_id, amount, transaction_type, category, description in rows
+        ])
+        session.commit()
+        by_user = {}
+        for transaction in transactions:
+            by_user.setdefault(transaction.user_id, []).append(
+                (transaction.id, now, transaction.type, transaction.category, transaction.amount)
+            )
+        for user_id, user_rows in by_user.items():
+            snapshot_cache.append(user_id, user_rows)
+        logger.info(f"Transactions added in batch: {len(rows)}")
+        return [True] * len(rows)
+    except SQLAlchemyError as e:
+        session.rollback()
+        logger.error(f"Error adding transaction batch, retrying one by one: {e}")
+    finally:
+        session.close()
+    return [_add_transaction(*row) for row in rows]
+
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "5000"))
+
+ImportResult = namedtuple("ImportResult", "imported skipped errors")
+
+def _import_statement(user_id: int, path: str, chunk_size: int = IMPORT_CHUNK_ROWS):
+    """Імпортує CSV-виписку однією транзакцією БД.
+
+    Рядки вставляються пакетами по chunk_size (executemany), агрегати
+    оновлюються один раз наприкінці. Якщо вставка впала, не імпортується нічого.
+    """
+    errors = []
+    imported = 0
+    deltas = AggregateDeltas()
+    session = user_session(user_id)
+    try:
+        with statement_import.open_statement(path) as statement:
+            chunk = []
+            for row in statement_import.iter_statement(statement, errors):
+                chunk.append({
+                    "user_id": user_id,
+                    "amount": row.amount,
+                    "type": row.type,
+                    "category": row.category,
+                    "description": row.description,
+                    "date": row.date,
+                    "month": month_key(row.date),
+                    "week": week_key(row.date),
+                })
+                deltas.add(user_id, row.type, row.category, row.amount, row.date)
+                if len(chunk) >= chunk_size:
+                    session.execute(insert(Transaction), chunk)
+                    imported += len(chunk)
+                    chunk = []
+            if chunk:
+                session.execute(insert(Transaction), chunk)
+                imported += len(chunk)
+        deltas.apply(session)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    # Імпорт переважно заднім числом, тож знімок простіше перечитати, ніж дописувати
+    snapshot_cache.invalidate(user_id)
+    skipped = len(errors)
+    logger.info(f"Statement imported for user {user_id}: {imported} rows, {skipped} skipped")
+    return ImportResult(imported, skipped, [error for error in errors if error is not None])
+
+# Груповий коміт (GROUP_COMMIT=1): вставки з різних оновлень збираються в пакет
+# до GROUP_COMMIT_MAX_ROWS рядків або GROUP_COMMIT_MAX_DELAY_MS мілісекунд
+transaction_committer = None
+if os.getenv("GROUP_COMMIT", "0") == "1":
+    transaction_committer = GroupCommitter(
+        "add_transaction",
+        _add_transactions_batch,
+        max_rows=int(os.getenv("GROUP_COMMIT_MAX_ROWS", "100")),
+        max_delay=float(os.getenv("GROUP_COMMIT_MAX_DELAY_MS", "10")) / 1000
+    )
+
+def _get_transactions(user_id: int, limit: int = 10):
+    session = read_session(user_id)
+    try:
+        return read_models.fetch_all(session, read_models.transactions_select(user_id, limit), TransactionRecord)
     except SQLAlchemyError as e:
         logger.error(f"Error getting transactions: {e}")
         return []
     finally:
         session.close()
 
-async def get_balance(user_id: int):
-    session = Session()
-    try:
-        income = session.query(func.sum(Transaction.amount))\
-                       .filter(Transaction.user_id == user_id, Transaction.type == 'income')\
-                       .scalar() or 0.0
-        
-        expense = session.query(func.sum(Transaction.amount))\
-                        .filter(Transaction.user_id == user_id, Transaction.type == 'expense')\
-                        .scalar() or 0.0
-        
-        return income - expense
+# Колонки, які повертає потоковий читач історії (рядки-кортежі без ORM-об'єктів)
+STREAM_COLUMNS = read_models.TRANSACTION_COLUMNS
+STREAM_PAGE_SIZE = 1000
+
+def _transactions_page_query(user_id: int, after: tuple = None, page_size: int = STREAM_PAGE_SIZE):
+    query = select(*STREAM_COLUMNS).where(Transaction.user_id == user_id)
+    if after is not None:
+        query = query.where(tuple_(Transaction.date, Transaction.id) > tuple_(*after))
+    return query.order_by(Transaction.date, Transaction.id).limit(page_size)
+
+def _fetch_transactions_page(user_id: int, after: tuple = None, page_size: int = STREAM_PAGE_SIZE):
+    """Одна сторінка історії, впорядкованої за (date, id), після ключа after=(date, id)."""
+    session = read_session(user_id)
+    try:
+        return session.execute(_transactions_page_query(user_id, after, page_size)).all()
+    finally:
+        session.close()
+
+def _iter_hot_pages(user_id: int, page_size: int = STREAM_PAGE_SIZE):
+    after = None
+    while True:
+        page = _fetch_transactions_page(user_id, after, page_size)
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        after = (page[-1].date, page[-1].id)
+
+def iter_transaction_pages(user_id: int, page_size: int = STREAM_PAGE_SIZE):
+    """Синхронно проходить усю історію користувача сторінками фіксованого розміру.
+
+    Кожна сторінка читається окремим коротким запитом, тому пам'ять обмежена
+    розміром сторінки, а запис не блокується довгою транзакцією читання.
+    Якщо частина історії в архіві, архівні й гарячі рядки зливаються за (date, id).
+    """
+    if not archive.has_archive(user_id):
+        yield from _iter_hot_pages(user_id, page_size)
+        return
+    hot_rows = (row for page in _iter_hot_pages(user_id, page_size) for row in page)
+    page = []
+    for row in archive.merge_with_hot(archive.iter_archived_rows(user_id), hot_rows):
+        page.append(row)
+        if len(page) == page_size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+def iter_transactions(user_id: int, page_size: int = STREAM_PAGE_SIZE):
+    for page in iter_transaction_pages(user_id, page_size):
+        yield from page
+
+def _load_transaction_columns(user_id: int):
+    """Уся історія користувача у колонковому вигляді для analytics_engine.
+
+    Знімок береться з snapshot_cache; з БД історія читається лише при промаху.
+    """
+    columns = snapshot_cache.get(user_id)
+    if columns is not None:
+        return columns
+    # numpy потрібен лише аналітиці, тож не сповільнює запуск бота
+    from analytics_engine import TransactionColumns
+
+    version = snapshot_cache.version(user_id)
+    columns = TransactionColumns.from_pages(iter_transaction_pages(user_id))
+    snapshot_cache.put(user_id, columns, version)
+    return columns
+
+ExpenseStats = namedtuple("ExpenseStats", "median p90 trend")
+
+def expense_stats(user_id: int):
+    """Статистика окремих витрат за всю історію з колонкового знімка.
+
+    Синхронна: для коду, що вже виконується в пулі потоків БД (як
+    iter_transaction_pages); обробники викликають get_expense_stats.
+    Повертає ExpenseStats або None, якщо витрат ще немає.
+    """
+    import analytics_engine
+
+    columns = _load_transaction_columns(user_id)
+    expense_percentiles = analytics_engine.percentiles(columns, 'expense', (50, 90))
+    if expense_percentiles is None:
+        return None
+    return ExpenseStats(
+        median=expense_percentiles[0],
+        p90=expense_percentiles[1],
+        trend=analytics_engine.monthly_trend(columns, 'expense')
+    )
+
+def _get_balance(user_id: int):
+    session = read_session(user_id)
+    try:
+        balance = read_models.fetch_one(session, read_models.balance_select(user_id), BalanceRecord)
+        if balance is None:
+            return 0.0
+        return balance.income_total - balance.expense_total
     except SQLAlchemyError as e:
         logger.error(f"Error calculating balance: {e}")
         return 0.0
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+
+def _get_totals(user_id: int):
+    """Повертає BalanceRecord з журналу балансів користувача або None."""
+    session = read_session(user_id)
+    try:
+        return read_models.fetch_one(session, read_models.balance_select(user_id), BalanceRecord)
+    finally:
+        session.close()
+
+def _get_category_totals(user_id: int, month: str = None):
+    """Суми по (тип, категорія) з місячних зведень за весь час або за місяць 'YYYY-MM'."""
+    session = read_session(user_id)
+    try:
+        return _category_totals_query(session, user_id, month).all()
+    finally:
+        session.close()
+
+def _get_monthly_totals(user_id: int, transaction_type: str):
+    """Суми по місяцях для типу транзакцій, у хронологічному порядку."""
+    session = read_session(user_id)
+    try:
+        return _monthly_totals_query(session, user_id, transaction_type).all()
+    finally:
+        session.close()
+
+# Уся аналітика користувача одним запитом: підсумки з журналу балансів, суми
+# по категоріях і по місяцях з місячних зведень, середні витрати за місяць з сум по місяцях
+ANALYTICS_SUMMARY_SQL = """
+    WITH rollups AS (
+        SELECT month, type, category, total
+        FROM monthly_rollups
+        WHERE user_id = :user_id
+    )
+    SELECT 'total' AS kind, 'income' AS type, NULL AS key, income_total AS total
+    FROM user_balances WHERE user_id = :user_id
+    UNION ALL
+    SELECT 'total', 'expense', NULL, expense_total
+    FROM user_balances WHERE user_id = :user_id
+    UNION ALL
+    SELECT 'category', type, category, SUM(total)
+    FROM rollups WHERE type IN ('income', 'expense')
+    GROUP BY type, category
+    UNION ALL
+    SELECT 'month', 'expense', month, SUM(total)
+    FROM rollups WHERE type = 'expense'
+    GROUP BY month
+    UNION ALL
+    SELECT 'average', 'expense', NULL, AVG(month_total)
+    FROM (SELECT SUM(total) AS month_total FROM rollups WHERE type = 'expense' GROUP BY month) months
+    ORDER BY kind, type, total DESC
+"""
+
+AnalyticsSummary = namedtuple(
+    "AnalyticsSummary",
+    "income_total expense_total balance income_by_category expense_by_category expense_by_month avg_monthly_expense"
+)
+
+def _get_analytics_summary(user_id: int):
+    """Повертає AnalyticsSummary або None, якщо в користувача ще немає транзакцій."""
+    session = read_session(user_id)
+    try:
+        rows = session.execute(text(ANALYTICS_SUMMARY_SQL), {"user_id": user_id}).all()
+    finally:
+        session.close()
+
+    totals = {row.type: row.total for row in rows if row.kind == 'total'}
+    if not totals:
+        return None
+    categories = {'income': [], 'expense': []}
+    expense_by_month = []
+    avg_monthly_expense = 0.0
+    for row in rows:
+        if row.kind == 'category':
+            categories[row.type].append((row.key, row.total))
+        elif row.kind == 'month':
+            expense_by_month.append((row.key, row.total))
+        elif row.kind == 'average':
+            avg_monthly_expense = row.total or 0.0
+    return AnalyticsSummary(
+        income_total=totals['income'],
+        expense_total=totals['expense'],
+        balance=totals['income'] - totals['expense'],
+        income_by_category=categories['income'],
+        expense_by_category=categories['expense'],
+        expense_by_month=sorted(expense_by_month),
+        avg_monthly_expense=avg_monthly_expense
+    )
+
+# Суми за довільний період [:start, :end] як різниця накопичених денних сум:
+# для кожної категорії знаходяться дні двох граничних рядків (останній до :start
+# і останній до :end включно), і кожен з них читається один раз по первинному ключу
+RANGE_TOTALS_SQL = """
+    WITH bounds AS (
+        SELECT k.type, k.category,
+            (SELECT MAX(p.day) FROM daily_prefix_sums p
+             WHERE p.user_id = :user_id AND p.type = k.type AND p.category = k.category AND p.day <= :end) AS end_day,
+            (SELECT MAX(p.day) FROM daily_prefix_sums p
+             WHERE p.user_id = :user_id AND p.type = k.type AND p.category = k.category AND p.day < :start) AS start_day
+        FROM (SELECT DISTINCT type, category FROM monthly_rollups WHERE user_id = :user_id) k
+    ),
+    ranges AS (
+        SELECT b.type, b.category,
+            COALESCE(e.total, 0) - COALESCE(s.total, 0) AS total,
+            COALESCE(e.count, 0) - COALESCE(s.count, 0) AS count
+        FROM bounds b
+        LEFT JOIN daily_prefix_sums e
+            ON e.user_id = :user_id AND e.type = b.type AND e.category = b.category AND e.day = b.end_day
+        LEFT JOIN daily_prefix_sums s
+            ON s.user_id = :user_id AND s.type = b.type AND s.category = b.category AND s.day = b.start_day
+    )
+    SELECT type, category, total, count FROM ranges
+    WHERE count > 0
+    ORDER BY type, total DESC
+"""
+
+def _get_range_totals(user_id: int, start, end):
+    """Суми й кількість по (тип, категорія) за дні від start до end включно."""
+    session = read_session(user_id)
+    try:
+        return session.execute(
+            text(RANGE_TOTALS_SQL),
+            {"user_id": user_id, "start": start.isoformat(), "end": end.isoformat()}
+        ).all()
+    finally:
+        session.close()
+
+ExportResult = namedtuple("ExportResult", "file filename rows")
+
+def _single_page(fetch, user_id: int):
+    yield fetch(user_id)
+
+def _export_user_data(user_id: int, export_format: str, compress: bool = False):
+    """Транзакції (сторінками, разом з архівом), бюджети й цілі у тимчасовий файл.
+
+    Викликач відповідає за закриття ExportResult.file.
+    """
+    started = time.perf_counter()
+    sections = [
+        data_export.ExportSection("transaction", TransactionRecord._fields, iter_transaction_pages(user_id)),
+        data_export.ExportSection("budget", BudgetRecord._fields, _single_page(_get_budgets, user_id)),
+        data_export.ExportSection("goal", GoalRecord._fields, _single_page(_get_goals, user_id)),
+    ]
+    export_file, rows = data_export.export_to_spool(sections, export_format, compress)
+    elapsed = time.perf_counter() - started
+    size = export_file.seek(0, os.SEEK_END)
+    export_file.seek(0)
+    logger.info(
+        f"Data exported for user {user_id}: {rows} rows, {size} bytes as {export_format}"
+        f"{'.gz' if compress else ''} in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)"
+    )
+    return ExportResult(export_file, data_export.export_filename(export_format, compress), rows)
+
+def _set_currency(user_id: int, currency: str):
+    """Повертає True, якщо користувача знайдено і валюту змінено."""
+    session = user_session(user_id)
+    try:
+        user = session.query(User).filter_by(id=user_id).first()
+        if not user:
+            return False
+        user.currency = currency
+        session.commit()
+        return True
+    except SQLAlchemyError:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def _get_budgets(user_id: int):
+    session = read_session(user_id)
+    try:
+        return read_models.fetch_all(session, read_models.budgets_select(user_id), BudgetRecord)
+    finally:
+        session.close()
+
+def _set_budget_limit(user_id: int, category: str, limit: float):
+    """Створює або оновлює ліміт. Повертає True, якщо ліміт вже існував."""
+    session = user_session(user_id)
+    try:
+        budget = session.query(Budget).filter_by(user_id=user_id, category=category).first()
+        existed = budget is not None
+        if budget:
+            budget.limit = limit
+        else:
+            budget = Budget(user_id=user_id, category=category, limit=limit)
+        session.add(budget)
+        session.commit()
+        return existed
+    except SQLAlchemyError:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def _get_goals(user_id: int):
+    session = read_session(user_id)
+    try:
+        return read_models.fetch_all(session, read_models.goals_select(user_id), GoalRecord)
+    finally:
+        session.close()
+
+def _create_goal(user_id: int, name: str, target_amount: float, months: int, description: str = None):
+    session = user_session(user_id)
+    try:
+        goal = Goal(
+            user_id=user_id,
+            name=name,
+            target_amount=target_amount,
+            months=months,
+            created_at=datetime.now().date(),
+            description=description,
+            deposits=0.0
+        )
+        session.add(goal)
+        session.commit()
+        return goal
+    except SQLAlchemyError:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def _deposit_to_goal(user_id: int, goal_id: int, amount: float):
+    """Додає внесок до цілі. Повертає оновлену ціль або None, якщо її не знайдено."""
+    session = user_session(user_id)
+    try:
+        goal = session.query(Goal).filter_by(id=goal_id, user_id=user_id).first()
+        if not goal:
+            return None
+        goal.deposits = (goal.deposits or 0.0) + amount
+        goal.current_amount = (goal.current_amount or 0.0) + amount
+        session.commit()
+        return goal
+    except SQLAlchemyError:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def _delete_goal(user_id: int, goal_id: int):
+    """Видаляє ціль. Повертає назву видаленої цілі або None, якщо її не знайдено."""
+    session = user_session(user_id)
+    try:
+        goal = session.query(Goal).filter_by(id=goal_id, user_id=user_id).first()
+        if not goal:
+            return None
+        name = goal.name
+        session.delete(goal)
+        session.commit()
+        return name
+    except SQLAlchemyError:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+async def get_or_create_user(user_id: int, username: str, first_name: str, last_name: str = None, language_code: str = None):
+    user = user_cache.get(user_id)
+    if user is not None:
+        user_cache.touch(user_id)
+        return user
+    user = await run_db(_get_or_create_user, user_id, username, first_name, last_name, language_code)
+    if user is not None:
+        user_cache.put(user_id, user)
+    return user
+
+async def flush_last_activity():
+    pending = user_cache.drain_activity()
+    if pending:
+        await run_db(_flush_last_activity, pending)
+
+async def activity_flusher():
+    """Фонова задача: раз на ACTIVITY_FLUSH_INTERVAL секунд записує last_activity."""
+    while True:
+        await asyncio.sleep(ACTIVITY_FLUSH_INTERVAL)
+        try:
+            await flush_last_activity()
+        except Exception as e:
+            logger.error(f"Error in activity flusher: {e}")
+
+async def add_transaction(user_id: int, amount: float, transaction_type: str, category: str, description: str = None):
+    if transaction_committer is not None:
+        return await transaction_committer.submit((user_id, amount, transaction_type, category, description))
+    return await run_db(_add_transaction, user_id, amount, transaction_type, category, description)
+
+async def update_transaction(user_id: int, transaction_id: int, amount: float = None, category: str = None):
+    return await run_db(_update_transaction, user_id, transaction_id, amount, category)
+
+async def delete_transaction(user_id: int, transaction_id: int):
+    return await run_db(_delete_transaction, user_id, transaction_id)
+
+async def import_statement(user_id: int, path: str):
+    return await run_db(_import_statement, user_id, path)
+
+async def get_transactions(user_id: int, limit: int = 10):
+    return await run_db_read(_get_transactions, user_id, limit)
+
+async def stream_transactions(user_id: int, page_size: int = STREAM_PAGE_SIZE):
+    """Асинхронний варіант iter_transactions: кожна сторінка читається в пулі потоків БД."""
+    pages = iter_transaction_pages(user_id, page_size)
+    while True:
+        page = await run_db_read(next, pages, None)
+        if page is None:
+            return
+        for row in page:
+            yield row
+
+async def load_transaction_columns(user_id: int):
+    return await run_db_read(_load_transaction_columns, user_id)
+
+async def get_expense_stats(user_id: int):
+    return await run_db_read(expense_stats, user_id)
+
+async def get_balance(user_id: int):
+    return await run_db_read(_get_balance, user_id)
+
+async def get_totals(user_id: int):
+    return await run_db_read(_get_totals, user_id)
+
+async def get_category_totals(user_id: int, month: str = None):
+    return await run_db_read(_get_category_totals, user_id, month)
+
+async def get_monthly_totals(user_id: int, transaction_type: str):
+    return await run_db_read(_get_monthly_totals, user_id, transaction_type)
+
+async def get_analytics_summary(user_id: int):
+    return await run_db_read(_get_analytics_summary, user_id)
+
+async def get_range_totals(user_id: int, start, end):
+    return await run_db_read(_get_range_totals, user_id, start, end)
+
+async def export_user_data(user_id: int, export_format: str, compress: bool = False):
+    return await run_db_read(_export_user_data, user_id, export_format, compress)
+
+async def set_currency(user_id: int, currency: str):
+    user_cache.invalidate(user_id)
+    return await run_db(_set_currency, user_id, currency)
+
+async def get_budgets(user_id: int):
+    return await run_db_read(_get_budgets, user_id)
+
+async def set_budget_limit(user_id: int, category: str, limit: float):
+    return await run_db(_set_budget_limit, user_id, category, limit)
+
+async def get_goals(user_id: int):
+    return await run_db_read(_get_goals, user_id)
+
+async def create_goal(user_id: int, name: str, target_amount: float, months: int, description: str = None):
+    return await run_db(_create_goal, user_id, name, target_amount, months, description)
+
+async def deposit_to_goal(user_id: int, goal_id: int, amount: float):
+    return await run_db(_deposit_to_goal, user_id, goal_id, amount)
+
+async def delete_goal(user_id: int, goal_id: int):
+    return await run_db(_delete_goal, user_id, goal_id)
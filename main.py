@@ -1,5 +1,15 @@
 import os
+import argparse
+import asyncio
+import html
 import logging
+import tempfile
+from dotenv import load_dotenv
+
+# .env читається до імпорту модулів проєкту: database та інші беруть налаштування
+# з оточення під час імпорту
+load_dotenv()
+
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import (
     Application,
@@ -9,13 +19,16 @@ from telegram.ext import (
     CallbackContext,
     ConversationHandler
 )
-from dotenv import load_dotenv
-from sqlalchemy.orm import Session
 from datetime import datetime
 import handlers.ai as ai
 import handlers.settings as settings
-from database import init_db, User, Transaction, Budget, Goal, engine, Session as DBSession
+from database import init_db, run_db
 import handlers.transactions as db_transactions
+import statement_import
+import metrics
+from update_processor import PerUserUpdateProcessor
+from persistence import SQLitePersistence
+from send_scheduler import SEND_GLOBAL_BURST, SEND_GLOBAL_RATE, SendScheduler
 
 logging.basicConfig(
     level=logging.INFO,
@@ -27,13 +40,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-
 ADD_TRANSACTION_TYPE, ADD_TRANSACTION_AMOUNT, ADD_TRANSACTION_CATEGORY, ADD_TRANSACTION_DESCRIPTION = range(5, 9)
 ADD_INCOME_AMOUNT, ADD_INCOME_CATEGORY, ADD_INCOME_DESCRIPTION = range(9, 12)
 BUDGET_MENU, ADDING_EXPENSE, SETTING_BUDGET, AI_SESSION, GOAL_MENU = range(5)
 
-init_db()
+# Користувачі з доступом до службових команд (/metrics)
+ADMIN_IDS = {int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()}
+
+# Спосіб отримання оновлень: polling (getUpdates), webhook (див. webhook.py)
+# або workers — polling з розподілом оновлень між процесами (див. workers.py)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+
+# Найбільший файл, який Bot API дозволяє завантажити боту
+IMPORT_MAX_BYTES = 20 * 1024 * 1024
 
 def build_main_keyboard():
     keyboard = [
@@ -99,6 +118,9 @@ async def cmd_help(update: Update, context: CallbackContext):
 /start - Початок роботи
 /help - Довідка
 /analytics - Фінансова аналітика
+/report [з] [по] - Звіт за довільний період
+/import - Імпорт CSV-виписки банку
+/settings - Налаштування та експорт даних
 
 <b>Бюджет:</b>
 /budget - Управління бюджетом
@@ -112,6 +134,123 @@ async def cmd_help(update: Update, context: CallbackContext):
 /advice - Отримати фінансові поради"""
     await update.message.reply_text(help_msg, parse_mode="HTML")
 
+REPORT_DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y")
+
+def parse_report_date(value: str):
+    for date_format in REPORT_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Невірна дата: {value}")
+
+async def cmd_report(update: Update, context: CallbackContext):
+    user_id = update.effective_user.id
+    try:
+        if len(context.args) != 2:
+            raise ValueError("Потрібно дві дати")
+        start, end = (parse_report_date(value) for value in context.args)
+        if start > end:
+            start, end = end, start
+    except ValueError:
+        await update.message.reply_text(
+            "❌ Використовуйте: <code>/report 2024-01-01 2024-03-31</code> або <code>/report 01.01.2024 31.03.2024</code>",
+            parse_mode="HTML"
+        )
+        return
+
+    try:
+        rows = await db_transactions.get_range_totals(user_id, start, end)
+        period = f"{start.strftime('%d.%m.%Y')} – {end.strftime('%d.%m.%Y')}"
+        if not rows:
+            await update.message.reply_text(f"📭 За період {period} транзакцій немає.")
+            return
+
+        income = [(row.category, row.total) for row in rows if row.type == 'income']
+        expense = [(row.category, row.total) for row in rows if row.type == 'expense']
+        total_income = sum(amount for _, amount in income)
+        total_expense = sum(amount for _, amount in expense)
+
+        message = f"🗓 <b>Звіт за {period}:</b>\n\n"
+        message += f"⬆️ <b>Доходи:</b> {total_income:.2f} грн\n"
+        message += f"⬇️ <b>Витрати:</b> {total_expense:.2f} грн\n"
+        message += f"💰 <b>Різниця:</b> {total_income - total_expense:.2f} грн\n"
+        if expense:
+            message += "\n<b>Витрати за категоріями:</b>\n"
+            for category, amount in expense:
+                percentage = (amount / total_expense) * 100 if total_expense > 0 else 0
+                message += f"▪ {category.capitalize()}: {amount:.2f} грн ({percentage:.1f}%)\n"
+        if income:
+            message += "\n<b>Доходи за категоріями:</b>\n"
+            for category, amount in income:
+                message += f"▪ {category.capitalize()}: {amount:.2f} грн\n"
+
+        await update.message.reply_text(message, parse_mode="HTML")
+    except Exception as e:
+        logger.error(f"Помилка при формуванні звіту за період: {e}")
+        await update.message.reply_text("❌ Сталася помилка при формуванні звіту.")
+
+async def cmd_metrics(update: Update, context: CallbackContext):
+    if update.effective_user.id not in ADMIN_IDS:
+        return
+    message = f"📈 Метрики:\n{metrics.format_snapshot() or 'немає даних'}"
+    processor = context.application.update_processor
+    if isinstance(processor, PerUserUpdateProcessor) and processor.queue_depths():
+        message += "\n\nНайдовші черги користувачів:\n"
+        message += "\n".join(f"{key}: {depth}" for key, depth in processor.queue_depths(5))
+    await update.message.reply_text(message)
+
+async def cmd_import(update: Update, context: CallbackContext):
+    user = update.effective_user
+    await db_transactions.get_or_create_user(user.id, user.username, user.first_name, user.last_name, user.language_code)
+    await update.message.reply_text(
+        "📥 <b>Імпорт виписки</b>\n\n"
+        "Надішліть CSV-файл виписки monobank або ПриватБанку.\n"
+        "Підійде й власна таблиця з колонками <code>дата;сума</code> "
+        "(необов'язково: <code>тип</code>, <code>категорія</code>, <code>опис</code>). "
+        "Від'ємна сума — витрата, додатна — дохід.\n\n"
+        "/cancel — скасувати",
+        parse_mode="HTML"
+    )
+    return "WAITING_IMPORT_FILE"
+
+async def handle_import_file(update: Update, context: CallbackContext):
+    user_id = update.effective_user.id
+    document = update.message.document
+    if document.file_size and document.file_size > IMPORT_MAX_BYTES:
+        await update.message.reply_text("❌ Файл завеликий: максимум 20 МБ. Розбийте виписку на частини.")
+        return "WAITING_IMPORT_FILE"
+
+    await update.message.reply_text("⏳ Імпортую виписку...")
+    path = None
+    try:
+        with tempfile.NamedTemporaryFile(prefix="finwise_import_", suffix=".csv", delete=False) as temp_file:
+            path = temp_file.name
+        telegram_file = await document.get_file()
+        await telegram_file.download_to_drive(path)
+        result = await db_transactions.import_statement(user_id, path)
+    except statement_import.ImportFormatError as e:
+        await update.message.reply_text(f"❌ Не вдалося розпізнати виписку.\n{e}")
+        return "WAITING_IMPORT_FILE"
+    except Exception as e:
+        logger.error(f"Error importing statement: {e}")
+        await update.message.reply_text("❌ Сталася помилка при імпорті. Жодну транзакцію не додано.",
+                                        reply_markup=build_main_keyboard())
+        return ConversationHandler.END
+    finally:
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+    message = f"✅ <b>Імпортовано транзакцій:</b> {result.imported}\n"
+    if result.skipped:
+        message += f"⚠️ <b>Пропущено рядків:</b> {result.skipped}\n"
+        for line_number, reason in result.errors:
+            message += f"▪ рядок {line_number}: {html.escape(reason)}\n"
+        if result.skipped > len(result.errors):
+            message += f"▪ ... ще {result.skipped - len(result.errors)}\n"
+    await update.message.reply_text(message, parse_mode="HTML", reply_markup=build_main_keyboard())
+    return ConversationHandler.END
+
 async def handle_transaction_start(update: Update, context: CallbackContext):
     user_id = update.effective_user.id
     username = update.effective_user.username
@@ -359,29 +498,29 @@ async def add_expense(update: Update, context: CallbackContext):
 async def show_statistics(update: Update, context: CallbackContext):
     user_id = update.effective_user.id
     try:
-        transactions_list = await db_transactions.get_transactions(user_id, limit=9999)
+        totals = await db_transactions.get_totals(user_id)
 
-        if not transactions_list:
+        if totals is None:
             await update.message.reply_text(
                 "📭 У вас ще немає транзакцій.",
                 reply_markup=build_budget_keyboard()
             )
             return BUDGET_MENU
 
-        total_income = sum(t.amount for t in transactions_list if t.type == 'income')
-        total_expense = sum(t.amount for t in transactions_list if t.type == 'expense')
-        current_balance = await db_transactions.get_balance(user_id)
+        total_income = totals.income_total
+        total_expense = totals.expense_total
+        current_balance = total_income - total_expense
 
         monthly_expenses_by_category = {}
         monthly_income_by_category = {}
         current_month_str = datetime.now().strftime("%Y-%m")
 
-        for t in transactions_list:
-            if t.date.strftime("%Y-%m") == current_month_str:
-                if t.type == 'expense':
-                    monthly_expenses_by_category[t.category] = monthly_expenses_by_category.get(t.category, 0.0) + t.amount
-                elif t.type == 'income':
-                    monthly_income_by_category[t.category] = monthly_income_by_category.get(t.category, 0.0) + t.amount
+        # Місячні зведення: кілька рядків незалежно від довжини історії
+        for transaction_type, category, amount in await db_transactions.get_category_totals(user_id, current_month_str):
+            if transaction_type == 'expense':
+                monthly_expenses_by_category[category] = amount
+            elif transaction_type == 'income':
+                monthly_income_by_category[category] = amount
         
         sorted_expense_categories = sorted(monthly_expenses_by_category.items(), key=lambda item: item[1], reverse=True)
         sorted_income_categories = sorted(monthly_income_by_category.items(), key=lambda item: item[1], reverse=True)
@@ -455,9 +594,7 @@ async def handle_budget_settings(update: Update, context: CallbackContext):
             return ConversationHandler.END
             
         if user_input.lower() == '/list':
-            session = DBSession()
-            budgets = session.query(Budget).filter_by(user_id=user_id).all()
-            session.close()
+            budgets = await db_transactions.get_budgets(user_id)
             
             if not budgets:
                 await update.message.reply_text(
@@ -484,17 +621,8 @@ async def handle_budget_settings(update: Update, context: CallbackContext):
         category = parts[0].lower()
         limit = float(parts[1])
         
-        session = DBSession()
-        budget = session.query(Budget).filter_by(user_id=user_id, category=category).first()
-        if budget:
-            budget.limit = limit
-            action_msg = "оновлено"
-        else:
-            budget = Budget(user_id=user_id, category=category, limit=limit)
-            action_msg = "встановлено"
-        session.add(budget)
-        session.commit()
-        session.close()
+        existed = await db_transactions.set_budget_limit(user_id, category, limit)
+        action_msg = "оновлено" if existed else "встановлено"
         
         await update.message.reply_text(
             f"✅ Ліміт для '{category}' {action_msg} на {limit} грн",
@@ -533,9 +661,8 @@ async def handle_goals(update: Update, context: CallbackContext):
 
 async def goal_list(update: Update, context: CallbackContext):
     user_id = update.effective_user.id
-    session = DBSession()
     try:
-        goals = session.query(Goal).filter_by(user_id=user_id).all()
+        goals = await db_transactions.get_goals(user_id)
 
         if not goals:
             await update.message.reply_text("📭 У вас ще немає цілей", reply_markup=build_goals_keyboard())
@@ -569,8 +696,6 @@ async def goal_list(update: Update, context: CallbackContext):
             reply_markup=build_goals_keyboard()
         )
         return GOAL_MENU
-    finally:
-        session.close()
 
 async def goal_create_prompt(update: Update, context: CallbackContext):
     await update.message.reply_text(
@@ -584,7 +709,6 @@ async def goal_create_prompt(update: Update, context: CallbackContext):
 
 async def goal_create(update: Update, context: CallbackContext):
     user_id = update.effective_user.id
-    session = DBSession()
     try:
         text = update.message.text.strip()
         tokens = text.split()
@@ -612,17 +736,7 @@ async def goal_create(update: Update, context: CallbackContext):
             await update.message.reply_text("❌ Назва цілі не може бути пустою", reply_markup=build_goals_keyboard())
             return GOAL_MENU
 
-        goal = Goal(
-            user_id=user_id,
-            name=name,
-            target_amount=target_amount,
-            months=months,
-            created_at=datetime.now().date(),
-            description=description,
-            deposits=0.0
-        )
-        session.add(goal)
-        session.commit()
+        await db_transactions.create_goal(user_id, name, target_amount, months, description)
 
         reply_text = (
             f"✅ Ціль <b>'{name}'</b> створена!\n"
@@ -645,8 +759,6 @@ async def goal_create(update: Update, context: CallbackContext):
             reply_markup=build_goals_keyboard()
         )
         return GOAL_MENU
-    finally:
-        session.close()
 
 async def goal_add_prompt(update: Update, context: CallbackContext):
     await update.message.reply_text(
@@ -660,7 +772,6 @@ async def goal_add_prompt(update: Update, context: CallbackContext):
 
 async def handle_deposit(update: Update, context: CallbackContext):
     user_id = update.effective_user.id
-    session = DBSession()
     try:
         args = update.message.text.split()
         if len(args) < 2:
@@ -677,7 +788,8 @@ async def handle_deposit(update: Update, context: CallbackContext):
             await update.message.reply_text("❌ Сума внеску має бути більше 0", reply_markup=build_goals_keyboard())
             return "WAITING_DEPOSIT"
 
-        goal = session.query(Goal).filter_by(id=goal_id, user_id=user_id).first()
+        # Оновлюємо суми цілі
+        goal = await db_transactions.deposit_to_goal(user_id, goal_id, amount)
 
         if not goal:
             await update.message.reply_text(
@@ -686,11 +798,6 @@ async def handle_deposit(update: Update, context: CallbackContext):
             )
             return "WAITING_DEPOSIT"
 
-        # Оновлюємо суми цілі
-        goal.deposits += amount
-        goal.current_amount += amount
-        session.commit()
-
         # Додаємо транзакцію
         await db_transactions.add_transaction(
             user_id=user_id,
@@ -727,8 +834,6 @@ async def handle_deposit(update: Update, context: CallbackContext):
             reply_markup=build_goals_keyboard()
         )
         return "WAITING_DEPOSIT"
-    finally:
-        session.close()
 
 async def goal_delete_prompt(update: Update, context: CallbackContext):
     await update.message.reply_text(
@@ -741,24 +846,20 @@ async def goal_delete_prompt(update: Update, context: CallbackContext):
 
 async def goal_delete(update: Update, context: CallbackContext):
     user_id = update.effective_user.id
-    session = DBSession()
     try:
         goal_id = int(update.message.text)
 
-        goal = session.query(Goal).filter_by(id=goal_id, user_id=user_id).first()
+        goal_name = await db_transactions.delete_goal(user_id, goal_id)
 
-        if not goal:
+        if not goal_name:
             await update.message.reply_text(
                 "❌ Ціль не знайдена",
                 reply_markup=build_goals_keyboard()
             )
             return GOAL_MENU
 
-        session.delete(goal)
-        session.commit()
-
         await update.message.reply_text(
-            f"✅ Ціль <b>'{goal.name}'</b> видалена!",
+            f"✅ Ціль <b>'{goal_name}'</b> видалена!",
             parse_mode="HTML",
             reply_markup=build_goals_keyboard()
         )
@@ -777,49 +878,48 @@ async def goal_delete(update: Update, context: CallbackContext):
             reply_markup=build_goals_keyboard()
         )
         return GOAL_MENU
-    finally:
-        session.close()
+
+# Скільки останніх місяців показувати в аналітиці
+ANALYTICS_MONTHS = 6
 
 async def handle_analytics(update: Update, context: CallbackContext):
     user_id = update.effective_user.id
     try:
-        all_transactions = await db_transactions.get_transactions(user_id, limit=99999)
+        summary = await db_transactions.get_analytics_summary(user_id)
 
-        if not all_transactions:
+        if summary is None:
             await update.message.reply_text(
                 "📭 У вас ще немає транзакцій для аналітики.",
                 reply_markup=build_main_keyboard()
             )
             return ConversationHandler.END
 
-        current_balance = await db_transactions.get_balance(user_id)
-
-        spending_by_category = {}
-        income_by_category = {}
-        for t in all_transactions:
-            if t.type == 'expense':
-                spending_by_category[t.category] = spending_by_category.get(t.category, 0.0) + t.amount
-            elif t.type == 'income':
-                income_by_category[t.category] = income_by_category.get(t.category, 0.0) + t.amount
-
-        sorted_expense_categories = sorted(spending_by_category.items(), key=lambda item: item[1], reverse=True)
-        sorted_income_categories = sorted(income_by_category.items(), key=lambda item: item[1], reverse=True)
-        total_overall_expense = sum(spending_by_category.values())
-        total_overall_income = sum(income_by_category.values())
-
-        months_data = {}
-        for t in all_transactions:
-            if t.type == 'expense' and t.date:
-                month_key = t.date.strftime('%Y-%m')
-                months_data[month_key] = months_data.get(month_key, 0.0) + t.amount
-        
-        avg_monthly_expense = sum(months_data.values()) / len(months_data) if months_data else 0
+        current_balance = summary.balance
+        sorted_expense_categories = summary.expense_by_category
+        sorted_income_categories = summary.income_by_category
+        total_overall_expense = summary.expense_total
+        total_overall_income = summary.income_total
+        avg_monthly_expense = summary.avg_monthly_expense
 
         response = "📊 <b>Фінансова аналітика</b>\n\n"
         response += f"💰 <b>Поточний баланс:</b> {current_balance:.2f} грн\n"
         response += f"⬆️ <b>Загальні доходи:</b> {total_overall_income:.2f} грн\n"
         response += f"⬇️ <b>Загальні витрати:</b> {total_overall_expense:.2f} грн\n"
-        response += f"📆 <b>Середньомісячні витрати:</b> {avg_monthly_expense:.2f} грн\n\n"
+        response += f"📆 <b>Середньомісячні витрати:</b> {avg_monthly_expense:.2f} грн\n"
+        # Розподіл окремих витрат і тренд рахує analytics_engine по колонковому знімку історії
+        stats = await db_transactions.get_expense_stats(user_id)
+        if stats is not None:
+            response += f"📏 <b>Типова витрата:</b> {stats.median:.2f} грн (90% витрат до {stats.p90:.2f} грн)\n"
+            if stats.trend is not None:
+                icon, direction = ("📈", "зростають") if stats.trend > 0 else ("📉", "знижуються")
+                response += f"{icon} <b>Тренд витрат:</b> {direction} на {abs(stats.trend):.2f} грн/міс\n"
+        response += "\n"
+
+        if summary.expense_by_month:
+            response += "<b>Витрати за останні місяці:</b>\n"
+            for month, amount in summary.expense_by_month[-ANALYTICS_MONTHS:]:
+                response += f"▪ {month}: {amount:.2f} грн\n"
+            response += "\n"
         
         if sorted_income_categories:
             response += "<b>Топ категорій доходів:</b>\n"
@@ -850,6 +950,8 @@ async def handle_analytics(update: Update, context: CallbackContext):
 def setup_handlers(application: Application):
     application.add_handler(CommandHandler("start", cmd_start))
     application.add_handler(CommandHandler("help", cmd_help))
+    application.add_handler(CommandHandler("report", cmd_report))
+    application.add_handler(CommandHandler("metrics", cmd_metrics))
     application.add_handler(MessageHandler(filters.Text(["📊 Аналіз"]), handle_analytics))
     
     # Обробник для звичайних транзакцій (доходи та витрати)
@@ -872,7 +974,9 @@ def setup_handlers(application: Application):
         fallbacks=[
             CommandHandler("cancel", cancel_conversation),
             MessageHandler(filters.Text(["❌ Скасувати", "🔙 На головну"]), cancel_conversation)
-        ]
+        ],
+        name="transaction",
+        persistent=True
     )
     application.add_handler(transaction_handler)
     
@@ -893,10 +997,28 @@ def setup_handlers(application: Application):
         fallbacks=[
             CommandHandler("cancel", cancel_conversation),
             MessageHandler(filters.Text(["❌ Скасувати", "🔙 На головну"]), cancel_conversation)
-        ]
+        ],
+        name="income",
+        persistent=True
     )
     application.add_handler(income_handler)
 
+    import_handler = ConversationHandler(
+        entry_points=[CommandHandler("import", cmd_import)],
+        states={
+            "WAITING_IMPORT_FILE": [
+                MessageHandler(filters.Document.ALL, handle_import_file)
+            ]
+        },
+        fallbacks=[
+            CommandHandler("cancel", cancel_conversation),
+            MessageHandler(filters.Text(["❌ Скасувати", "🔙 На головну"]), cancel_conversation)
+        ],
+        name="import",
+        persistent=True
+    )
+    application.add_handler(import_handler)
+
     goals_handler = ConversationHandler(
         entry_points=[MessageHandler(filters.Text(["🎯 Цілі"]), handle_goals)],
         states={
@@ -921,7 +1043,9 @@ def setup_handlers(application: Application):
         fallbacks=[
             CommandHandler("cancel", cancel_conversation),
             MessageHandler(filters.Text(["🔙 На головну"]), cancel_conversation)
-        ]
+        ],
+        name="goals",
+        persistent=True
     )
     application.add_handler(goals_handler)
     
@@ -948,10 +1072,40 @@ def setup_handlers(application: Application):
         fallbacks=[
             CommandHandler("cancel", cancel_conversation),
             MessageHandler(filters.Text(["❌ Скасувати"]), cancel_conversation)
-        ]
+        ],
+        name="budget",
+        persistent=True
     )
     application.add_handler(budget_handler)
     
+    settings_menu = [
+        MessageHandler(filters.Text(["💱 Змінити валюту"]), settings.change_currency_start),
+        MessageHandler(filters.Text(["🔔 Сповіщення"]), settings.notification_settings),
+        MessageHandler(filters.Text(["📤 Експорт даних"]), settings.data_export),
+        MessageHandler(filters.Text(["🔙 На головну"]), cancel_conversation)
+    ]
+    settings_handler = ConversationHandler(
+        entry_points=[CommandHandler("settings", settings.handle_settings)],
+        states={
+            settings.SETTINGS_MENU: settings_menu,
+            settings.NOTIFICATION_SETTINGS: settings_menu,
+            settings.CHANGE_CURRENCY: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, settings.change_currency)
+            ],
+            settings.DATA_EXPORT: [
+                MessageHandler(filters.Text(["🔙 На головну"]), cancel_conversation),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, settings.export_data)
+            ]
+        },
+        fallbacks=[
+            CommandHandler("cancel", cancel_conversation),
+            MessageHandler(filters.Text(["🔙 На головну"]), cancel_conversation)
+        ],
+        name="settings",
+        persistent=True
+    )
+    application.add_handler(settings_handler)
+
     ai_handler = ConversationHandler(
         entry_points=[
             MessageHandler(filters.Text(["🤖 AI Поради"]), handle_ai_advice),
@@ -971,20 +1125,90 @@ def setup_handlers(application: Application):
         fallbacks=[
             CommandHandler("cancel", cancel_conversation),
             MessageHandler(filters.Text(["❌ Скасувати"]), cancel_conversation)
-        ]
+        ],
+        name="ai",
+        persistent=True
     )
     application.add_handler(ai_handler)
 
+async def on_startup(application: Application):
+    # Перевірка й оновлення схеми — один раз перед обробкою першого оновлення
+    await run_db(init_db)
+    await on_worker_startup(application)
+
+async def on_worker_startup(application: Application):
+    """post_init процесу-обробника (BOT_MODE=workers): схему вже оновив диспетчер."""
+    application.bot_data['activity_flusher'] = asyncio.create_task(db_transactions.activity_flusher())
+
+async def on_shutdown(application: Application):
+    flusher = application.bot_data.pop('activity_flusher', None)
+    if flusher:
+        flusher.cancel()
+    if db_transactions.transaction_committer is not None:
+        await db_transactions.transaction_committer.drain()
+    # Записуємо останні накопичені last_activity перед зупинкою
+    await db_transactions.flush_last_activity()
+
+def build_application(token: str, base_url: str = None, workers: int = 1, updater: bool = True,
+                      init_schema: bool = True):
+    """Application з усіма налаштуваннями бота, але без обробників (див. setup_handlers).
+
+    workers — кількість процесів, що надсилають повідомлення від імені бота
+    (BOT_MODE=workers): спільний ліміт Telegram ділиться між ними порівну.
+    init_schema=False — не викликати init_db під час запуску, бо схему вже
+    оновив інший процес; лишаються лише фонові задачі.
+    """
+    builder = (
+        Application.builder()
+        .token(token)
+        # Різні користувачі обробляються паралельно, оновлення одного — по черзі
+        .concurrent_updates(PerUserUpdateProcessor())
+        # Стани розмов і user_data переживають перезапуск
+        .persistence(SQLitePersistence())
+        # Вихідні повідомлення — з урахуванням лімітів Telegram, відповіді раніше за розсилки
+        .rate_limiter(SendScheduler(
+            global_rate=SEND_GLOBAL_RATE / workers,
+            global_burst=max(1.0, SEND_GLOBAL_BURST / workers)
+        ))
+        .post_init(on_startup if init_schema else on_worker_startup)
+        .post_shutdown(on_shutdown)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    if not updater:
+        builder = builder.updater(None)
+    return builder.build()
+
 def main():
+    parser = argparse.ArgumentParser(description="FinWise Owl — Telegram-бот фінансового обліку")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Показати, з чого складається час запуску, і вийти")
+    args = parser.parse_args()
+    if args.profile_startup:
+        import startup_profile
+        startup_profile.print_report()
+        return
+
     token = os.getenv("TELEGRAM_TOKEN")
     if not token:
         raise ValueError("Не вказано TELEGRAM_TOKEN")
     
-    application = Application.builder().token(token).build()
+    if BOT_MODE == "workers":
+        import workers
+        logger.info(f"Бот запускається з {workers.BOT_WORKERS} процесами-обробниками...")
+        asyncio.run(workers.serve_workers(token))
+        return
+
+    application = build_application(token)
     setup_handlers(application)
     
-    logger.info("Бот запускається...")
-    application.run_polling()
+    if BOT_MODE == "webhook":
+        import webhook
+        logger.info("Бот запускається в режимі вебхука...")
+        asyncio.run(webhook.serve_webhook(application))
+    else:
+        logger.info("Бот запускається...")
+        application.run_polling()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
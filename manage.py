@@ -0,0 +1,410 @@
+"""Службові команди для обслуговування бази даних FinWise Owl.
+
+Приклади:
+    python manage.py ledger verify
+    python manage.py ledger rebuild
+    python manage.py rollups verify
+    python manage.py prefix verify
+    python manage.py schema explain
+    python manage.py shards status
+    python manage.py archive run --before 2024-01-01
+    python manage.py shards reshard --to 4 --url-template "sqlite:///finance_bot_v2_{shard}.db" \
+        --archive-url-template "sqlite:///finance_bot_archive_v2_{shard}.db"
+"""
+import argparse
+import logging
+import sys
+from datetime import date
+from sqlalchemy import func, insert, select, text
+from database import (Base, Session, User, create_db_engine, engine, init_db, shard_engines, shard_for,
+                      shard_sessions, shard_urls, upgrade_schema, week_key)
+import aggregates
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+def per_shard(command):
+    """Виконує команду окремо в кожному шарді; код повернення — найгірший серед шардів."""
+    def run(args):
+        status = 0
+        for shard, session_factory in enumerate(shard_sessions):
+            if len(shard_sessions) > 1:
+                print(f"[шард {shard}]")
+            status = max(status, command(args, session_factory))
+        return status
+    return run
+
+def cmd_ledger(args, session_factory=Session):
+    session = session_factory()
+    try:
+        if args.action == "rebuild":
+            users = aggregates.rebuild_ledger(session)
+            session.commit()
+            print(f"Журнал балансів перебудовано: {users} користувачів")
+            return 0
+
+        drift = aggregates.verify_ledger(session)
+        if not drift:
+            print("Журнал балансів узгоджений з таблицею transactions")
+            return 0
+        print(f"Знайдено розбіжностей: {len(drift)}")
+        for user_id, column_name, ledger_value, actual_value in drift:
+            print(f"  user {user_id}: {column_name} = {ledger_value} (фактично {actual_value})")
+        return 1
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def cmd_rollups(args, session_factory=Session):
+    session = session_factory()
+    try:
+        if args.action == "rebuild":
+            rows = aggregates.rebuild_rollups(session)
+            session.commit()
+            print(f"Місячні зведення перебудовано: {rows} рядків")
+            return 0
+
+        drift = aggregates.verify_rollups(session)
+        if not drift:
+            print("Місячні зведення узгоджені з таблицею transactions")
+            return 0
+        print(f"Знайдено розбіжностей: {len(drift)}")
+        for (user_id, month, transaction_type, category), stored, actual in drift:
+            print(f"  user {user_id} {month} {transaction_type}/{category}: "
+                  f"сума {stored[0]}, к-сть {stored[1]} (фактично {actual[0]}, {actual[1]})")
+        return 1
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def cmd_prefix(args, session_factory=Session):
+    session = session_factory()
+    try:
+        if args.action == "rebuild":
+            rows = aggregates.rebuild_prefix_sums(session)
+            session.commit()
+            print(f"Накопичені денні суми перебудовано: {rows} рядків")
+            return 0
+
+        drift = aggregates.verify_prefix_sums(session)
+        if not drift:
+            print("Накопичені денні суми узгоджені з таблицею transactions")
+            return 0
+        print(f"Знайдено розбіжностей: {len(drift)}")
+        for (user_id, transaction_type, category, day), stored, actual in drift:
+            print(f"  user {user_id} {day} {transaction_type}/{category}: "
+                  f"сума {stored[0]}, к-сть {stored[1]} (фактично {actual[0]}, {actual[1]})")
+        return 1
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def _report_queries(session):
+    """(назва, SQL, параметри) для кожного запиту звітів."""
+    from handlers import analytics
+    import handlers.transactions as db_transactions
+    import read_models
+
+    today = date.today()
+    params = {
+        "user_id": 0,
+        "month": today.strftime("%Y-%m"),
+        "week": week_key(today),
+    }
+    for name, sql in analytics.REPORT_QUERIES.items():
+        yield f"analytics.{name}", sql, params
+    yield "transactions.get_analytics_summary", db_transactions.ANALYTICS_SUMMARY_SQL, params
+    yield "transactions.get_range_totals", db_transactions.RANGE_TOTALS_SQL, {
+        "user_id": 0, "start": date(today.year - 1, 1, 1).isoformat(), "end": today.isoformat()
+    }
+
+    orm_queries = {
+        "transactions.get_category_totals": db_transactions._category_totals_query(session, 0),
+        "transactions.get_category_totals(month)": db_transactions._category_totals_query(session, 0, params["month"]),
+        "transactions.get_monthly_totals": db_transactions._monthly_totals_query(session, 0, 'expense'),
+    }
+    orm_queries = {name: query.statement for name, query in orm_queries.items()}
+    orm_queries["transactions.get_transactions"] = read_models.transactions_select(0)
+    orm_queries["transactions.iter_transactions"] = db_transactions._transactions_page_query(0, (today, 0))
+    for name, statement in orm_queries.items():
+        compiled = statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+        yield name, str(compiled), {}
+
+def _full_scans(plan):
+    """Рядки плану, що читають таблицю повністю без індексу.
+
+    Сканування підзапитів, матеріалізованих CTE і співпрограм не рахуються:
+    їхні власні звернення до таблиць перевіряються окремими рядками плану.
+    """
+    materialized = {detail.split()[-1] for detail in plan if detail.startswith(("MATERIALIZE ", "CO-ROUTINE "))}
+    return [
+        detail for detail in plan
+        if detail.startswith("SCAN ") and "USING" not in detail
+        and not detail.startswith("SCAN (") and detail != "SCAN CONSTANT ROW"
+        and detail.split()[1] not in materialized
+    ]
+
+def cmd_schema(args):
+    if args.action == "upgrade":
+        upgrade_schema()
+        print("Схему оновлено")
+        return 0
+
+    if engine.dialect.name != "sqlite":
+        print("EXPLAIN QUERY PLAN підтримується лише для SQLite")
+        return 1
+
+    session = Session()
+    failed = 0
+    try:
+        for name, sql, params in _report_queries(session):
+            plan = [row[-1] for row in session.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params)]
+            scans = _full_scans(plan)
+            uses_index = not scans and any("USING" in detail for detail in plan)
+            failed += not uses_index
+            print(f"{'OK  ' if uses_index else 'FAIL'} {name}")
+            for detail in plan:
+                print(f"       {detail}")
+    finally:
+        session.close()
+    return 1 if failed else 0
+
+def _table_counts(table_engine):
+    with table_engine.connect() as conn:
+        return {
+            table.name: conn.execute(select(func.count()).select_from(table)).scalar()
+            for table in Base.metadata.sorted_tables
+        }
+
+def _renumbered(table):
+    """Чи отримують рядки таблиці нові id при перенесенні (автоінкрементні ключі шардів перетинаються)."""
+    primary_key = list(table.primary_key.columns)
+    return table.name != User.__tablename__ and len(primary_key) == 1 and primary_key[0].name == "id"
+
+# Пакети архіву великі (до ARCHIVE_CHUNK_ROWS стиснутих рядків), тож читаються невеликими порціями
+ARCHIVE_RESHARD_BATCH = 16
+
+def _archive_chunk_counts(archive_engines):
+    import archive
+
+    counts = []
+    for archive_engine in archive_engines:
+        with archive_engine.connect() as conn:
+            counts.append(conn.execute(select(func.count(archive.ArchivedChunk.id))).scalar())
+    return counts
+
+def _reshard_archive(target_archive_engines, source_count: int):
+    """Переносить пакети архіву в архіви нових шардів з тією ж перенумерацією id транзакцій, що й гаряча таблиця.
+
+    Архів кожного шарду містить лише користувачів цього шарду, тож номер
+    вихідного шарду пакета — номер його файлу архіву.
+    """
+    import archive
+
+    table = archive.ArchivedChunk.__table__
+    for source_index, source_engine in enumerate(archive.archive_engines):
+        with source_engine.connect() as source:
+            # Без id: нові ключі пакетів призначає цільовий архів, порядок читання задає (first_date, id)
+            result = source.execution_options(yield_per=ARCHIVE_RESHARD_BATCH).execute(
+                select(*(column for column in table.columns if column.name != "id"))
+                .order_by(table.c.user_id, table.c.first_date, table.c.id)
+            )
+            for partition in result.partitions():
+                by_target = {}
+                for row in partition:
+                    values = row._asdict()
+                    if source_count > 1:
+                        values["payload"] = archive.encode_rows([
+                            record._replace(id=record.id * source_count + source_index)
+                            for record in archive.decode_rows(values["payload"])
+                        ])
+                    target = shard_for(values["user_id"], len(target_archive_engines))
+                    by_target.setdefault(target, []).append(values)
+                for target, rows in by_target.items():
+                    with target_archive_engines[target].begin() as conn:
+                        conn.execute(insert(table), rows)
+    logger.info("Reshard: archived chunks copied")
+
+def reshard(target_urls, batch_size: int = 5000, target_archive_urls=None):
+    """Копіює всі дані з поточних шардів у нові файли, розподіляючи користувачів за shard_for.
+
+    Вихідні БД не змінюються. Ключі id транзакцій, лімітів і цілей
+    перераховуються як id * кількість_шардів + номер_шарду, тому вони
+    лишаються унікальними; при переході з однієї БД на шарди id не змінюються.
+    Пакети холодного архіву переносяться в target_archive_urls (по одному на
+    новий шард) з тими самими id транзакцій; якщо архів не порожній, ці URL обов'язкові.
+    """
+    import archive
+
+    if set(target_urls) & set(shard_urls()):
+        raise ValueError("Цільові БД мають відрізнятися від поточних")
+    archived = sum(_archive_chunk_counts(archive.archive_engines))
+    if archived and not target_archive_urls:
+        raise ValueError(f"Архів містить {archived} пакетів: вкажіть URL архівів нових шардів")
+    target_archive_urls = target_archive_urls or []
+    if target_archive_urls and len(target_archive_urls) != len(target_urls):
+        raise ValueError("Кількість архівів має дорівнювати кількості нових шардів")
+    current_archive_urls = {str(archive_engine.url) for archive_engine in archive.archive_engines}
+    if set(target_archive_urls) & (current_archive_urls | set(target_urls)):
+        raise ValueError("Цільові архіви мають відрізнятися від поточних архівів і нових шардів")
+
+    target_engines = [create_db_engine(url) for url in target_urls]
+    target_archive_engines = [create_db_engine(url) for url in target_archive_urls]
+    try:
+        for target_engine in target_engines:
+            Base.metadata.create_all(target_engine)
+            if any(_table_counts(target_engine).values()):
+                raise ValueError(f"Цільова БД {target_engine.url} не порожня")
+        for target_archive_engine in target_archive_engines:
+            archive.ArchiveBase.metadata.create_all(target_archive_engine)
+        if any(_archive_chunk_counts(target_archive_engines)):
+            raise ValueError("Цільові архіви не порожні")
+
+        source_count = len(shard_engines)
+        for table in Base.metadata.sorted_tables:
+            key_column = "id" if table.name == User.__tablename__ else "user_id"
+            renumber = _renumbered(table)
+            for source_index, source_engine in enumerate(shard_engines):
+                with source_engine.connect() as source:
+                    result = source.execution_options(yield_per=batch_size).execute(select(table))
+                    for partition in result.partitions():
+                        by_target = {}
+                        for row in partition:
+                            values = row._asdict()
+                            if renumber:
+                                values["id"] = values["id"] * source_count + source_index
+                            target = shard_for(values[key_column], len(target_engines))
+                            by_target.setdefault(target, []).append(values)
+                        for target, rows in by_target.items():
+                            with target_engines[target].begin() as conn:
+                                conn.execute(insert(table), rows)
+            logger.info(f"Reshard: table {table.name} copied")
+        if target_archive_engines:
+            _reshard_archive(target_archive_engines, source_count)
+
+        source_totals = {}
+        for source_engine in shard_engines:
+            for name, count in _table_counts(source_engine).items():
+                source_totals[name] = source_totals.get(name, 0) + count
+        target_totals = {}
+        for target_engine in target_engines:
+            for name, count in _table_counts(target_engine).items():
+                target_totals[name] = target_totals.get(name, 0) + count
+        chunks = archive.ArchivedChunk.__tablename__
+        source_totals[chunks] = archived
+        target_totals[chunks] = sum(_archive_chunk_counts(target_archive_engines))
+        return source_totals, target_totals
+    finally:
+        for target_engine in target_engines + target_archive_engines:
+            target_engine.dispose()
+
+def cmd_shards(args):
+    if args.action == "status":
+        print(f"Шардів: {len(shard_engines)}")
+        for shard, shard_engine in enumerate(shard_engines):
+            counts = _table_counts(shard_engine)
+            print(f"  [{shard}] {shard_engine.url}: " + ", ".join(f"{name}={count}" for name, count in counts.items()))
+        return 0
+
+    if args.to < 1 or "{shard}" not in args.url_template:
+        print("Потрібні --to N (N >= 1) та --url-template з {shard}")
+        return 1
+    target_urls = [args.url_template.format(shard=shard) for shard in range(args.to)]
+    target_archive_urls = None
+    if args.archive_url_template:
+        if args.to > 1 and "{shard}" not in args.archive_url_template:
+            print("--archive-url-template для кількох шардів має містити {shard}")
+            return 1
+        target_archive_urls = [args.archive_url_template.format(shard=shard) for shard in range(args.to)]
+    try:
+        source_totals, target_totals = reshard(target_urls, args.batch_size, target_archive_urls)
+    except ValueError as e:
+        print(e)
+        return 1
+    mismatched = [name for name in source_totals if source_totals[name] != target_totals.get(name)]
+    for name, count in source_totals.items():
+        print(f"  {name}: {count} -> {target_totals.get(name)}")
+    if mismatched:
+        print(f"Кількість рядків не збігається: {', '.join(mismatched)}")
+        return 1
+    if args.to == 1:
+        settings = f"DB_SHARDS=1 DB_URL={target_urls[0]}"
+    else:
+        settings = f"DB_SHARDS={args.to} DB_SHARD_URL={args.url_template}"
+    if target_archive_urls:
+        settings += f" DB_ARCHIVE_URL={args.archive_url_template}"
+    print(f"Готово. Для переходу встановіть {settings}")
+    return 0
+
+def cmd_archive(args):
+    import archive
+
+    if args.action == "status":
+        for shard, archive_engine in enumerate(archive.archive_engines):
+            with archive_engine.connect() as conn:
+                chunks, rows, size = conn.execute(select(
+                    func.count(archive.ArchivedChunk.id),
+                    func.coalesce(func.sum(archive.ArchivedChunk.row_count), 0),
+                    func.coalesce(func.sum(func.length(archive.ArchivedChunk.payload)), 0)
+                )).one()
+            print(f"  [{shard}] {archive_engine.url}: пакетів {chunks}, транзакцій {rows}, {size / 1024:.1f} КБ")
+        return 0
+
+    cutoff = date.fromisoformat(args.before) if args.before else archive.default_cutoff()
+    total = 0
+    for shard, session_factory in enumerate(shard_sessions):
+        moved = archive.archive_shard(session_factory, cutoff)
+        total += sum(moved.values())
+        print(f"[шард {shard}] перенесено {sum(moved.values())} транзакцій {len(moved)} користувачів")
+    print(f"Архівовано транзакцій до {cutoff}: {total}")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Обслуговування бази даних FinWise Owl")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ledger = subparsers.add_parser("ledger", help="Журнал балансів користувачів")
+    ledger.add_argument("action", choices=["verify", "rebuild"])
+    ledger.set_defaults(func=per_shard(cmd_ledger))
+
+    rollups = subparsers.add_parser("rollups", help="Місячні зведення транзакцій")
+    rollups.add_argument("action", choices=["verify", "rebuild"])
+    rollups.set_defaults(func=per_shard(cmd_rollups))
+
+    prefix = subparsers.add_parser("prefix", help="Накопичені денні суми для звітів за період")
+    prefix.add_argument("action", choices=["verify", "rebuild"])
+    prefix.set_defaults(func=per_shard(cmd_prefix))
+
+    schema = subparsers.add_parser("schema", help="Індекси та план запитів звітів")
+    schema.add_argument("action", choices=["upgrade", "explain"])
+    schema.set_defaults(func=cmd_schema)
+
+    shards = subparsers.add_parser("shards", help="Розподіл користувачів між файлами БД")
+    shards.add_argument("action", choices=["status", "reshard"])
+    shards.add_argument("--to", type=int, default=0, help="Кількість нових шардів")
+    shards.add_argument("--url-template", default="", help="URL нових шардів з {shard}, напр. sqlite:///finance_bot_v2_{shard}.db")
+    shards.add_argument("--archive-url-template", default="",
+                        help="URL архівів нових шардів з {shard}; обов'язковий, якщо холодний архів не порожній")
+    shards.add_argument("--batch-size", type=int, default=5000)
+    shards.set_defaults(func=cmd_shards)
+
+    archive = subparsers.add_parser("archive", help="Перенесення старих транзакцій у холодний архів")
+    archive.add_argument("action", choices=["run", "status"])
+    archive.add_argument("--before", help="Архівувати транзакції до дати YYYY-MM-DD (за замовчуванням ARCHIVE_HORIZON_DAYS)")
+    archive.set_defaults(func=cmd_archive)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    init_db()
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
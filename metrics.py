@@ -0,0 +1,76 @@
+import threading
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+class Gauge:
+    """Поточне значення; може обчислюватися функцією під час зчитування."""
+
+    def __init__(self, func=None):
+        self.value = 0
+        self._func = func
+
+    def set(self, value):
+        self.value = value
+
+    def snapshot(self):
+        return self._func() if self._func else self.value
+
+class Histogram:
+    """Кількість, сума, мінімум і максимум спостережень."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.total += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+
+    def snapshot(self):
+        avg = self.total / self.count if self.count else 0.0
+        return {"count": self.count, "avg": avg, "min": self.min or 0.0, "max": self.max or 0.0}
+
+_registry = {}
+
+def _get_or_create(name: str, factory):
+    metric = _registry.get(name)
+    if metric is None:
+        metric = _registry[name] = factory()
+    return metric
+
+def counter(name: str) -> Counter:
+    return _get_or_create(name, Counter)
+
+def gauge(name: str, func=None) -> Gauge:
+    return _get_or_create(name, lambda: Gauge(func))
+
+def histogram(name: str) -> Histogram:
+    return _get_or_create(name, Histogram)
+
+def snapshot():
+    """Знімок усіх метрик: {назва: значення}."""
+    return {name: metric.snapshot() for name, metric in sorted(_registry.items())}
+
+def format_snapshot():
+    lines = []
+    for name, value in snapshot().items():
+        if isinstance(value, dict):
+            value = ", ".join(f"{key}={item:.2f}" if isinstance(item, float) else f"{key}={item}" for key, item in value.items())
+        lines.append(f"{name}: {value}")
+    return "\n".join(lines)
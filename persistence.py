@@ -0,0 +1,269 @@
+"""Збереження user_data і станів ConversationHandler у БД бота між перезапусками.
+
+На відміну від PicklePersistence, що перезаписує файл з усіма даними,
+у таблиці потрапляють лише змінені записи:
+
+- Application раз на PERSISTENCE_FLUSH_INTERVAL секунд передає user_data
+  користувачів, що отримували оновлення, і змінені стани розмов. Дані, чий
+  JSON не відрізняється від уже збереженого, пропускаються, решта
+  записується одною транзакцією на шард.
+- user_data читається з БД не під час запуску, а коли користувач уперше
+  після перезапуску надсилає оновлення (refresh_user_data). Стани розмов
+  читаються під час запуску: рядок існує лише поки розмова не завершена.
+- Хеші записаних user_data тримаються для PERSISTENCE_CACHE_SIZE останніх
+  активних користувачів; витіснений користувач перечитується з БД при
+  наступному оновленні.
+
+chat_data, bot_data і callback_data не зберігаються — бот ними не користується.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import delete, select
+from telegram.ext import BasePersistence, PersistenceInput
+from database import (
+    ConversationState,
+    UserState,
+    run_db,
+    shard_engines,
+    shard_for,
+    shard_sessions,
+    user_session
+)
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Як часто Application передає накопичені зміни на запис, секунд
+PERSISTENCE_FLUSH_INTERVAL = float(os.getenv("PERSISTENCE_FLUSH_INTERVAL", "10"))
+# Скільки користувачів пам'ятати як уже прочитаних; має з запасом перевищувати
+# кількість різних користувачів за PERSISTENCE_FLUSH_INTERVAL
+PERSISTENCE_CACHE_SIZE = int(os.getenv("PERSISTENCE_CACHE_SIZE", "10000"))
+
+def _digest(payload: str) -> bytes:
+    return hashlib.blake2b(payload.encode(), digest_size=16).digest()
+
+def _create_tables():
+    # Application читає стани розмов ще до post_init, тобто до init_db
+    for shard_engine in shard_engines:
+        for table in (UserState.__table__, ConversationState.__table__):
+            table.create(shard_engine, checkfirst=True)
+
+def _load_conversations(name: str):
+    conversations = {}
+    for shard_session in shard_sessions:
+        session = shard_session()
+        try:
+            rows = session.execute(
+                select(ConversationState.key, ConversationState.state).where(ConversationState.name == name)
+            ).all()
+        finally:
+            session.close()
+        for key, state in rows:
+            conversations[tuple(json.loads(key))] = json.loads(state)
+    return conversations
+
+def _load_user_data(user_id: int):
+    session = user_session(user_id)
+    try:
+        return session.scalar(select(UserState.data).where(UserState.user_id == user_id))
+    finally:
+        session.close()
+
+def _write_batch(users: dict, conversations: dict):
+    """Записує {user_id: JSON або None} і {(name, key): (user_id, JSON стану або None)}; None — видалення."""
+    by_shard = {}
+    for user_id, payload in users.items():
+        by_shard.setdefault(shard_for(user_id), ([], []))[0].append((user_id, payload))
+    for (name, key), (user_id, state) in conversations.items():
+        by_shard.setdefault(shard_for(user_id), ([], []))[1].append((name, key, user_id, state))
+
+    now = datetime.now()
+    for shard, (user_rows, conversation_rows) in by_shard.items():
+        session = shard_sessions[shard]()
+        try:
+            for user_id, payload in user_rows:
+                if payload is None:
+                    session.execute(delete(UserState).where(UserState.user_id == user_id))
+                else:
+                    session.merge(UserState(user_id=user_id, data=payload, updated_at=now))
+            for name, key, user_id, state in conversation_rows:
+                if state is None:
+                    session.execute(delete(ConversationState).where(
+                        ConversationState.name == name,
+                        ConversationState.key == key
+                    ))
+                else:
+                    session.merge(ConversationState(name=name, key=key, user_id=user_id, state=state, updated_at=now))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+class SQLitePersistence(BasePersistence):
+    """BasePersistence для python-telegram-bot поверх таблиць user_states і conversation_states."""
+
+    def __init__(self, update_interval: float = PERSISTENCE_FLUSH_INTERVAL, max_users: int = PERSISTENCE_CACHE_SIZE):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.max_users = max_users
+        # LRU користувачів, чиї user_data вже прочитані з БД:
+        # user_id -> хеш останнього записаного JSON (None — у БД запису немає)
+        self._known = OrderedDict()
+        self._pending_users = {}
+        self._pending_conversations = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+        self._tables_ready = False
+        self._writes = metrics.counter("persistence.writes")
+        self._skipped = metrics.counter("persistence.unchanged")
+        self._lazy_loads = metrics.counter("persistence.lazy_loads")
+        self._evictions = metrics.counter("persistence.evictions")
+        self._flush_latency = metrics.histogram("persistence.flush_ms")
+        metrics.gauge("persistence.known_users", lambda: len(self._known))
+        metrics.gauge("persistence.pending", lambda: len(self._pending_users) + len(self._pending_conversations))
+
+    def _remember(self, user_id: int, digest):
+        self._known[user_id] = digest
+        self._known.move_to_end(user_id)
+        while len(self._known) > self.max_users:
+            self._known.popitem(last=False)
+            self._evictions.inc()
+
+    async def _ensure_tables(self):
+        if not self._tables_ready:
+            await run_db(_create_tables)
+            self._tables_ready = True
+
+    # --- читання ---
+
+    async def get_user_data(self):
+        # user_data завантажуються ліниво в refresh_user_data
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict):
+        if user_id in self._known:
+            self._known.move_to_end(user_id)
+            return
+        await self._ensure_tables()
+        payload = await run_db(_load_user_data, user_id)
+        # Поки читали, користувач міг уже потрапити в чергу на запис
+        if user_id in self._known:
+            return
+        self._lazy_loads.inc()
+        if payload is None:
+            self._remember(user_id, None)
+            return
+        self._remember(user_id, _digest(payload))
+        for key, value in json.loads(payload).items():
+            user_data.setdefault(key, value)
+
+    async def get_conversations(self, name: str):
+        await self._ensure_tables()
+        conversations = await run_db(_load_conversations, name)
+        if conversations:
+            logger.info(f"Restored {len(conversations)} active '{name}' conversations")
+        return conversations
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    # --- запис ---
+
+    async def update_user_data(self, user_id: int, data: dict):
+        if user_id not in self._known:
+            # Дані ще не читалися з БД — порожній словник у пам'яті не повинен їх перезаписати
+            return
+        try:
+            payload = json.dumps(data, ensure_ascii=False, sort_keys=True)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"user_data of user {user_id} is not JSON-serializable, not persisted: {e}")
+            return
+        if self._known[user_id] == _digest(payload):
+            # Повернулися до вже записаного значення — скасовуємо запис, що міг чекати в буфері
+            self._pending_users.pop(user_id, None)
+            self._skipped.inc()
+            return
+        self._pending_users[user_id] = payload
+        await self._flush_soon()
+
+    async def drop_user_data(self, user_id: int):
+        self._remember(user_id, self._known.get(user_id))
+        self._pending_users[user_id] = None
+        await self._flush_soon()
+
+    async def update_conversation(self, name: str, key, new_state):
+        state = None if new_state is None else json.dumps(new_state)
+        # Розмови ведуться per_user, тож останній елемент ключа — id користувача (він же визначає шард)
+        self._pending_conversations[(name, json.dumps(list(key)))] = (key[-1], state)
+        await self._flush_soon()
+
+    async def update_chat_data(self, chat_id: int, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id: int):
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def _flush_soon(self):
+        # Application викликає update_* для всіх змін одночасно через asyncio.gather:
+        # перший виклик планує один запис, решта встигають покласти зміни в буфер і чекають його
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_batch())
+        await asyncio.shield(self._flush_task)
+
+    async def _flush_after_batch(self):
+        await asyncio.sleep(0)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """Записує всі накопичені зміни; Application викликає його й під час зупинки."""
+        async with self._flush_lock:
+            users, self._pending_users = self._pending_users, {}
+            conversations, self._pending_conversations = self._pending_conversations, {}
+            if not users and not conversations:
+                return
+            started = time.perf_counter()
+            try:
+                await self._ensure_tables()
+                await run_db(_write_batch, users, conversations)
+            except Exception:
+                # Не втрачаємо зміни: новіші значення з буфера мають перевагу
+                for user_id, payload in users.items():
+                    self._pending_users.setdefault(user_id, payload)
+                for key, value in conversations.items():
+                    self._pending_conversations.setdefault(key, value)
+                raise
+            for user_id, payload in users.items():
+                # Витіснених за час запису не повертаємо: їх перечитає refresh_user_data
+                if user_id in self._known:
+                    self._known[user_id] = None if payload is None else _digest(payload)
+            self._writes.inc(len(users) + len(conversations))
+            self._flush_latency.observe((time.perf_counter() - started) * 1000)
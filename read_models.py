@@ -0,0 +1,45 @@
+"""Легкі записи для шляхів читання: відображення й звіти.
+
+Замість ORM-сутностей (identity map, інструментовані атрибути, стан сесії)
+запити вибирають лише потрібні колонки через Core select, а рядки
+перетворюються на namedtuple. Записи незмінні й не прив'язані до сесії.
+"""
+from collections import namedtuple
+from sqlalchemy import select
+from database import Transaction, Budget, Goal, UserBalance
+
+TransactionRecord = namedtuple("TransactionRecord", "id date type category amount description")
+BudgetRecord = namedtuple("BudgetRecord", "category limit period")
+GoalRecord = namedtuple("GoalRecord", "id name target_amount current_amount deposits months description")
+BalanceRecord = namedtuple("BalanceRecord", "income_total expense_total goal_deposit_total")
+
+# Колонки кожного запису в порядку полів namedtuple
+TRANSACTION_COLUMNS = (Transaction.id, Transaction.date, Transaction.type, Transaction.category,
+                       Transaction.amount, Transaction.description)
+BUDGET_COLUMNS = (Budget.category, Budget.limit, Budget.period)
+GOAL_COLUMNS = (Goal.id, Goal.name, Goal.target_amount, Goal.current_amount, Goal.deposits,
+                Goal.months, Goal.description)
+BALANCE_COLUMNS = (UserBalance.income_total, UserBalance.expense_total, UserBalance.goal_deposit_total)
+
+def transactions_select(user_id: int, limit: int = 10):
+    return select(*TRANSACTION_COLUMNS).where(Transaction.user_id == user_id)\
+                                       .order_by(Transaction.date.desc())\
+                                       .limit(limit)
+
+def budgets_select(user_id: int):
+    return select(*BUDGET_COLUMNS).where(Budget.user_id == user_id)
+
+def goals_select(user_id: int):
+    return select(*GOAL_COLUMNS).where(Goal.user_id == user_id).order_by(Goal.id)
+
+def balance_select(user_id: int):
+    return select(*BALANCE_COLUMNS).where(UserBalance.user_id == user_id)
+
+def fetch_all(session, statement, record):
+    """Виконує select і повертає список записів типу record."""
+    make = record._make
+    return [make(row) for row in session.execute(statement)]
+
+def fetch_one(session, statement, record):
+    row = session.execute(statement).first()
+    return record._make(row) if row is not None else None
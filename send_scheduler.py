@@ -0,0 +1,267 @@
+"""Планувальник вихідних запитів до Bot API з урахуванням лімітів Telegram.
+
+Підключається до бота як rate limiter python-telegram-bot, тож через нього
+проходять усі виклики, що мають chat_id: reply_text, send_document,
+edit_message_text тощо. Запити без chat_id (getUpdates, getMe, setWebhook)
+надсилаються одразу.
+
+- Кожен чат має власне відро токенів: SEND_CHAT_RATE повідомлень на секунду
+  для особистих чатів і SEND_GROUP_RATE на секунду для груп і каналів.
+  Повідомлення в один чат надсилаються по черзі в порядку викликів.
+- Спільне відро SEND_GLOBAL_RATE обмежує бота загалом. Коли токенів бракує,
+  першими їх отримують інтерактивні відповіді, потім масові розсилки:
+  bot.send_message(..., rate_limit_args=send_scheduler.BULK) або
+  rate_limit_args={"lane": send_scheduler.BULK}.
+- Відповідь 429 (RetryAfter) призупиняє надсилання в цей чат на вказаний
+  Telegram час, після чого запит повторюється до SEND_MAX_RETRIES разів.
+  Якщо 429 одночасно отримали SEND_GLOBAL_PAUSE_CHATS різних чатів, обмеження
+  вважається загальним для бота і призупиняються всі надсилання.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+import warnings
+from telegram.error import RetryAfter
+from telegram.warnings import PTBDeprecationWarning
+from telegram.ext import BaseRateLimiter
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Telegram: ~30 повідомлень на секунду від бота, 1 на секунду в особистий чат
+# (короткі сплески допускаються), 20 на хвилину в групу. Відро пропускає за
+# будь-яку секунду до rate + burst запитів, тож спільні rate і burst разом дають 30
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "25"))
+SEND_GLOBAL_BURST = float(os.getenv("SEND_GLOBAL_BURST", "5"))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))
+SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", "3"))
+SEND_GROUP_RATE = float(os.getenv("SEND_GROUP_RATE", str(20 / 60)))
+SEND_GROUP_BURST = float(os.getenv("SEND_GROUP_BURST", "5"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
+SEND_GLOBAL_PAUSE_CHATS = int(os.getenv("SEND_GLOBAL_PAUSE_CHATS", "2"))
+
+# Пріоритети черг: менше значення обслуговується раніше
+INTERACTIVE, BULK = range(2)
+LANES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+# Відра чатів без очікувачів і з повним запасом токенів видаляються, коли їх більше
+CHAT_BUCKETS_LIMIT = 4096
+
+class TokenBucket:
+    """rate токенів на секунду, не більше burst у запасі."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Скільки секунд чекати до наступного токена (0 — токен є)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+def lane_for(rate_limit_args) -> int:
+    """Черга запиту: BULK, INTERACTIVE або {"lane": ...}; будь-що інше — INTERACTIVE."""
+    if isinstance(rate_limit_args, dict):
+        rate_limit_args = rate_limit_args.get("lane")
+    if isinstance(rate_limit_args, int) and rate_limit_args in LANES:
+        return rate_limit_args
+    return INTERACTIVE
+
+def chat_key(data: dict):
+    """chat_id запиту або None, якщо запит не адресований чату."""
+    chat_id = data.get("chat_id")
+    if chat_id is None:
+        return None
+    try:
+        return int(chat_id)
+    except (TypeError, ValueError):
+        return str(chat_id)  # @username каналу
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    # Без PTB_TIMEDELTA retry_after — ціле число секунд з попередженням про заміну на timedelta
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", PTBDeprecationWarning)
+        retry_after = error.retry_after
+    return retry_after if isinstance(retry_after, (int, float)) else retry_after.total_seconds()
+
+class SendScheduler(BaseRateLimiter):
+    def __init__(self, global_rate: float = SEND_GLOBAL_RATE, global_burst: float = SEND_GLOBAL_BURST,
+                 chat_rate: float = SEND_CHAT_RATE, chat_burst: float = SEND_CHAT_BURST,
+                 group_rate: float = SEND_GROUP_RATE, group_burst: float = SEND_GROUP_BURST,
+                 max_retries: int = SEND_MAX_RETRIES, global_pause_chats: int = SEND_GLOBAL_PAUSE_CHATS):
+        self.chat_rate, self.chat_burst = chat_rate, chat_burst
+        self.group_rate, self.group_burst = group_rate, group_burst
+        self.max_retries = max_retries
+        self.global_pause_chats = global_pause_chats
+        self._global = TokenBucket(global_rate, global_burst)
+        self._chats = {}        # ключ чату -> TokenBucket
+        self._chat_locks = {}   # ключ чату -> asyncio.Lock, поки в чат є запити
+        self._chat_depths = {}  # ключ чату -> запитів у черзі та в надсиланні
+        self._waiting = []      # купа (пріоритет, порядковий номер, future) на спільний токен
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._dispatcher = None
+        self._paused_until = 0.0
+        self._chat_paused_until = {}  # ключ чату -> кінець паузи після 429 в цей чат
+        self._lane_depths = dict.fromkeys(LANES, 0)
+        self._sent = metrics.counter("outbound.sent")
+        self._retry_after = metrics.counter("outbound.retry_after")
+        self._failed = metrics.counter("outbound.failed")
+        self._wait_latency = {lane: metrics.histogram(f"outbound.wait_ms.{name}") for lane, name in LANES.items()}
+        for lane, name in LANES.items():
+            metrics.gauge(f"outbound.queued.{name}", lambda lane=lane: self._lane_depths[lane])
+        metrics.gauge("outbound.chats_waiting", lambda: len(self._chat_depths))
+        metrics.gauge("outbound.chats_paused", lambda: len(self._active_chat_pauses(time.monotonic())))
+        metrics.gauge("outbound.paused_s", lambda: round(max(0.0, self._paused_until - time.monotonic()), 1))
+
+    async def initialize(self):
+        self._ensure_dispatcher()
+
+    async def shutdown(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        if self._chat_depths:
+            logger.warning(f"Send scheduler shut down with {sum(self._chat_depths.values())} queued requests")
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    def queue_depths(self):
+        """{назва черги: запитів, що чекають на надсилання}."""
+        return {name: self._lane_depths[lane] for lane, name in LANES.items()}
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        key = chat_key(data)
+        if key is None:
+            return await callback(*args, **kwargs)
+        priority = lane_for(rate_limit_args)
+
+        lock = self._chat_locks.get(key)
+        if lock is None:
+            lock = self._chat_locks[key] = asyncio.Lock()
+        self._chat_depths[key] = self._chat_depths.get(key, 0) + 1
+        self._lane_depths[priority] += 1
+        queued_at = time.perf_counter()
+        queued = True
+        try:
+            # Лок чату зберігає порядок повідомлень і тримається до кінця надсилання з повторами
+            async with lock:
+                for attempt in range(self.max_retries + 1):
+                    await self._chat_token(key)
+                    await self._global_token(priority)
+                    if queued:
+                        queued = False
+                        self._lane_depths[priority] -= 1
+                        self._wait_latency[priority].observe((time.perf_counter() - queued_at) * 1000)
+                    try:
+                        result = await callback(*args, **kwargs)
+                    except RetryAfter as e:
+                        self._retry_after.inc()
+                        seconds = retry_after_seconds(e)
+                        scope = self._pause(key, seconds)
+                        if attempt == self.max_retries:
+                            self._failed.inc()
+                            logger.error(f"{endpoint} to chat {key} failed after {attempt + 1} attempts: {e}")
+                            raise
+                        logger.warning(f"Flood limit on {endpoint} to chat {key}, pausing {scope} for {seconds} s")
+                        continue
+                    self._sent.inc()
+                    return result
+        finally:
+            if queued:
+                self._lane_depths[priority] -= 1
+            self._chat_depths[key] -= 1
+            if not self._chat_depths[key]:
+                del self._chat_depths[key]
+                del self._chat_locks[key]
+
+    def _active_chat_pauses(self, now: float):
+        """Ключі чатів, пауза яких ще триває; завершені паузи видаляються."""
+        for expired in [k for k, until in self._chat_paused_until.items() if until <= now]:
+            del self._chat_paused_until[expired]
+        return list(self._chat_paused_until)
+
+    def _pause(self, key, seconds: float) -> str:
+        """Призупиняє чат після 429, а весь бот — якщо паузу мають кілька чатів. Повертає масштаб паузи."""
+        now = time.monotonic()
+        # Невеликий запас, щоб не влучити точно в межу вікна Telegram
+        until = now + seconds + 0.1
+        self._chat_paused_until[key] = max(self._chat_paused_until.get(key, 0.0), until)
+        if len(self._active_chat_pauses(now)) < self.global_pause_chats:
+            return "chat"
+        self._paused_until = max(self._paused_until, until)
+        self._wakeup.set()
+        return "all sends"
+
+    def _bucket(self, key):
+        bucket = self._chats.get(key)
+        if bucket is None:
+            if len(self._chats) >= CHAT_BUCKETS_LIMIT:
+                now = time.monotonic()
+                for idle in [k for k, b in self._chats.items() if k not in self._chat_depths and b.full(now)]:
+                    del self._chats[idle]
+            group = isinstance(key, str) or key < 0
+            bucket = self._chats[key] = (
+                TokenBucket(self.group_rate, self.group_burst) if group
+                else TokenBucket(self.chat_rate, self.chat_burst)
+            )
+        return bucket
+
+    async def _chat_token(self, key):
+        bucket = self._bucket(key)
+        while True:
+            now = time.monotonic()
+            delay = max(self._chat_paused_until.get(key, 0.0) - now, bucket.delay(now))
+            if not delay:
+                bucket.take(time.monotonic())
+                return
+            await asyncio.sleep(delay)
+
+    async def _global_token(self, priority: int):
+        self._ensure_dispatcher()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._sequence), future))
+        self._wakeup.set()
+        await future
+
+    async def _dispatch(self):
+        """Видає спільні токени за пріоритетом черги, а в межах черги — за порядком запитів."""
+        while True:
+            if not self._waiting:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            now = time.monotonic()
+            delay = max(self._paused_until - now, self._global.delay(now))
+            if delay > 0:
+                # Новий запит або 429 можуть змінити, кого й коли обслуговувати
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, future = heapq.heappop(self._waiting)
+            if future.cancelled():
+                continue
+            self._global.take(now)
+            future.set_result(None)
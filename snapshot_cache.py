@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+import metrics
+
+class SnapshotCache:
+    """LRU-кеш колонкових знімків історії (TransactionColumns) з лімітом пам'яті.
+
+    Знімки незмінні: запис дописує рядки в запас спільних буферів за межами
+    виданих префіксів і кладе новий знімок, тому читачі з інших потоків пулу БД
+    не бачать напівоновлених масивів, а вставка не копіює всю історію. Лічильник версій
+    не дає покласти в кеш знімок, прочитаний до паралельного запису.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, name: str = "snapshot_cache"):
+        self.max_bytes = max_bytes
+        self._snapshots = OrderedDict()  # user_id -> TransactionColumns
+        self._versions = {}  # user_id -> номер останнього запису
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = metrics.counter(f"{name}.hits")
+        self._misses = metrics.counter(f"{name}.misses")
+        self._evictions = metrics.counter(f"{name}.evictions")
+        metrics.gauge(f"{name}.bytes", lambda: self._bytes)
+        metrics.gauge(f"{name}.entries", lambda: len(self._snapshots))
+        metrics.gauge(f"{name}.hit_rate", self.hit_rate)
+
+    def hit_rate(self) -> float:
+        lookups = self._hits.value + self._misses.value
+        return round(self._hits.value / lookups, 3) if lookups else 0.0
+
+    def version(self, user_id: int):
+        return self._versions.get(user_id, 0)
+
+    def get(self, user_id: int):
+        with self._lock:
+            snapshot = self._snapshots.get(user_id)
+            if snapshot is None:
+                self._misses.inc()
+                return None
+            self._snapshots.move_to_end(user_id)
+            self._hits.inc()
+            return snapshot
+
+    def put(self, user_id: int, snapshot, version: int):
+        """Кладе знімок, якщо після його читання (version) не було записів."""
+        if snapshot.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if self._versions.get(user_id, 0) != version:
+                return
+            self._replace(user_id, snapshot)
+
+    def append(self, user_id: int, rows):
+        """Дописує нові транзакції в знімок, якщо він є в кеші."""
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            snapshot = self._snapshots.get(user_id)
+            if snapshot is not None:
+                self._replace(user_id, snapshot.appended(rows))
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            snapshot = self._snapshots.pop(user_id, None)
+            if snapshot is not None:
+                self._bytes -= snapshot.nbytes
+
+    def _replace(self, user_id: int, snapshot):
+        previous = self._snapshots.pop(user_id, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        self._snapshots[user_id] = snapshot
+        self._bytes += snapshot.nbytes
+        while self._bytes > self.max_bytes:
+            _, evicted = self._snapshots.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self._evictions.inc()
+
+    def __len__(self):
+        return len(self._snapshots)
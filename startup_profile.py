@@ -0,0 +1,90 @@
+"""Профіль холодного старту бота: python main.py --profile-startup.
+
+Запуск відтворюється в окремому процесі з `python -X importtime`, щоб
+імпорти міряти з чистого стану: імпорт main, перевірка схеми (init_db),
+реєстрація обробників. Окремо показано модулі, які бот імпортує лише при
+першому використанні.
+"""
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+PHASE_MARKER = "startup-profile:"
+
+# Модулі, імпорт яких відкладено до першого використання
+LAZY_MODULES = ("analytics_engine", "matplotlib.pyplot", "ollama")
+
+PROFILE_SCRIPT = f"""
+import importlib, json, sys, time
+sys.path.insert(0, {REPO_DIR!r})
+
+def phase(name, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    sys.stderr.write({PHASE_MARKER!r} + json.dumps([name, elapsed]) + "\\n")
+    sys.stderr.flush()
+
+def setup():
+    import main
+    from telegram.ext import Application
+    main.setup_handlers(Application.builder().token("0:startup-profile").build())
+
+phase("import main", lambda: __import__("main"))
+phase("init_db", lambda: __import__("database").init_db())
+phase("setup_handlers", setup)
+for module in {LAZY_MODULES!r}:
+    try:
+        phase("lazy " + module, lambda: importlib.import_module(module))
+    except ImportError:
+        pass
+"""
+
+def _parse(stderr: str):
+    """[(етап, секунди, {пакет: власний час імпорту в мкс})] з виводу -X importtime."""
+    phases = []
+    packages = defaultdict(int)
+    for line in stderr.splitlines():
+        if line.startswith(PHASE_MARKER):
+            name, elapsed = json.loads(line[len(PHASE_MARKER):])
+            phases.append((name, elapsed, dict(packages)))
+            packages.clear()
+        elif line.startswith("import time:") and "|" in line:
+            self_us, _, module = line[len("import time:"):].split("|")
+            if self_us.strip().isdigit():
+                packages[module.strip().split(".")[0]] += int(self_us)
+    return phases
+
+def print_report(top: int = 12):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROFILE_SCRIPT],
+        capture_output=True, text=True, cwd=os.getcwd()
+    )
+    phases = _parse(result.stderr)
+    if result.returncode != 0 or not phases:
+        print(result.stderr[-2000:])
+        raise SystemExit("Не вдалося виміряти запуск")
+
+    startup = [phase for phase in phases if not phase[0].startswith("lazy ")]
+    lazy = [phase for phase in phases if phase[0].startswith("lazy ")]
+
+    print("Етапи запуску:")
+    for name, elapsed, _ in startup:
+        print(f"  {name:<22} {elapsed * 1000:>8.1f} мс")
+    print(f"  {'разом':<22} {sum(elapsed for _, elapsed, _ in startup) * 1000:>8.1f} мс")
+
+    imported = defaultdict(int)
+    for _, _, packages in startup:
+        for package, self_us in packages.items():
+            imported[package] += self_us
+    print(f"\nНайдовші імпорти при запуску (власний час за пакетами, топ {top}):")
+    for package, self_us in sorted(imported.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {package:<22} {self_us / 1000:>8.1f} мс")
+
+    if lazy:
+        print("\nВідкладено до першого використання:")
+        for name, elapsed, _ in lazy:
+            print(f"  {name[len('lazy '):]:<22} {elapsed * 1000:>8.1f} мс")
@@ -0,0 +1,160 @@
+"""Потоковий розбір CSV-виписок банків для імпорту транзакцій.
+
+Підтримуються виписки monobank і ПриватБанку, а також загальний формат
+з колонками дата/сума (та необов'язковими тип, категорія, опис). Формат
+визначається за заголовком; файл читається построково, тож пам'ять не
+залежить від його розміру.
+"""
+import csv
+import io
+from collections import namedtuple
+from datetime import datetime
+
+ImportedRow = namedtuple("ImportedRow", "date type category amount description")
+
+DATE_FORMATS = ("%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M", "%d.%m.%Y", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%d/%m/%Y")
+DEFAULT_CATEGORY = "інше"
+
+# Формат -> {поле: можливі назви колонки в нижньому регістрі}
+LAYOUTS = {
+    "monobank": {
+        "date": ("дата i час операції", "дата і час операції", "date and time"),
+        "amount": ("сума в валюті картки (uah)", "card currency amount, (uah)"),
+        "description": ("деталі операції", "description"),
+        "mcc": ("mcc",),
+    },
+    "privatbank": {
+        "date": ("дата",),
+        "amount": ("сума в валюті картки",),
+        "category": ("категорія",),
+        "description": ("опис операції",),
+    },
+    "generic": {
+        "date": ("date", "дата"),
+        "amount": ("amount", "сума"),
+        "type": ("type", "тип"),
+        "category": ("category", "категорія"),
+        "description": ("description", "опис", "коментар"),
+    },
+}
+REQUIRED_FIELDS = ("date", "amount")
+
+TYPE_ALIASES = {
+    "income": "income", "дохід": "income", "надходження": "income",
+    "expense": "expense", "витрата": "expense", "списання": "expense",
+}
+
+# Найпоширеніші групи MCC для виписок без категорій
+MCC_CATEGORIES = [
+    ((5411, 5499), "продукти"),
+    ((5812, 5814), "кафе та ресторани"),
+    ((4111, 4131), "транспорт"),
+    ((4121, 4121), "таксі"),
+    ((5541, 5542), "пальне"),
+    ((5912, 5912), "здоров'я"),
+    ((4814, 4816), "зв'язок"),
+    ((5611, 5699), "одяг"),
+    ((7832, 7841), "розваги"),
+]
+
+class ImportFormatError(ValueError):
+    """Файл не схожий на жодну з підтримуваних виписок."""
+
+def _detect_layout(header):
+    columns = {name.strip().lower(): index for index, name in enumerate(header)}
+    for layout, fields in LAYOUTS.items():
+        mapping = {}
+        for field, aliases in fields.items():
+            index = next((columns[alias] for alias in aliases if alias in columns), None)
+            if index is not None:
+                mapping[field] = index
+        if all(field in mapping for field in REQUIRED_FIELDS):
+            return layout, mapping
+    raise ImportFormatError(f"Невідомий формат заголовка: {', '.join(header)}")
+
+def _parse_date(value: str, formats: list):
+    """Розбирає дату; вдалий формат переноситься на початок formats, бо у виписці він один."""
+    value = value.strip()
+    for index, date_format in enumerate(formats):
+        try:
+            parsed = datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+        if index:
+            formats.insert(0, formats.pop(index))
+        return parsed
+    raise ValueError(f"невірна дата '{value}'")
+
+def _parse_amount(value: str) -> float:
+    cleaned = value.strip().replace(" ", "").replace(" ", "").replace(",", ".")
+    try:
+        return float(cleaned)
+    except ValueError:
+        raise ValueError(f"невірна сума '{value}'") from None
+
+def _mcc_category(value: str):
+    try:
+        mcc = int(value)
+    except ValueError:
+        return None
+    for (low, high), category in MCC_CATEGORIES:
+        if low <= mcc <= high:
+            return category
+    return None
+
+def _parse_row(row, mapping, date_formats):
+    def field(name):
+        index = mapping.get(name)
+        return row[index].strip() if index is not None and index < len(row) else ""
+
+    amount = _parse_amount(field("amount"))
+    transaction_type = TYPE_ALIASES.get(field("type").lower())
+    if transaction_type is None:
+        transaction_type = "income" if amount > 0 else "expense"
+    amount = abs(amount)
+    if amount == 0:
+        raise ValueError("нульова сума")
+    category = field("category").lower() or _mcc_category(field("mcc")) or DEFAULT_CATEGORY
+    description = field("description") or None
+    return ImportedRow(_parse_date(field("date"), date_formats), transaction_type, category[:64], amount,
+                       description[:256] if description else None)
+
+def open_statement(path: str):
+    """Відкриває файл як текст, визначаючи кодування (UTF-8 з BOM або без, інакше cp1251)."""
+    with open(path, "rb") as raw:
+        sample = raw.read(65536)
+    try:
+        sample.decode("utf-8")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError as e:
+        # Обрізаний на межі вибірки багатобайтовий символ не означає, що файл не UTF-8
+        encoding = "utf-8-sig" if e.start >= len(sample) - 3 else "cp1251"
+    return io.open(path, "r", encoding=encoding, newline="")
+
+def iter_statement(text_file, errors: list, max_errors: int = 20):
+    """Генерує ImportedRow для кожного коректного рядка; помилки (рядок, причина) додає в errors.
+
+    Після max_errors записів у errors лише рахуються (останній елемент — загальна кількість).
+    """
+    sample = text_file.read(4096)
+    text_file.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(text_file, dialect)
+    header = next(reader, None)
+    if not header:
+        raise ImportFormatError("Порожній файл")
+    _, mapping = _detect_layout(header)
+    date_formats = list(DATE_FORMATS)
+    for line_number, row in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        try:
+            yield _parse_row(row, mapping, date_formats)
+        except ValueError as e:
+            if len(errors) < max_errors:
+                errors.append((line_number, str(e)))
+            else:
+                errors.append(None)
@@ -0,0 +1,63 @@
+"""Спільні фікстури тестів: модулі бота працюють з тимчасовими файлами SQLite.
+
+Engine створюються під час імпорту database і archive, тому змінні
+середовища задаються тут, до першого імпорту модулів бота.
+"""
+import os
+import sys
+import tempfile
+
+_DB_DIR = tempfile.mkdtemp(prefix="finwise_tests_")
+os.environ["DB_SHARDS"] = "1"
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'bot.db')}"
+os.environ["DB_ARCHIVE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'archive.db')}"
+os.environ["GROUP_COMMIT"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from sqlalchemy import delete, select  # noqa: E402
+import aggregates  # noqa: E402
+import archive  # noqa: E402
+import database  # noqa: E402
+import handlers.transactions as db_transactions  # noqa: E402
+from database import Base, Transaction, User  # noqa: E402
+
+database.init_db()
+
+def add_transaction(user_id: int, amount: float, transaction_type: str, category: str, day):
+    """Транзакція з довільною датою тим самим шляхом, що й _add_transaction."""
+    session = database.user_session(user_id)
+    try:
+        if session.get(User, user_id) is None:
+            session.add(User(id=user_id, first_name="Test"))
+        session.add(Transaction(user_id=user_id, amount=amount, type=transaction_type, category=category, date=day))
+        aggregates.apply_transaction(session, user_id, transaction_type, category, amount, day)
+        session.commit()
+    finally:
+        session.close()
+
+def assert_no_drift():
+    session = database.Session()
+    try:
+        assert aggregates.verify_ledger(session) == []
+        assert aggregates.verify_rollups(session) == []
+        assert aggregates.verify_prefix_sums(session) == []
+    finally:
+        session.close()
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    yield
+    session = database.Session()
+    try:
+        user_ids = session.execute(select(User.id)).scalars().all()
+    finally:
+        session.close()
+    for user_id in user_ids:
+        db_transactions.snapshot_cache.invalidate(user_id)
+        db_transactions.user_cache.invalidate(user_id)
+    with database.engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(delete(table))
+    with archive.archive_engines[0].begin() as conn:
+        conn.execute(delete(archive.ArchivedChunk))
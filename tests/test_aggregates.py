@@ -0,0 +1,52 @@
+from datetime import date
+import aggregates
+import database
+import handlers.transactions as db_transactions
+from database import UserBalance
+from conftest import add_transaction, assert_no_drift
+
+def test_single_inserts_keep_aggregates_in_sync():
+    add_transaction(1, 100.0, 'income', 'salary', date(2024, 1, 31))
+    add_transaction(1, 40.0, 'expense', 'food', date(2024, 1, 31))
+    add_transaction(1, 15.5, 'expense', 'food', date(2024, 2, 1))
+    add_transaction(2, 7.25, 'expense', 'taxi', date(2023, 12, 31))
+    add_transaction(1, 20.0, 'goal_deposit', 'goal', date(2024, 2, 2))
+
+    assert_no_drift()
+    session = database.Session()
+    try:
+        balance = session.get(UserBalance, 1)
+        assert (balance.income_total, balance.expense_total, balance.goal_deposit_total) == (100.0, 55.5, 20.0)
+    finally:
+        session.close()
+
+def test_batch_insert_matches_single_inserts():
+    db_transactions._get_or_create_user(1, "u", "User")
+    db_transactions._get_or_create_user(2, "v", "Other")
+    results = db_transactions._add_transactions_batch([
+        (1, 10.0, 'expense', 'food', None),
+        (2, 5.0, 'income', 'gift', "present"),
+        (1, 2.5, 'expense', 'food', None),
+    ])
+
+    assert results == [True, True, True]
+    assert_no_drift()
+    totals = db_transactions._get_totals(1)
+    assert totals.expense_total == 12.5
+
+def test_rollups_follow_month_boundaries():
+    add_transaction(1, 10.0, 'expense', 'food', date(2024, 1, 31))
+    add_transaction(1, 20.0, 'expense', 'food', date(2024, 2, 1))
+
+    assert db_transactions._get_monthly_totals(1, 'expense') == [('2024-01', 10.0), ('2024-02', 20.0)]
+    assert db_transactions._get_category_totals(1, '2024-02') == [('expense', 'food', 20.0)]
+
+def test_verify_reports_drift():
+    add_transaction(1, 10.0, 'expense', 'food', date(2024, 1, 5))
+    session = database.Session()
+    try:
+        session.get(UserBalance, 1).expense_total = 11.0
+        session.commit()
+        assert aggregates.verify_ledger(session) == [(1, 'expense_total', 11.0, 10.0)]
+    finally:
+        session.close()
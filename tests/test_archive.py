@@ -0,0 +1,163 @@
+from datetime import date
+import pytest
+from sqlalchemy import func, select
+import archive
+import database
+import handlers.transactions as db_transactions
+from database import Transaction
+from read_models import TRANSACTION_COLUMNS, TransactionRecord
+from conftest import add_transaction, assert_no_drift
+
+CUTOFF = date(2024, 1, 1)
+
+def _seed():
+    for day, amount in ((date(2023, 5, 1), 10.0), (date(2023, 5, 1), 20.0), (date(2023, 11, 30), 5.0),
+                        (date(2024, 1, 1), 7.0), (date(2024, 2, 10), 3.0)):
+        add_transaction(1, amount, 'expense', 'food', day)
+    add_transaction(1, 50.0, 'income', 'salary', date(2023, 6, 1))
+
+def _history(user_id: int):
+    return [tuple(row) for row in db_transactions.iter_transactions(user_id, page_size=2)]
+
+def _hot_count(user_id: int):
+    session = database.Session()
+    try:
+        return session.execute(select(func.count(Transaction.id)).where(Transaction.user_id == user_id)).scalar()
+    finally:
+        session.close()
+
+def test_archiving_keeps_history_and_aggregates():
+    _seed()
+    before = _history(1)
+
+    moved = archive.archive_shard(database.Session, CUTOFF)
+
+    assert moved == {1: 4}
+    assert _hot_count(1) == 2
+    assert archive.has_archive(1)
+    assert _history(1) == before
+    assert_no_drift()
+
+def test_interrupted_chunk_is_deduplicated_and_completed():
+    _seed()
+    before = _history(1)
+    # Пакет записано в архів, але рядки ще не видалені з transactions
+    session = database.Session()
+    try:
+        rows = [
+            TransactionRecord._make(row)
+            for row in session.execute(
+                select(*TRANSACTION_COLUMNS).where(Transaction.date < CUTOFF).order_by(Transaction.date, Transaction.id)
+            )
+        ]
+    finally:
+        session.close()
+    chunk_session = archive.archive_session(1)
+    try:
+        chunk_session.add(archive.ArchivedChunk(
+            user_id=1, first_date=rows[0].date, last_date=rows[-1].date, row_count=len(rows),
+            payload=archive.encode_rows(rows), confirmed=False
+        ))
+        chunk_session.commit()
+    finally:
+        chunk_session.close()
+
+    assert _history(1) == before
+
+    assert archive.archive_user(database.Session, 1, CUTOFF) == 4
+    assert _hot_count(1) == 2
+    assert _history(1) == before
+    assert_no_drift()
+
+def test_merge_with_hot_skips_rows_present_in_both():
+    archived = [TransactionRecord(1, date(2024, 1, 1), 'expense', 'food', 1.0, None),
+                TransactionRecord(3, date(2024, 1, 2), 'expense', 'food', 3.0, None)]
+    hot = [TransactionRecord(2, date(2024, 1, 1), 'expense', 'food', 2.0, None),
+           TransactionRecord(3, date(2024, 1, 2), 'expense', 'food', 3.0, None)]
+
+    assert [row.id for row in archive.merge_with_hot(iter(archived), iter(hot))] == [1, 2, 3]
+
+def test_encode_decode_round_trip():
+    rows = [TransactionRecord(7, date(2023, 1, 2), 'income', 'зарплата', 1000.5, "опис"),
+            TransactionRecord(8, date(2023, 1, 3), 'expense', 'food', 2.0, None)]
+
+    assert archive.decode_rows(archive.encode_rows(rows)) == rows
+
+def test_reshard_refuses_without_archive_targets(tmp_path):
+    import manage
+
+    _seed()
+    archive.archive_shard(database.Session, CUTOFF)
+
+    with pytest.raises(ValueError):
+        manage.reshard([f"sqlite:///{tmp_path / 'new_0.db'}", f"sqlite:///{tmp_path / 'new_1.db'}"])
+
+def test_reshard_moves_archive_chunks(tmp_path):
+    import manage
+
+    _seed()
+    add_transaction(2, 1.0, 'expense', 'food', date(2023, 2, 1))
+    archive.archive_shard(database.Session, CUTOFF)
+    archive_urls = [f"sqlite:///{tmp_path / f'archive_{shard}.db'}" for shard in range(2)]
+
+    source_totals, target_totals = manage.reshard(
+        [f"sqlite:///{tmp_path / f'new_{shard}.db'}" for shard in range(2)], target_archive_urls=archive_urls
+    )
+
+    assert source_totals == target_totals
+    for user_id in (1, 2):
+        shard = database.shard_for(user_id, 2)
+        engine = database.create_db_engine(archive_urls[shard])
+        try:
+            with engine.connect() as conn:
+                payloads = conn.execute(
+                    select(archive.ArchivedChunk.payload).where(archive.ArchivedChunk.user_id == user_id)
+                ).scalars().all()
+        finally:
+            engine.dispose()
+        assert len(payloads) == 1
+
+def test_reshard_moves_live_tables_and_archive(tmp_path):
+    import aggregates
+    import manage
+    from sqlalchemy.orm import sessionmaker
+
+    _seed()
+    add_transaction(4, 2.0, 'expense', 'taxi', date(2023, 3, 1))
+    add_transaction(4, 9.0, 'income', 'gift', date(2024, 3, 1))
+    db_transactions._set_budget_limit(4, 'taxi', 100.0)
+    db_transactions._create_goal(1, "Відпустка", 1000.0, 6)
+    archive.archive_shard(database.Session, CUTOFF)
+    histories = {user_id: list(db_transactions.iter_transactions(user_id)) for user_id in (1, 4)}
+    target_urls = [f"sqlite:///{tmp_path / f'new_{shard}.db'}" for shard in range(2)]
+    archive_urls = [f"sqlite:///{tmp_path / f'archive_{shard}.db'}" for shard in range(2)]
+
+    source_totals, target_totals = manage.reshard(target_urls, target_archive_urls=archive_urls)
+
+    assert source_totals == target_totals
+    assert {database.shard_for(user_id, 2) for user_id in (1, 4)} == {0, 1}
+    for user_id, history in histories.items():
+        shard = database.shard_for(user_id, 2)
+        engine = database.create_db_engine(target_urls[shard])
+        archive_engine = database.create_db_engine(archive_urls[shard])
+        session = sessionmaker(bind=engine)()
+        try:
+            for table in database.Base.metadata.sorted_tables:
+                key_column = table.c.id if table.name == database.User.__tablename__ else table.c.user_id
+                assert set(session.execute(select(key_column).distinct()).scalars()) <= {user_id}
+            hot = session.execute(select(Transaction.date, Transaction.amount).where(Transaction.user_id == user_id)).all()
+            assert sorted(hot) == sorted((row.date, row.amount) for row in history if row.date >= CUTOFF)
+            assert aggregates.verify_ledger(session) == []
+            assert aggregates.verify_rollups(session) == []
+            assert aggregates.verify_prefix_sums(session) == []
+            with archive_engine.connect() as conn:
+                payloads = conn.execute(
+                    select(archive.ArchivedChunk.payload).where(archive.ArchivedChunk.user_id == user_id)
+                ).scalars().all()
+            cold = [row for payload in payloads for row in archive.decode_rows(payload)]
+            assert sorted((row.date, row.amount) for row in cold) == \
+                sorted((row.date, row.amount) for row in history if row.date < CUTOFF)
+        finally:
+            session.close()
+            engine.dispose()
+            archive_engine.dispose()
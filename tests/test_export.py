@@ -0,0 +1,77 @@
+import csv
+import gzip
+import io
+import json
+from datetime import date
+import pytest
+import archive
+import data_export
+import database
+import handlers.transactions as db_transactions
+from conftest import add_transaction
+
+def _seed():
+    add_transaction(1, 10.5, 'expense', 'їжа', date(2023, 5, 1))
+    add_transaction(1, 1000.0, 'income', 'salary, bonus', date(2023, 6, 1))
+    add_transaction(1, 3.25, 'expense', 'taxi "night"', date(2024, 2, 10))
+    add_transaction(2, 99.0, 'expense', 'other user', date(2024, 2, 10))
+    archive.archive_shard(database.Session, date(2024, 1, 1))
+    db_transactions._set_budget_limit(1, 'їжа', 300.0)
+    db_transactions._create_goal(1, "Відпустка", 1000.0, 6, "море")
+
+def _text(export_file, compress: bool):
+    data = export_file.read()
+    return (gzip.decompress(data) if compress else data).decode("utf-8")
+
+def _parse_csv(text):
+    sections = {}
+    rows = iter(csv.reader(io.StringIO(text, newline="")))
+    for name_row in rows:
+        if not name_row:
+            continue
+        fields = next(rows)
+        records = sections.setdefault(name_row[0], [])
+        for row in rows:
+            if not row:
+                break
+            records.append(dict(zip(fields, row)))
+    return sections
+
+def _parse_jsonl(text):
+    sections = {}
+    for line in text.splitlines():
+        record = json.loads(line)
+        name = record.pop("record")
+        sections.setdefault(name, []).append({
+            field: "" if value is None else str(value) for field, value in record.items()
+        })
+    return sections
+
+PARSERS = {"csv": _parse_csv, "jsonl": _parse_jsonl}
+
+def _export(export_format: str, compress: bool):
+    result = db_transactions._export_user_data(1, export_format, compress)
+    try:
+        return result.rows, PARSERS[export_format](_text(result.file, compress))
+    finally:
+        result.file.close()
+
+@pytest.mark.parametrize("spool_bytes", [data_export.EXPORT_SPOOL_BYTES, 64])
+def test_exports_round_trip_the_same_rows(monkeypatch, spool_bytes):
+    _seed()
+    monkeypatch.setattr(data_export, "EXPORT_SPOOL_BYTES", spool_bytes)
+
+    exports = {(export_format, compress): _export(export_format, compress)
+               for export_format in data_export.EXPORT_FORMATS for compress in (False, True)}
+
+    expected_transactions = [
+        {field: "" if value is None else str(value) for field, value in row._asdict().items()}
+        for row in db_transactions.iter_transactions(1)
+    ]
+    assert len(expected_transactions) == 3
+    for rows, sections in exports.values():
+        assert rows == 5
+        assert sections["transaction"] == expected_transactions
+        assert [budget["category"] for budget in sections["budget"]] == ['їжа']
+        assert [goal["name"] for goal in sections["goal"]] == ["Відпустка"]
+        assert sections == exports[("csv", False)][1]
@@ -0,0 +1,56 @@
+import asyncio
+import database
+import handlers.transactions as db_transactions
+from database import Transaction
+from group_commit import GroupCommitter
+from conftest import assert_no_drift
+
+def _committer(batches):
+    def flush(rows):
+        batches.append(len(rows))
+        return db_transactions._add_transactions_batch(rows)
+    return GroupCommitter("test_group_commit", flush, max_rows=100, max_delay=0.05)
+
+def _submit_all(committer, rows):
+    async def run():
+        return await asyncio.gather(
+            *(committer.submit(row) for row in rows),
+            return_exceptions=True
+        )
+    return asyncio.run(run())
+
+def _stored_amounts():
+    session = database.Session()
+    try:
+        return sorted(amount for amount, in session.query(Transaction.amount))
+    finally:
+        session.close()
+
+def test_concurrent_writes_share_one_commit():
+    db_transactions._get_or_create_user(1, "u", "User")
+    db_transactions._get_or_create_user(2, "v", "Other")
+    batches = []
+    rows = [(1 + index % 2, float(index + 1), 'expense', 'food', None) for index in range(10)]
+
+    results = _submit_all(_committer(batches), rows)
+
+    assert results == [True] * 10
+    assert batches == [10]
+    assert _stored_amounts() == [float(index + 1) for index in range(10)]
+    assert_no_drift()
+
+def test_failing_write_fails_only_its_caller():
+    db_transactions._get_or_create_user(1, "u", "User")
+    batches = []
+    rows = [
+        (1, 1.0, 'expense', 'food', None),
+        (1, 2.0, 'expense', None, None),  # category NOT NULL
+        (1, 3.0, 'income', 'salary', None),
+    ]
+
+    results = _submit_all(_committer(batches), rows)
+
+    assert results == [True, False, True]
+    assert batches == [3]
+    assert _stored_amounts() == [1.0, 3.0]
+    assert_no_drift()
@@ -0,0 +1,38 @@
+import asyncio
+from datetime import date
+import handlers.transactions as db_transactions
+from conftest import add_transaction
+
+def _seed():
+    # Кілька транзакцій в один день, щоб межа сторінки проходила всередині дня
+    days = [date(2024, 3, 2), date(2024, 3, 1), date(2024, 3, 2), date(2024, 3, 1), date(2024, 3, 3), date(2024, 3, 2)]
+    for amount, day in enumerate(days, 1):
+        add_transaction(1, float(amount), 'expense', 'food', day)
+    add_transaction(2, 99.0, 'expense', 'food', date(2024, 3, 2))
+
+def test_pages_are_ordered_by_date_then_id_without_gaps():
+    _seed()
+    for page_size in (1, 2, 4, 6, 100):
+        pages = list(db_transactions.iter_transaction_pages(1, page_size))
+        rows = [row for page in pages for row in page]
+
+        assert [(row.date, row.id) for row in rows] == sorted((row.date, row.id) for row in rows)
+        assert len({row.id for row in rows}) == 6
+        assert all(len(page) == page_size for page in pages[:-1])
+
+def test_pages_contain_only_the_users_rows():
+    _seed()
+    rows = list(db_transactions.iter_transactions(1, page_size=2))
+
+    assert sorted(row.amount for row in rows) == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+
+def test_stream_matches_sync_iterator():
+    _seed()
+
+    async def collect():
+        return [row async for row in db_transactions.stream_transactions(1, page_size=4)]
+
+    assert asyncio.run(collect()) == list(db_transactions.iter_transactions(1))
+
+def test_empty_history_yields_no_pages():
+    assert list(db_transactions.iter_transaction_pages(42)) == []
@@ -0,0 +1,98 @@
+import asyncio
+from persistence import SQLitePersistence
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+async def _load(user_id: int, persistence=None):
+    persistence = persistence or SQLitePersistence()
+    user_data = {}
+    await persistence.refresh_user_data(user_id, user_data)
+    return user_data
+
+def test_user_data_survives_restart():
+    async def scenario():
+        persistence = SQLitePersistence()
+        user_data = await _load(1, persistence)
+        user_data.update({"currency": "USD", "draft": {"amount": 12.5}})
+        await persistence.update_user_data(1, user_data)
+        await persistence.flush()
+        return await _load(1)
+
+    assert _run(scenario()) == {"currency": "USD", "draft": {"amount": 12.5}}
+
+def test_unchanged_user_data_is_not_rewritten():
+    async def scenario():
+        persistence = SQLitePersistence()
+        user_data = await _load(1, persistence)
+        user_data["step"] = 1
+        await persistence.update_user_data(1, user_data)
+        await persistence.flush()
+        writes = persistence._writes.value
+        await persistence.update_user_data(1, dict(user_data))
+        await persistence.flush()
+        return persistence._writes.value - writes
+
+    assert _run(scenario()) == 0
+
+def test_user_data_is_not_overwritten_before_it_is_loaded():
+    async def scenario():
+        first = SQLitePersistence()
+        user_data = await _load(1, first)
+        user_data["goal"] = "car"
+        await first.update_user_data(1, user_data)
+        await first.flush()
+        # Після перезапуску порожній словник у пам'яті не повинен затерти збережене
+        second = SQLitePersistence()
+        await second.update_user_data(1, {})
+        await second.flush()
+        return await _load(1)
+
+    assert _run(scenario()) == {"goal": "car"}
+
+def test_evicted_user_is_reloaded_lazily():
+    async def scenario():
+        persistence = SQLitePersistence(max_users=2)
+        user_data = await _load(1, persistence)
+        user_data["lang"] = "uk"
+        await persistence.update_user_data(1, user_data)
+        await persistence.flush()
+        for user_id in (2, 3):
+            await _load(user_id, persistence)
+        evicted = 1 not in persistence._known
+        # Значення в пам'яті мають перевагу над прочитаними з БД
+        user_data["lang"] = "en"
+        await persistence.refresh_user_data(1, user_data)
+        await persistence.update_user_data(1, user_data)
+        await persistence.flush()
+        return evicted, len(persistence._known), await _load(1)
+
+    assert _run(scenario()) == (True, 2, {"lang": "en"})
+
+def test_drop_user_data_deletes_row():
+    async def scenario():
+        persistence = SQLitePersistence()
+        user_data = await _load(1, persistence)
+        user_data["x"] = 1
+        await persistence.update_user_data(1, user_data)
+        await persistence.drop_user_data(1)
+        await persistence.flush()
+        return await _load(1)
+
+    assert _run(scenario()) == {}
+
+def test_conversation_states_round_trip():
+    async def scenario():
+        persistence = SQLitePersistence()
+        await persistence.update_conversation("transaction", (10, 1), 2)
+        await persistence.update_conversation("transaction", (20, 2), "AMOUNT")
+        await persistence.flush()
+        restored = await SQLitePersistence().get_conversations("transaction")
+        await persistence.update_conversation("transaction", (10, 1), None)
+        await persistence.flush()
+        finished = await SQLitePersistence().get_conversations("transaction")
+        return restored, finished
+
+    restored, finished = _run(scenario())
+    assert restored == {(10, 1): 2, (20, 2): "AMOUNT"}
+    assert finished == {(20, 2): "AMOUNT"}
@@ -0,0 +1,58 @@
+from datetime import date
+import handlers.transactions as db_transactions
+from conftest import add_transaction
+
+def test_analytics_summary_groups_months_and_categories():
+    add_transaction(1, 1000.0, 'income', 'salary', date(2024, 1, 5))
+    add_transaction(1, 100.0, 'expense', 'food', date(2024, 1, 5))
+    add_transaction(1, 50.0, 'expense', 'taxi', date(2024, 1, 31))
+    add_transaction(1, 30.0, 'expense', 'food', date(2024, 3, 1))
+    add_transaction(2, 999.0, 'expense', 'food', date(2024, 1, 5))
+
+    summary = db_transactions._get_analytics_summary(1)
+
+    assert (summary.income_total, summary.expense_total, summary.balance) == (1000.0, 180.0, 820.0)
+    assert summary.expense_by_category == [('food', 130.0), ('taxi', 50.0)]
+    assert summary.income_by_category == [('salary', 1000.0)]
+    assert summary.expense_by_month == [('2024-01', 150.0), ('2024-03', 30.0)]
+    assert summary.avg_monthly_expense == 90.0
+
+def test_analytics_summary_without_transactions():
+    assert db_transactions._get_analytics_summary(1) is None
+
+# (день, сума, тип, категорія) у порядку вставки: пізніші дні додаються першими, решта — заднім числом
+RANGE_ROWS = [
+    (date(2024, 3, 1), 30.0, 'expense', 'food'),
+    (date(2024, 2, 29), 20.0, 'expense', 'food'),
+    (date(2024, 1, 31), 10.0, 'expense', 'food'),
+    (date(2024, 2, 1), 5.0, 'expense', 'taxi'),
+    (date(2024, 2, 1), 7.0, 'expense', 'taxi'),
+    (date(2024, 1, 31), 500.0, 'income', 'salary'),
+    (date(2023, 12, 31), 1.0, 'expense', 'food'),
+]
+
+def _expected(start, end):
+    totals = {}
+    for day, amount, transaction_type, category in RANGE_ROWS:
+        if start <= day <= end:
+            total, count = totals.get((transaction_type, category), (0.0, 0))
+            totals[(transaction_type, category)] = (total + amount, count + 1)
+    return totals
+
+def test_range_totals_match_a_direct_scan():
+    for day, amount, transaction_type, category in RANGE_ROWS:
+        add_transaction(1, amount, transaction_type, category, day)
+    add_transaction(2, 1000.0, 'expense', 'food', date(2024, 2, 10))
+
+    ranges = [
+        (date(2024, 2, 1), date(2024, 2, 29)),   # рівно лютий високосного року
+        (date(2024, 1, 31), date(2024, 2, 1)),   # межа місяців з обох боків
+        (date(2024, 3, 1), date(2024, 3, 1)),    # один день
+        (date(2024, 1, 1), date(2024, 1, 30)),   # у періоді транзакцій немає
+        (date(2020, 1, 1), date(2030, 1, 1)),    # уся історія
+        (date(2023, 12, 31), date(2023, 12, 31)),
+    ]
+    for start, end in ranges:
+        rows = db_transactions._get_range_totals(1, start, end)
+        actual = {(row.type, row.category): (row.total, row.count) for row in rows}
+        assert actual == _expected(start, end), (start, end)
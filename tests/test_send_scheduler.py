@@ -0,0 +1,87 @@
+import asyncio
+import time
+from datetime import timedelta
+import pytest
+from telegram.error import RetryAfter
+import send_scheduler
+from send_scheduler import BULK, INTERACTIVE, SendScheduler, lane_for
+
+# Конструктор RetryAfter у PTB 22 сам попереджає про майбутній тип retry_after
+pytestmark = pytest.mark.filterwarnings("ignore::telegram.warnings.PTBDeprecationWarning")
+
+def test_lane_for_accepts_any_rate_limit_args():
+    assert lane_for(BULK) == BULK
+    assert lane_for({"lane": BULK}) == BULK
+    assert lane_for(None) == INTERACTIVE
+    assert lane_for({"priority": 5}) == INTERACTIVE
+    assert lane_for(["bulk"]) == INTERACTIVE
+
+def _scheduler(**kwargs):
+    return SendScheduler(global_rate=1000, global_burst=100, chat_rate=1000, chat_burst=100, **kwargs)
+
+async def _send(scheduler, chat_id: int, callback, rate_limit_args=None):
+    started = time.monotonic()
+    await scheduler.process_request(callback, (), {}, "sendMessage", {"chat_id": chat_id}, rate_limit_args)
+    return time.monotonic() - started
+
+def _flood_once(chats: set):
+    """Callback, що відповідає 429 на першу спробу для кожного чату з chats."""
+    flooded = set()
+
+    def make(chat_id: int):
+        async def callback():
+            if chat_id in chats and chat_id not in flooded:
+                flooded.add(chat_id)
+                raise RetryAfter(timedelta(seconds=1))
+            return True
+        return callback
+    return make
+
+def test_retry_after_pauses_only_the_limited_chat():
+    async def scenario():
+        scheduler = _scheduler()
+        await scheduler.initialize()
+        make = _flood_once({1})
+        try:
+            limited = asyncio.create_task(_send(scheduler, 1, make(1)))
+            await asyncio.sleep(0.05)
+            other = await _send(scheduler, 2, make(2), {"lane": BULK})
+            return await limited, other
+        finally:
+            await scheduler.shutdown()
+
+    limited, other = asyncio.run(scenario())
+    assert limited >= 1.0
+    assert other < 0.5
+
+def test_retry_after_in_several_chats_pauses_all_sends():
+    async def scenario():
+        scheduler = _scheduler(global_pause_chats=2)
+        await scheduler.initialize()
+        make = _flood_once({1, 2})
+        try:
+            first = asyncio.create_task(_send(scheduler, 1, make(1)))
+            second = asyncio.create_task(_send(scheduler, 2, make(2)))
+            await asyncio.sleep(0.05)
+            other = await _send(scheduler, 3, make(3))
+            await asyncio.gather(first, second)
+            return other
+        finally:
+            await scheduler.shutdown()
+
+    assert asyncio.run(scenario()) >= 0.9
+
+def test_requests_without_chat_bypass_the_scheduler():
+    async def scenario():
+        scheduler = _scheduler()
+        called = []
+
+        async def callback():
+            called.append(True)
+            return "ok"
+
+        result = await scheduler.process_request(callback, (), {}, "getMe", {}, None)
+        return result, called
+
+    assert asyncio.run(scenario()) == ("ok", [True])
+    assert send_scheduler.chat_key({"chat_id": "@channel"}) == "@channel"
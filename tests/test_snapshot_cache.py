@@ -0,0 +1,59 @@
+from datetime import date
+import database
+import handlers.transactions as db_transactions
+from database import Transaction
+from conftest import add_transaction, assert_no_drift
+
+def _transaction_ids(user_id: int):
+    session = database.Session()
+    try:
+        return [row.id for row in session.query(Transaction.id).filter_by(user_id=user_id).order_by(Transaction.date)]
+    finally:
+        session.close()
+
+def _seed():
+    add_transaction(1, 10.0, 'expense', 'food', date(2024, 1, 5))
+    add_transaction(1, 20.0, 'expense', 'taxi', date(2024, 1, 20))
+    add_transaction(1, 30.0, 'expense', 'food', date(2024, 2, 3))
+    columns = db_transactions._load_transaction_columns(1)
+    assert db_transactions.snapshot_cache.get(1) is columns
+    return _transaction_ids(1)
+
+def test_edit_invalidates_cached_snapshot():
+    first, _, _ = _seed()
+
+    assert db_transactions._update_transaction(1, first, amount=15.0, category='cafe') is True
+
+    assert db_transactions.snapshot_cache.get(1) is None
+    columns = db_transactions._load_transaction_columns(1)
+    assert sorted(columns.amount.tolist()) == [15.0, 20.0, 30.0]
+    assert 'cafe' in columns.categories
+    assert_no_drift()
+
+def test_delete_invalidates_cached_snapshot():
+    _, middle, _ = _seed()
+
+    assert db_transactions._delete_transaction(1, middle) is True
+
+    assert db_transactions.snapshot_cache.get(1) is None
+    columns = db_transactions._load_transaction_columns(1)
+    assert sorted(columns.amount.tolist()) == [10.0, 30.0]
+    assert_no_drift()
+
+def test_missing_transaction_keeps_snapshot():
+    _seed()
+    assert db_transactions._delete_transaction(1, 10**9) is False
+    assert db_transactions._update_transaction(2, _transaction_ids(1)[0], amount=1.0) is False
+    assert db_transactions.snapshot_cache.get(1) is not None
+
+def test_append_does_not_change_earlier_snapshot():
+    _seed()
+    before = db_transactions.snapshot_cache.get(1)
+    db_transactions._add_transaction(1, 5.0, 'expense', 'food')
+    after = db_transactions.snapshot_cache.get(1)
+    db_transactions._add_transaction(1, 6.0, 'expense', 'food')
+
+    assert len(before) == 3
+    assert after.amount.tolist()[-1] == 5.0 and len(after) == 4
+    assert len(db_transactions.snapshot_cache.get(1)) == 5
+    assert_no_drift()
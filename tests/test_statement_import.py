@@ -0,0 +1,54 @@
+from datetime import date
+import pytest
+import handlers.transactions as db_transactions
+import statement_import
+from conftest import add_transaction, assert_no_drift
+
+STATEMENT = """date,amount,type,category,description
+2024-01-15,-120.50,,food,grocery
+2024-01-15,3000,income,salary,
+15.02.2024,-40,витрата,taxi,late ride
+not a date,-10,,food,
+2023-12-31,-0,,food,zero
+2024-03-01,-15,,,
+"""
+
+def _write(tmp_path, text, encoding="utf-8"):
+    path = tmp_path / "statement.csv"
+    path.write_bytes(text.encode(encoding))
+    return str(path)
+
+def test_import_keeps_aggregates_in_sync(tmp_path):
+    # Імпорт заднім числом поміж уже наявних днів: накопичені суми пізніших днів мають зсунутися
+    add_transaction(1, 10.0, 'expense', 'food', date(2024, 1, 10))
+    add_transaction(1, 5.0, 'expense', 'food', date(2024, 2, 20))
+
+    result = db_transactions._import_statement(1, _write(tmp_path, STATEMENT), chunk_size=2)
+
+    assert (result.imported, result.skipped) == (4, 2)
+    assert [line for line, _ in result.errors] == [5, 6]
+    assert_no_drift()
+    totals = db_transactions._get_totals(1)
+    assert (totals.income_total, totals.expense_total) == (3000.0, 190.5)
+    january = {row.category: row.total for row in db_transactions._get_range_totals(1, date(2024, 1, 1), date(2024, 1, 31))}
+    assert january == {'food': 130.5, 'salary': 3000.0}
+
+def test_imported_rows_get_default_category_and_period_keys(tmp_path):
+    db_transactions._import_statement(1, _write(tmp_path, STATEMENT))
+    rows = list(db_transactions.iter_transactions(1))
+
+    assert rows[-1].category == statement_import.DEFAULT_CATEGORY
+    assert db_transactions._get_monthly_totals(1, 'expense') == [('2024-01', 120.5), ('2024-02', 40.0), ('2024-03', 15.0)]
+
+def test_cp1251_statement_is_decoded(tmp_path):
+    text = "дата,сума,категорія\n01.02.2024,-12,кафе\n"
+    result = db_transactions._import_statement(1, _write(tmp_path, text, "cp1251"))
+
+    assert result.imported == 1
+    assert db_transactions._get_category_totals(1) == [('expense', 'кафе', 12.0)]
+
+def test_unknown_layout_imports_nothing(tmp_path):
+    with pytest.raises(statement_import.ImportFormatError):
+        db_transactions._import_statement(1, _write(tmp_path, "foo,bar\n1,2\n"))
+    assert db_transactions._get_totals(1) is None
+    assert_no_drift()
@@ -0,0 +1,59 @@
+import asyncio
+from types import SimpleNamespace
+from update_processor import PerUserUpdateProcessor
+
+def _update(user_id):
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), effective_chat=None)
+
+def _run(processor, updates, delays, log):
+    """Подає оновлення в порядку надходження, як Application; кожне пише в log початок і кінець."""
+    active = {"now": 0, "max": 0}
+
+    async def handle(user_id, index):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        log.append(("start", user_id, index))
+        await asyncio.sleep(delays.get((user_id, index), 0.001))
+        log.append(("end", user_id, index))
+        active["now"] -= 1
+
+    async def main():
+        await processor.initialize()
+        tasks = [
+            asyncio.create_task(processor.process_update(_update(user_id), handle(user_id, index)))
+            for index, user_id in enumerate(updates)
+        ]
+        await asyncio.gather(*tasks)
+        await processor.shutdown()
+
+    asyncio.run(main())
+    return active["max"]
+
+def test_updates_of_one_user_run_in_order_and_never_overlap():
+    log = []
+    # Перше оновлення користувача 1 найдовше: наступні мають його дочекатися
+    _run(PerUserUpdateProcessor(concurrency=8), [1, 2, 1, 2, 1], {(1, 0): 0.05}, log)
+
+    for user_id in (1, 2):
+        events = [(kind, index) for kind, uid, index in log if uid == user_id]
+        indexes = [index for kind, index in events if kind == "start"]
+        assert indexes == sorted(indexes)
+        # start і end одного оновлення йдуть підряд — оновлення користувача не перетинаються
+        assert all(events[i][1] == events[i + 1][1] for i in range(0, len(events), 2))
+
+def test_other_users_are_not_blocked_by_a_slow_user():
+    log = []
+    _run(PerUserUpdateProcessor(concurrency=8), [1, 2, 3], {(1, 0): 0.05}, log)
+
+    assert log.index(("end", 2, 1)) < log.index(("end", 1, 0))
+    assert log.index(("end", 3, 2)) < log.index(("end", 1, 0))
+
+def test_concurrency_limit_and_cleanup():
+    log = []
+    processor = PerUserUpdateProcessor(concurrency=2)
+    peak = _run(processor, list(range(10)) * 2, {}, log)
+
+    assert peak <= 2
+    assert len(log) == 40
+    assert processor.queue_depths() == []
+    assert not processor._locks
@@ -0,0 +1,78 @@
+import asyncio
+import socket
+import aiohttp
+import webhook
+
+SECRET = "test-secret"
+
+class FakeApplication:
+    """Лише те, що WebhookServer бере з telegram.ext.Application."""
+
+    def __init__(self, queue_size: int = 0):
+        self.bot = None
+        self.update_queue = asyncio.Queue(queue_size)
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _update(update_id: int):
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "chat": {"id": 1, "type": "private"}, "text": "/start"
+    }}
+
+async def _start(application):
+    server = webhook.WebhookServer(application, SECRET, path="/telegram")
+    port = _free_port()
+    await server.start("127.0.0.1", port)
+    return server, f"http://127.0.0.1:{port}/telegram"
+
+def test_wrong_secret_token_is_rejected():
+    async def run():
+        application = FakeApplication()
+        server, url = await _start(application)
+        try:
+            async with aiohttp.ClientSession() as client:
+                statuses = []
+                for headers in ({}, {webhook.SECRET_HEADER: "wrong"}, {webhook.SECRET_HEADER: SECRET}):
+                    async with client.post(url, json=_update(len(statuses) + 1), headers=headers) as response:
+                        statuses.append(response.status)
+        finally:
+            await server.drain(timeout=1)
+        return statuses, [application.update_queue.get_nowait().update_id for _ in range(application.update_queue.qsize())]
+
+    statuses, queued = asyncio.run(run())
+
+    assert statuses == [403, 403, 200]
+    assert queued == [3]
+
+def test_stop_drains_pending_updates():
+    async def run():
+        # Черга заповнена, тож запит з оновленням 2 чекає в обробнику
+        application = FakeApplication(queue_size=1)
+        application.update_queue.put_nowait("busy")
+        server, url = await _start(application)
+        headers = {webhook.SECRET_HEADER: SECRET}
+        async with aiohttp.ClientSession() as client:
+            async def post(update_id: int):
+                async with client.post(url, json=_update(update_id), headers=headers) as response:
+                    return response.status
+
+            pending = asyncio.create_task(post(2))
+            while not server._in_flight:
+                await asyncio.sleep(0.01)
+            drain = asyncio.create_task(server.drain(timeout=5))
+            await asyncio.sleep(0.05)
+            late_status = await post(3)
+            assert not drain.done()
+            assert application.update_queue.get_nowait() == "busy"
+            pending_status = await pending
+            await drain
+        return late_status, pending_status, application.update_queue.get_nowait().update_id
+
+    late_status, pending_status, drained_update = asyncio.run(run())
+
+    assert late_status == 503
+    assert pending_status == 200
+    assert drained_update == 2
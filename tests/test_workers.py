@@ -0,0 +1,41 @@
+import workers
+from database import shard_for
+
+def _message(user_id: int, chat_id: int = None):
+    return {"update_id": 1, "message": {
+        "message_id": 1, "date": 0, "from": {"id": user_id, "is_bot": False, "first_name": "U"},
+        "chat": {"id": chat_id if chat_id is not None else user_id, "type": "private"}, "text": "/start"
+    }}
+
+def _callback(user_id: int):
+    return {"update_id": 2, "callback_query": {
+        "id": "1", "from": {"id": user_id, "is_bot": False, "first_name": "U"}, "chat_instance": "1", "data": "x"
+    }}
+
+def _poll_answer(user_id: int):
+    return {"update_id": 3, "poll_answer": {"poll_id": "1", "user": {"id": user_id}, "option_ids": [0]}}
+
+def test_update_user_id():
+    assert workers.update_user_id(_message(7, chat_id=-100)) == 7
+    assert workers.update_user_id(_callback(7)) == 7
+    assert workers.update_user_id(_poll_answer(7)) == 7
+    assert workers.update_user_id({"update_id": 4, "channel_post": {"chat": {"id": -100}}}) == -100
+    assert workers.update_user_id({"update_id": 5, "poll": {"id": "1", "question": "?"}}) is None
+
+def test_each_user_goes_to_a_stable_worker():
+    pool = workers.WorkerPool(4, "token")
+    other_pool = workers.WorkerPool(4, "token")
+    routed = {}
+    for user_id in range(1, 50):
+        indexes = {pool.worker_for(update(user_id)) for update in (_message, _callback, _poll_answer)}
+        assert indexes == {shard_for(user_id, 4)}
+        assert other_pool.worker_for(_message(user_id)) in indexes
+        routed[user_id] = indexes.pop()
+
+    assert set(routed.values()) == set(range(4))
+
+def test_update_without_user_goes_to_worker_zero():
+    pool = workers.WorkerPool(4, "token")
+
+    assert pool.worker_for({"update_id": 5, "poll": {"id": "1", "question": "?"}}) == 0
+    assert pool.worker_for({"update_id": 6}) == 0
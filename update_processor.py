@@ -0,0 +1,91 @@
+"""Паралельна обробка оновлень Telegram зі збереженням порядку для кожного користувача.
+
+Оновлення різних користувачів обробляються одночасно (не більше
+UPDATE_CONCURRENCY), тож довгий запит до Ollama чи важкий звіт одного
+користувача не затримує інших. Оновлення одного користувача виконуються
+строго по черзі в порядку надходження — стани ConversationHandler не
+змагаються між собою.
+
+Оновлення, що чекає на попереднє оновлення свого користувача, не займає
+слот паралельності: спершу береться черга користувача, потім слот.
+"""
+import asyncio
+import logging
+import os
+import time
+from telegram.ext import BaseUpdateProcessor
+import metrics
+
+logger = logging.getLogger(__name__)
+
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "32"))
+# Скільки оновлень може очікувати в обробнику загалом, перш ніж Application
+# перестане брати нові з update_queue
+UPDATE_MAX_PENDING = int(os.getenv("UPDATE_MAX_PENDING", "10000"))
+
+def update_key(update):
+    """Ключ впорядкування: користувач, а для оновлень без користувача — чат."""
+    user = getattr(update, "effective_user", None)
+    if user is not None:
+        return user.id
+    chat = getattr(update, "effective_chat", None)
+    return chat.id if chat is not None else None
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, concurrency: int = UPDATE_CONCURRENCY, max_pending: int = UPDATE_MAX_PENDING):
+        super().__init__(max_pending)
+        self.concurrency = concurrency
+        self._slots = asyncio.Semaphore(concurrency)
+        self._locks = {}   # ключ -> asyncio.Lock, поки в користувача є оновлення
+        self._depths = {}  # ключ -> оновлень в обробці та в черзі
+        self._active = 0
+        self._wait_latency = metrics.histogram("updates.wait_ms")
+        self._processed = metrics.counter("updates.processed")
+        metrics.gauge("updates.active", lambda: self._active)
+        metrics.gauge("updates.pending", lambda: sum(self._depths.values()))
+        metrics.gauge("updates.queued_users", lambda: len(self._depths))
+        metrics.gauge("updates.max_user_queue", lambda: max(self._depths.values(), default=0))
+
+    def queue_depths(self, limit: int = None):
+        """[(ключ, глибина черги)] за спаданням глибини."""
+        depths = sorted(self._depths.items(), key=lambda item: item[1], reverse=True)
+        return depths[:limit] if limit is not None else depths
+
+    async def do_process_update(self, update, coroutine):
+        key = update_key(update)
+        if key is None:
+            await self._run(coroutine, time.perf_counter())
+            return
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._depths[key] = self._depths.get(key, 0) + 1
+        queued_at = time.perf_counter()
+        try:
+            # asyncio.Lock пропускає очікувачів у порядку черги, а Application
+            # запускає задачі в порядку надходження оновлень
+            async with lock:
+                await self._run(coroutine, queued_at)
+        finally:
+            self._depths[key] -= 1
+            if not self._depths[key]:
+                del self._depths[key]
+                del self._locks[key]
+
+    async def _run(self, coroutine, queued_at: float):
+        async with self._slots:
+            self._wait_latency.observe((time.perf_counter() - queued_at) * 1000)
+            self._active += 1
+            try:
+                await coroutine
+            finally:
+                self._active -= 1
+                self._processed.inc()
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        if self._depths:
+            logger.warning(f"Update processor shut down with {sum(self._depths.values())} pending updates")
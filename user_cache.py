@@ -0,0 +1,47 @@
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+class UserCache:
+    """LRU-кеш відомих користувачів з TTL та буфером оновлень last_activity.
+
+    Використовується лише з циклу подій, тому блокування не потрібні.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._users = OrderedDict()  # user_id -> (час додавання, User)
+        self._pending_activity = {}  # user_id -> datetime останньої дії
+
+    def get(self, user_id: int):
+        entry = self._users.get(user_id)
+        if entry is None:
+            return None
+        added_at, user = entry
+        if time.monotonic() - added_at > self.ttl:
+            del self._users[user_id]
+            return None
+        self._users.move_to_end(user_id)
+        return user
+
+    def put(self, user_id: int, user):
+        self._users[user_id] = (time.monotonic(), user)
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_size:
+            self._users.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        self._users.pop(user_id, None)
+
+    def touch(self, user_id: int):
+        """Запам'ятовує активність користувача для наступного пакетного запису."""
+        self._pending_activity[user_id] = datetime.now()
+
+    def drain_activity(self):
+        """Забирає накопичені оновлення last_activity: {user_id: datetime}."""
+        pending, self._pending_activity = self._pending_activity, {}
+        return pending
+
+    def __len__(self):
+        return len(self._users)
@@ -0,0 +1,154 @@
+"""Режим вебхука (BOT_MODE=webhook) замість application.run_polling().
+
+Telegram сам надсилає оновлення POST-запитами на вбудований HTTP-сервер
+(aiohttp): без циклу getUpdates зникає затримка між опитуваннями, а
+Telegram може тримати до WEBHOOK_MAX_CONNECTIONS паралельних з'єднань.
+
+Запит приймається лише із заголовком X-Telegram-Bot-Api-Secret-Token,
+що збігається з WEBHOOK_SECRET. Обробник лише кладе оновлення в
+application.update_queue і одразу відповідає 200.
+
+Зупинка (SIGINT/SIGTERM): сервер перестає приймати нові запити (503 —
+Telegram повторить їх пізніше), чекає до WEBHOOK_DRAIN_TIMEOUT секунд
+на запити в обробці, після чого application.stop() обробляє все, що вже
+в черзі. Вебхук у Telegram не видаляється, тож під час перезапуску
+оновлення накопичуються на боці Telegram.
+"""
+import asyncio
+import hmac
+import logging
+import os
+import signal
+import time
+from urllib.parse import urlparse
+from aiohttp import web
+from telegram import Update
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Публічна адреса вебхука, наприклад https://bot.example.com/telegram
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+# Шлях на локальному сервері; за замовчуванням — шлях з WEBHOOK_URL
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH") or urlparse(WEBHOOK_URL).path or "/telegram"
+# 1-256 символів A-Z, a-z, 0-9, _ та -
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# Telegram допускає 1-100 одночасних з'єднань
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "10"))
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+class WebhookServer:
+    """HTTP-сервер, що передає оновлення з вебхука в application.update_queue."""
+
+    def __init__(self, application, secret_token: str, path: str = WEBHOOK_PATH,
+                 max_connections: int = WEBHOOK_MAX_CONNECTIONS):
+        self.application = application
+        self.path = path
+        self._secret = secret_token.encode()
+        self._slots = asyncio.Semaphore(max_connections)
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._draining = False
+        self._runner = None
+        self._received = metrics.counter("webhook.updates")
+        self._rejected = metrics.counter("webhook.rejected")
+        self._latency = metrics.histogram("webhook.request_ms")
+        metrics.gauge("webhook.in_flight", lambda: self._in_flight)
+
+    async def handle(self, request: web.Request):
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, "").encode(), self._secret):
+            self._rejected.inc()
+            logger.warning(f"Webhook request with invalid secret token from {request.remote}")
+            return web.Response(status=403)
+        if self._draining:
+            # Telegram повторить доставку, коли бот знову запуститься
+            return web.Response(status=503)
+
+        started = time.perf_counter()
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            async with self._slots:
+                try:
+                    update = Update.de_json(await request.json(), self.application.bot)
+                except (ValueError, KeyError, TypeError):
+                    self._rejected.inc()
+                    return web.Response(status=400)
+                await self.application.update_queue.put(update)
+                self._received.inc()
+                return web.Response()
+        finally:
+            self._in_flight -= 1
+            if not self._in_flight:
+                self._idle.set()
+            self._latency.observe((time.perf_counter() - started) * 1000)
+
+    async def start(self, listen: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT):
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, listen, port).start()
+        logger.info(f"Webhook server listening on {listen}:{port}{self.path}")
+
+    async def drain(self, timeout: float = WEBHOOK_DRAIN_TIMEOUT):
+        """Перестає приймати оновлення й чекає завершення запитів в обробці."""
+        self._draining = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook drain timed out with {self._in_flight} requests in flight")
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+async def serve_webhook(application, webhook_url: str = WEBHOOK_URL, secret_token: str = WEBHOOK_SECRET,
+                        listen: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT, path: str = WEBHOOK_PATH,
+                        max_connections: int = WEBHOOK_MAX_CONNECTIONS, stop_event: asyncio.Event = None):
+    """Життєвий цикл бота в режимі вебхука; як run_polling викликає post_init/post_stop/post_shutdown.
+
+    Працює до SIGINT/SIGTERM або stop_event.set().
+    """
+    if not webhook_url:
+        raise ValueError("Не вказано WEBHOOK_URL")
+    if not secret_token:
+        raise ValueError("Не вказано WEBHOOK_SECRET")
+
+    stop_event = stop_event or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    server = WebhookServer(application, secret_token, path, max_connections)
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        await server.start(listen, port)
+        await application.bot.set_webhook(
+            url=webhook_url,
+            secret_token=secret_token,
+            max_connections=max_connections,
+            allowed_updates=Update.ALL_TYPES
+        )
+        logger.info(f"Webhook set to {webhook_url} (max_connections={max_connections})")
+        await stop_event.wait()
+        logger.info("Stopping webhook server, draining pending updates...")
+    finally:
+        await server.drain()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
@@ -0,0 +1,233 @@
+"""Режим кількох процесів (BOT_MODE=workers): оновлення обробляють BOT_WORKERS процесів.
+
+Процес-диспетчер отримує оновлення через getUpdates і, не розбираючи їх
+у об'єкти Update, передає кожне одному з процесів-обробників за стабільним
+хешем id користувача (database.shard_for). Тож усі оновлення користувача
+потрапляють в один процес і обробляються там по черзі, а графіки,
+аналітика й розбір JSON різних користувачів займають різні ядра.
+
+Кожен обробник — звичайний Application з main.build_application і
+main.setup_handlers без власного Updater; відповіді він надсилає в Bot API
+сам. Спільний ліміт надсилання Telegram ділиться між обробниками порівну.
+За DB_SHARDS = BOT_WORKERS обробник пише лише у свій шард SQLite.
+
+Обробник, що завершився з помилкою, перезапускається. Під час зупинки
+диспетчер припиняє опитування, підтверджує отримані оновлення й чекає,
+поки обробники закінчать свої черги (до WORKER_STOP_TIMEOUT секунд).
+"""
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+from aiohttp import ClientError, ClientSession, ClientTimeout
+from database import init_db, run_db, shard_for
+import metrics
+
+logger = logging.getLogger(__name__)
+
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", str(os.cpu_count() or 1)))
+# Скільки оновлень може чекати в черзі одного обробника, перш ніж диспетчер призупинить опитування
+WORKER_QUEUE_SIZE = int(os.getenv("WORKER_QUEUE_SIZE", "1000"))
+WORKER_STOP_TIMEOUT = float(os.getenv("WORKER_STOP_TIMEOUT", "30"))
+POLL_TIMEOUT = 30
+BOT_API_URL = "https://api.telegram.org/bot"
+
+def update_user_id(update: dict):
+    """id користувача (або чату) із сирого оновлення Bot API; None, якщо його немає."""
+    for value in update.values():
+        if not isinstance(value, dict):
+            continue
+        user = value.get("from") or value.get("user")
+        if isinstance(user, dict):
+            return user.get("id")
+        chat = value.get("chat")
+        if isinstance(chat, dict):
+            return chat.get("id")
+    return None
+
+def _resolve(path: str):
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+def run_worker(index: int, count: int, token: str, base_url: str, setup: str, updates):
+    """Точка входу процесу-обробника."""
+    # Зупинкою керує диспетчер: Ctrl+C у терміналі не повинен обірвати обробку черги
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    asyncio.run(_serve_worker(index, count, token, base_url, setup, updates))
+
+async def _serve_worker(index: int, count: int, token: str, base_url: str, setup: str, updates):
+    from telegram import Update
+    import main
+
+    # init_db уже виконав диспетчер; N процесів не повинні одночасно змінювати схему тих самих файлів
+    application = main.build_application(token, base_url=base_url, workers=count, updater=False, init_schema=False)
+    _resolve(setup)(application)
+    loop = asyncio.get_running_loop()
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        logger.info(f"Worker {index}/{count} started")
+        while True:
+            data = await loop.run_in_executor(None, updates.get)
+            if data is None:
+                break
+            while application.update_queue.qsize() >= WORKER_QUEUE_SIZE:
+                # Не вичитуємо чергу процесу наперед, інакше диспетчер не помітить перевантаження
+                await asyncio.sleep(0.05)
+            await application.update_queue.put(Update.de_json(data, application.bot))
+    finally:
+        if application.running:
+            # stop() обробляє все, що вже в update_queue
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        logger.info(f"Worker {index}/{count} stopped")
+
+class WorkerPool:
+    """Процеси-обробники з окремою чергою оновлень у кожного."""
+
+    def __init__(self, count: int, token: str, base_url: str = BOT_API_URL,
+                 setup: str = "main:setup_handlers", queue_size: int = WORKER_QUEUE_SIZE):
+        self.count = count
+        self.token = token
+        self.base_url = base_url
+        self.setup = setup
+        # spawn: обробник не успадковує з'єднання з БД і потоки диспетчера
+        self._context = multiprocessing.get_context("spawn")
+        self._queues = [self._context.Queue(queue_size) for _ in range(count)]
+        self._processes = [None] * count
+        self._dispatched = metrics.counter("workers.dispatched")
+        self._restarts = metrics.counter("workers.restarts")
+        metrics.gauge("workers.alive", lambda: sum(1 for p in self._processes if p is not None and p.is_alive()))
+
+    def _spawn(self, index: int):
+        process = self._context.Process(
+            target=run_worker,
+            args=(index, self.count, self.token, self.base_url, self.setup, self._queues[index]),
+            name=f"bot-worker-{index}",
+            daemon=False
+        )
+        process.start()
+        self._processes[index] = process
+
+    def start(self):
+        for index in range(self.count):
+            self._spawn(index)
+
+    def worker_for(self, update: dict) -> int:
+        user_id = update_user_id(update)
+        return shard_for(user_id, self.count) if user_id is not None else 0
+
+    async def submit(self, update: dict):
+        index = self.worker_for(update)
+        process = self._processes[index]
+        if not process.is_alive():
+            logger.error(f"Worker {index} exited with code {process.exitcode}, restarting")
+            self._restarts.inc()
+            self._spawn(index)
+        while True:
+            try:
+                self._queues[index].put_nowait(update)
+                break
+            except queue.Full:
+                # Обробник не встигає — притримуємо опитування, а не пам'ять
+                await asyncio.sleep(0.05)
+        self._dispatched.inc()
+
+    async def stop(self, timeout: float = WORKER_STOP_TIMEOUT):
+        loop = asyncio.get_running_loop()
+        for worker_queue in self._queues:
+            await loop.run_in_executor(None, worker_queue.put, None)
+        for index, process in enumerate(self._processes):
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                logger.warning(f"Worker {index} did not stop in {timeout} s, killing")
+                process.kill()
+                await loop.run_in_executor(None, process.join)
+
+class UpdatePoller:
+    """getUpdates без розбору оновлень: сирі словники йдуть у WorkerPool."""
+
+    def __init__(self, pool: WorkerPool, token: str, base_url: str = BOT_API_URL):
+        self.pool = pool
+        self.url = f"{base_url}{token}"
+        self.offset = 0
+        self._session = None
+
+    async def _call(self, method: str, **params):
+        async with self._session.post(f"{self.url}/{method}", json=params) as response:
+            return await response.json()
+
+    async def poll(self):
+        self._session = ClientSession(timeout=ClientTimeout(total=POLL_TIMEOUT + 10))
+        try:
+            # З установленим вебхуком getUpdates повертає 409
+            await self._call("deleteWebhook")
+            while True:
+                try:
+                    payload = await self._call("getUpdates", offset=self.offset, timeout=POLL_TIMEOUT)
+                except (ClientError, asyncio.TimeoutError, ValueError) as e:
+                    logger.warning(f"getUpdates failed: {e}")
+                    await asyncio.sleep(1)
+                    continue
+                if not payload.get("ok"):
+                    logger.error(f"getUpdates error: {payload.get('description')}")
+                    await asyncio.sleep(payload.get("parameters", {}).get("retry_after", 1))
+                    continue
+                for update in payload["result"]:
+                    await self.pool.submit(update)
+                    self.offset = update["update_id"] + 1
+        finally:
+            await self._session.close()
+
+    async def confirm(self):
+        """Підтверджує Telegram уже передані обробникам оновлення, щоб після перезапуску вони не повторилися."""
+        if not self.offset:
+            return
+        async with ClientSession(timeout=ClientTimeout(total=10)) as session:
+            self._session = session
+            try:
+                await self._call("getUpdates", offset=self.offset, timeout=0, limit=1)
+            except (ClientError, asyncio.TimeoutError, ValueError) as e:
+                logger.warning(f"Could not confirm received updates: {e}")
+
+async def serve_workers(token: str, count: int = BOT_WORKERS, base_url: str = BOT_API_URL,
+                        setup: str = "main:setup_handlers", stop_event: asyncio.Event = None):
+    """Диспетчер: запускає обробники й передає їм оновлення до SIGINT/SIGTERM або stop_event.set()."""
+    stop_event = stop_event or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    # Схему оновлює диспетчер, поки обробники ще не запущені й не змагаються за неї
+    await run_db(init_db)
+    pool = WorkerPool(count, token, base_url, setup)
+    pool.start()
+    poller = UpdatePoller(pool, token, base_url)
+    polling = asyncio.create_task(poller.poll())
+    stopping = asyncio.create_task(stop_event.wait())
+    try:
+        await asyncio.wait([polling, stopping], return_when=asyncio.FIRST_COMPLETED)
+        logger.info("Stopping dispatcher, waiting for workers to finish queued updates...")
+    finally:
+        stopping.cancel()
+        polling.cancel()
+        result, = await asyncio.gather(polling, return_exceptions=True)
+        if isinstance(result, Exception):
+            logger.error(f"Polling stopped with error: {result}", exc_info=result)
+        await poller.confirm()
+        await pool.stop()